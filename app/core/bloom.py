@@ -0,0 +1,35 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for strings.
+
+    "Not in the filter" is always correct; "in the filter" may be a false
+    positive (at roughly error_rate once `capacity` items were added), so
+    callers confirm positives against the real store.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(8, math.ceil(bits))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing (Kirsch–Mitzenmacher) from a single digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item)
+        )
@@ -11,6 +11,26 @@ class Settings(BaseModel):
     jwt_secret: str = os.getenv("JWT_SECRET", "changeme")
     jwt_alg: str = os.getenv("JWT_ALG", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    refresh_token_expire_days: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+    # Argon2id cost; python -m app.scripts.calibrate_argon2 recommends values
+    # for this machine. Memory is in KiB. Existing hashes are upgraded on login.
+    argon2_time_cost: int = int(os.getenv("ARGON2_TIME_COST", 3))
+    argon2_memory_cost: int = int(os.getenv("ARGON2_MEMORY_COST", 65536))
+    argon2_parallelism: int = int(os.getenv("ARGON2_PARALLELISM", 4))
+
+    # Argon2 runs in a process pool; beyond workers + max_queue we answer 429
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    password_hash_max_queue: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
+
+    # Login token buckets, checked before any password hashing
+    login_rate_email_burst: int = int(os.getenv("LOGIN_RATE_EMAIL_BURST", 5))
+    login_rate_email_per_minute: float = float(
+        os.getenv("LOGIN_RATE_EMAIL_PER_MINUTE", 1)
+    )
+    login_rate_ip_burst: int = int(os.getenv("LOGIN_RATE_IP_BURST", 30))
+    login_rate_ip_per_minute: float = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", 30))
+    rate_limit_max_entries: int = int(os.getenv("RATE_LIMIT_MAX_ENTRIES", 100000))
 
     database_url: str = os.getenv(
         "DATABASE_URL", "postgresql+asyncpg://app:app_pw@db:5432/parking"
@@ -19,6 +39,50 @@ class Settings(BaseModel):
         "SYNC_DATABASE_URL", "postgresql://app:app_pw@db:5432/parking"
     )
     redis_url: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    redis_timeout_seconds: float = float(os.getenv("REDIS_TIMEOUT_SECONDS", 0.5))
+    # How long to fall back to in-process stores after Redis fails
+    redis_retry_seconds: int = int(os.getenv("REDIS_RETRY_SECONDS", 30))
+
+    # Sized for the number of live revoked tokens; past it, more Redis lookups
+    revocation_bloom_capacity: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", 100000))
+    revocation_refresh_seconds: int = int(os.getenv("REVOCATION_REFRESH_SECONDS", 300))
+
+    principal_cache_ttl_seconds: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+    principal_cache_local_ttl_seconds: int = int(
+        os.getenv("PRINCIPAL_CACHE_LOCAL_TTL_SECONDS", 5)
+    )
+    principal_cache_max_entries: int = int(
+        os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 10000)
+    )
+
+    # Machine API keys are verified from memory; revocation reaches other
+    # workers within the TTL
+    api_key_cache_ttl_seconds: int = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", 60))
+    api_key_cache_max_entries: int = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", 10000))
+    # Off while gate controllers are being provisioned with keys
+    gate_require_api_key: bool = os.getenv("GATE_REQUIRE_API_KEY", "false").lower() == "true"
+
+    # Bulk discount generation streams up to this many codes in the response;
+    # larger batches run as a background job
+    discount_generate_stream_max: int = int(
+        os.getenv("DISCOUNT_GENERATE_STREAM_MAX", 50000)
+    )
+
+    discount_cache_ttl_seconds: int = int(os.getenv("DISCOUNT_CACHE_TTL_SECONDS", 30))
+    discount_cache_max_entries: int = int(os.getenv("DISCOUNT_CACHE_MAX_ENTRIES", 10000))
+    # Sized for the number of discount codes; past it, more false positives
+    discount_bloom_capacity: int = int(os.getenv("DISCOUNT_BLOOM_CAPACITY", 2000000))
+    discount_filter_refresh_seconds: int = int(
+        os.getenv("DISCOUNT_FILTER_REFRESH_SECONDS", 60)
+    )
+    # How often sharded discount counters are folded back into uses_count
+    discount_shard_fold_seconds: int = int(os.getenv("DISCOUNT_SHARD_FOLD_SECONDS", 10))
+
+    # How far ahead of the server clock an offline meter's paid_at may be
+    payment_clock_skew_seconds: int = int(os.getenv("PAYMENT_CLOCK_SKEW_SECONDS", 300))
+
+    idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+    idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
 
 
 settings = Settings()
@@ -0,0 +1,22 @@
+from collections import defaultdict
+from typing import Callable
+
+# Minimal in-process metrics, served as JSON on GET /metrics.
+# Values are per worker process.
+_counters: dict[str, int] = defaultdict(int)
+_gauges: dict[str, Callable[[], float]] = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    _counters[name] += value
+
+
+def register_gauge(name: str, read: Callable[[], float]) -> None:
+    _gauges[name] = read
+
+
+def snapshot() -> dict[str, float]:
+    values: dict[str, float] = dict(_counters)
+    for name, read in _gauges.items():
+        values[name] = read()
+    return values
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "Redis is not there right now", callers fall back on these
+REDIS_ERRORS = (RedisError, OSError)
+
+_client: Redis | None = None
+_unavailable_until = 0.0
+
+
+def get_redis() -> Redis | None:
+    """Shared Redis client, or None while Redis is considered unavailable."""
+    global _client
+    if not settings.redis_url or time.monotonic() < _unavailable_until:
+        return None
+
+    if _client is None:
+        _client = Redis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=settings.redis_timeout_seconds,
+            socket_timeout=settings.redis_timeout_seconds,
+        )
+    return _client
+
+
+def mark_redis_unavailable() -> None:
+    # Skip Redis for a while instead of paying a timeout on every request
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + settings.redis_retry_seconds
+
+
+async def follow_channel(
+    channel: str,
+    on_message: Callable[[str], None],
+    refresh: Callable[[], Awaitable[None]],
+    refresh_seconds: float,
+    catch_up: Optional[Callable[[], Awaitable[None]]] = None,
+) -> None:
+    """
+    Background task keeping a per-worker structure in step with other workers.
+
+    refresh() rebuilds it from the source of truth: after every (re)subscribe,
+    so nothing published while disconnected is missed, and then every
+    refresh_seconds, or catch_up() instead when a full rebuild is too costly
+    to repeat. on_message() applies each update published in between.
+    """
+    periodic = catch_up or refresh
+    while True:
+        redis = get_redis()
+        if redis is None:
+            await asyncio.sleep(settings.redis_retry_seconds)
+            continue
+
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                await refresh()
+                refreshed_at = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        data = message["data"]
+                        on_message(data.decode() if isinstance(data, bytes) else data)
+
+                    if time.monotonic() - refreshed_at > refresh_seconds:
+                        await periodic()
+                        refreshed_at = time.monotonic()
+        except REDIS_ERRORS:
+            logger.warning("Lost Redis channel %s, retrying", channel)
+            mark_redis_unavailable()
@@ -16,3 +16,9 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    # For work that outlives the request scope (streaming, background tasks),
+    # which must open its own session instead of using get_session.
+    return AsyncSessionLocal
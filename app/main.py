@@ -1,29 +1,62 @@
+import asyncio
+import math
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.responses import JSONResponse
+from app.core import metrics
 from app.core.config import settings
+from app.db.session import get_sessionmaker
 from app.routers import (
+    api_keys,
     auth,
     parking_lots,
     parking_sessions,
     payments,
     reservations,
+    reports,
     gate,
     discounts,
+    exports,
     vehicles
 )
 from app.services.exceptions import (
+    AccessForbidden,
     AccountAlreadyExists,
+    ApiKeyNotFound,
+    GateNotFound,
+    InvalidApiKeyOwner,
     InvalidCredentials,
+    InvalidRefreshToken,
     InvalidTimeRange,
+    LoginRateLimited,
     ParkingLotNotFound,
+    PasswordHashingBusy,
     ParkingLotAtCapacity,
     ReservationNotFound,
     ReservationOverlap,
     UserNotFound,
 )
+from app.services.discount_counters import run_discount_shard_folding
+from app.services.discounts import sync_discount_codes
+from app.services.revocation import sync_revocations
+from app.services.security import dummy_hash, shutdown_hashing_pool
 
 
-app = FastAPI(title=settings.app_name)
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    revocations = asyncio.create_task(sync_revocations())
+    discount_codes = asyncio.create_task(sync_discount_codes())
+    shard_folding = asyncio.create_task(run_discount_shard_folding(get_sessionmaker()))
+    # Warms the hashing pool too, so the first logins do not pay its startup
+    await dummy_hash()
+    yield
+    revocations.cancel()
+    discount_codes.cancel()
+    shard_folding.cancel()
+    shutdown_hashing_pool()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 
 @app.get("/health")
@@ -31,6 +64,11 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
 app.include_router(parking_lots.router, prefix="/parking_lots", tags=["parking_lots"])
@@ -41,6 +79,9 @@ app.include_router(
 )
 app.include_router(payments.router, prefix="/payments", tags=["payments"])
 app.include_router(vehicles.router, prefix="/vehicles", tags=["vehicles"])
+app.include_router(reports.router, prefix="/reports", tags=["reports"])
+app.include_router(exports.router, prefix="/exports", tags=["exports"])
+app.include_router(api_keys.router, prefix="/api_keys", tags=["api_keys"])
 
 # Handle our exceptions
 @app.exception_handler(ReservationOverlap)
@@ -98,9 +139,67 @@ async def invalid_credentials_handler(_, exc: InvalidCredentials):
     )
 
 
+@app.exception_handler(LoginRateLimited)
+async def login_rate_limited_handler(_, exc: LoginRateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many login attempts, retry later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+@app.exception_handler(InvalidRefreshToken)
+async def invalid_refresh_token_handler(_, exc: InvalidRefreshToken):
+    return JSONResponse(
+        status_code=401,
+        content={"detail": "Invalid or expired refresh token"},
+    )
+
+
+@app.exception_handler(AccessForbidden)
+async def access_forbidden_handler(_, exc: AccessForbidden):
+    return JSONResponse(
+        status_code=403,
+        content={"detail": "Insufficient permissions"},
+    )
+
+
+@app.exception_handler(ApiKeyNotFound)
+async def api_key_not_found_handler(_, exc: ApiKeyNotFound):
+    return JSONResponse(
+        status_code=404,
+        content={"detail": "API key could not be found"},
+    )
+
+
+@app.exception_handler(InvalidApiKeyOwner)
+async def invalid_api_key_owner_handler(_, exc: InvalidApiKeyOwner):
+    return JSONResponse(
+        status_code=422,
+        content={"detail": "API keys can only be issued to parking meter accounts, scoped to one lot"},
+    )
+
+
+@app.exception_handler(GateNotFound)
+async def gate_not_found_handler(_, exc: GateNotFound):
+    return JSONResponse(
+        status_code=404,
+        content={"detail": "Gate could not be found"},
+    )
+
+
 @app.exception_handler(UserNotFound)
 async def user_not_found_handler(_, exc: UserNotFound):
     return JSONResponse(
         status_code=404,
         content={"detail": "User not found"},
     )
+
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(_, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many login attempts in progress, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
@@ -7,3 +7,10 @@ from .discount_code import DiscountCode  # noqa
 from .discount_redemption import DiscountRedemption  # noqa
 from .gate import Gate  # noqa
 from .parking_session import ParkingSession  # noqa
+from .revenue_rollup import RevenueRollup  # noqa
+from .refresh_token import RefreshToken  # noqa
+from .api_key import ApiKey  # noqa
+from .discount_code_shard import DiscountCodeShard  # noqa
+from .discount_rollup import DiscountRollup  # noqa
+from .import_id_map import ImportIdMap  # noqa
+from .import_checkpoint import ImportCheckpoint  # noqa
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.user import UserRole
+
+
+class ApiKey(Base):
+    """Credential for a machine client (gate controller, parking meter)."""
+
+    __tablename__ = "api_keys"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Public part of the key, used to find the row
+    prefix: Mapped[str] = mapped_column(String(16), unique=True, index=True)
+    # HMAC-SHA256 of the secret part, hex encoded
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # Machine account the key acts as; its role is copied so auth needs no join
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    role: Mapped[UserRole] = mapped_column(
+        Enum(UserRole, name="user_role"), nullable=False
+    )
+
+    # Optional scope: the key is only accepted for this lot / gate
+    parking_lot_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("parking_lots.id", ondelete="CASCADE"), nullable=True
+    )
+    gate_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("gates.id", ondelete="CASCADE"), nullable=True
+    )
+
+    revoked: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
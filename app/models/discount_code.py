@@ -5,6 +5,14 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 
+def normalize_code(code: str) -> str:
+    return code.strip().lower()
+
+
+def _normalized_default(context) -> str:
+    return normalize_code(context.get_current_parameters()["code"])
+
+
 class DiscountCode(Base, TimestampMixin):
     __tablename__ = "discount_codes"
 
@@ -15,6 +23,15 @@ class DiscountCode(Base, TimestampMixin):
         String(50), unique=True, index=True, nullable=False
     )
 
+    # Lookup key: codes are matched case-insensitively
+    code_normalized: Mapped[str] = mapped_column(
+        String(50),
+        unique=True,
+        index=True,
+        nullable=False,
+        default=_normalized_default,
+    )
+
     # 0..100
     percent: Mapped[int] = mapped_column(Integer, nullable=False)
 
@@ -34,6 +51,12 @@ class DiscountCode(Base, TimestampMixin):
     # Counter to avoid counting redemptions every time
     uses_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
+    # > 0 for hot multi-use codes: redemptions go to this many
+    # DiscountCodeShard rows and are folded into uses_count periodically
+    counter_shards: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+
     # Optional validity window
     valid_from: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
@@ -42,4 +65,7 @@ class DiscountCode(Base, TimestampMixin):
         DateTime(timezone=True), nullable=True
     )
 
+    # Set on generated codes: the generation request that created them
+    batch_id: Mapped[str | None] = mapped_column(String(32), index=True, nullable=True)
+
     redemptions = relationship("DiscountRedemption", back_populates="discount_code")
@@ -0,0 +1,27 @@
+from typing import Optional
+from sqlalchemy import ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class DiscountCodeShard(Base):
+    """
+    One slice of a sharded discount code's usage counter.
+
+    Redemptions increment a random shard instead of the code row. Each shard
+    may take at most `quota` uses until the next fold, and the quotas add up
+    to what is left of max_uses, so the shards together can never exceed it.
+    """
+
+    __tablename__ = "discount_code_shards"
+
+    discount_code_id: Mapped[int] = mapped_column(
+        ForeignKey("discount_codes.id", ondelete="CASCADE"), primary_key=True
+    )
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # Uses since the last fold into discount_codes.uses_count
+    uses: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # None when the code has no max_uses
+    quota: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
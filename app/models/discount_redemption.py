@@ -1,5 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Integer, DateTime, ForeignKey, func
+from typing import Optional
+from sqlalchemy import Integer, DateTime, Float, ForeignKey, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -16,9 +17,13 @@ class DiscountRedemption(Base):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
     )
-    reservation_id: Mapped[int] = mapped_column(
-        ForeignKey("reservations.id", ondelete="CASCADE"), index=True, nullable=False
+    # Kept when the reservation is deleted: the redemption still happened
+    reservation_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("reservations.id", ondelete="SET NULL"), index=True, nullable=True
     )
+    # The reservation's amounts when the code was redeemed, for the rollups
+    original_amount: Mapped[float] = mapped_column(Float, nullable=False)
+    discount_amount: Mapped[float] = mapped_column(Float, nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
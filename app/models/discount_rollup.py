@@ -0,0 +1,25 @@
+from datetime import date
+from sqlalchemy import Date, Float, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class DiscountRollup(Base):
+    """Redemptions per discount code per day, maintained on redemption."""
+
+    __tablename__ = "discount_rollups"
+
+    discount_code_id: Mapped[int] = mapped_column(
+        ForeignKey("discount_codes.id", ondelete="CASCADE"), primary_key=True
+    )
+    # UTC day the redemptions were recorded on
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Codes with sharded counters spread their rollup over as many rows, so
+    # redemptions do not queue on one row here either; readers sum them
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True, default=0)
+
+    redemptions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Price before discount and the discount given, from the reservations
+    original_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    discount_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Boolean, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ImportCheckpoint(Base):
+    """How far the import of one legacy data file got."""
+
+    __tablename__ = "import_checkpoints"
+
+    filename: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # SHA-256 of the file the progress below belongs to
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # Leading array items whose rows are committed
+    items_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ImportIdMap(Base):
+    """Legacy id -> new id of every imported row, kept between import runs."""
+
+    __tablename__ = "import_id_map"
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # JSON-encoded, so 1 and "1" from the legacy files stay apart
+    legacy_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    new_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -46,7 +46,9 @@ class Payment(Base):
         nullable=False,
         default=PaymentStatus.pending,
     )
-    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, index=True
+    )
 
     # Relationships
     user: Mapped[Optional["User"]] = relationship(back_populates="payments")
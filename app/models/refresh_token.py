@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class RefreshToken(Base):
+    """One issued refresh token. Rotation chains tokens into a family."""
+
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    # Shared by every token rotated from the same login
+    family_id: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    # HMAC-SHA256 of the token secret, hex encoded; the secret itself is never stored
+    token_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    # Set when the token is exchanged; a second exchange is a reuse
+    used_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    revoked: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Float, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class RevenueRollup(Base):
+    """Paid revenue per parking lot per hour, maintained on settlement."""
+
+    __tablename__ = "revenue_rollups"
+
+    parking_lot_id: Mapped[int] = mapped_column(
+        ForeignKey("parking_lots.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Start of the hour (UTC) the payments were completed in
+    bucket_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )
+
+    amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    payments_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_session
+from app.services.principals import Principal
+from app.schemas.api_key import ApiKeyCreatedOut, ApiKeyIn, ApiKeyOut
+from app.services.auth import require_roles
+from app.services.api_keys import create_api_key, list_api_keys, revoke_api_key
+
+
+router = APIRouter()
+
+
+@router.post("", response_model=ApiKeyCreatedOut, status_code=status.HTTP_201_CREATED)
+async def add_api_key(
+    payload: ApiKeyIn,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    api_key, key = await create_api_key(db, payload)
+    return ApiKeyCreatedOut(
+        **ApiKeyOut.model_validate(api_key).model_dump(), key=key
+    )
+
+
+@router.get("", response_model=list[ApiKeyOut], status_code=status.HTTP_200_OK)
+async def get_api_keys(
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return [ApiKeyOut.model_validate(k) for k in await list_api_keys(db)]
+
+
+@router.delete(
+    "/{api_key_id}", response_model=ApiKeyOut, status_code=status.HTTP_200_OK
+)
+async def delete_api_key(
+    api_key_id: int,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return ApiKeyOut.model_validate(await revoke_api_key(db, api_key_id))
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_session
-from app.models.user import User
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.session import get_session, get_sessionmaker
+from app.services.principals import Principal
 from app.schemas.auth import (
     LoginIn,
     LoginOut,
+    RefreshIn,
     RegisterIn,
     RegisterOut,
     UserOut,
@@ -17,6 +18,9 @@ from app.services.auth import (
     get_current_user,
     get_user,
     login_account,
+    logout,
+    oauth2_scheme,
+    refresh_access_token,
     require_roles,
     update_user,
 )
@@ -34,15 +38,36 @@ async def register(payload: RegisterIn, db: AsyncSession = Depends(get_session))
 
 
 @router.post("/login", response_model=LoginOut, status_code=status.HTTP_200_OK)
-async def login(payload: LoginIn, db: AsyncSession = Depends(get_session)):
-    return await login_account(db, payload)
+async def login(
+    payload: LoginIn,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_session),
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+):
+    client_ip = request.client.host if request.client else None
+    return await login_account(
+        db, payload, client_ip, background_tasks, sessionmaker
+    )
+
+
+@router.post("/refresh", response_model=LoginOut, status_code=status.HTTP_200_OK)
+async def refresh(payload: RefreshIn, db: AsyncSession = Depends(get_session)):
+    return await refresh_access_token(db, payload)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_token(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_session)
+):
+    await logout(db, token)
 
 
 @router.get("/users/{user_id}", response_model=UserOut, status_code=status.HTTP_200_OK)
 async def user(
     user_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     user = await get_user(db, user_id)
     return UserOut.model_validate(user)
@@ -53,7 +78,7 @@ async def update_other_user(
     user_id: int,
     payload: UserUpdateIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     user = await update_user(db, payload, current_user)
     return UserOut.model_validate(user)
@@ -65,7 +90,7 @@ async def update_other_user(
 async def delete_other_user(
     user_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     user = await delete_user(db, user_id)
     return UserOut.model_validate(user)
@@ -74,7 +99,7 @@ async def delete_other_user(
 @router.get("/users/me", response_model=UserOut, status_code=status.HTTP_200_OK)
 async def get_me(
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     user = await get_user(db, current_user.id)
     return UserOut.model_validate(user)
@@ -84,7 +109,7 @@ async def get_me(
 async def update_me(
     payload: UserUpdateIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     user = await update_user(
         db,
@@ -97,7 +122,7 @@ async def update_me(
 @router.delete("/users/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_me(
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     await delete_user(db, current_user.id)
 
@@ -110,7 +135,7 @@ async def delete_me(
 async def register_admin(
     payload: RegisterIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     admin = await create_admin(db, payload)
     return RegisterOut(id=admin.id, email=admin.email, name=admin.name)
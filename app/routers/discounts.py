@@ -1,37 +1,48 @@
 import secrets
-import string
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-
-from app.db.session import get_session
-from app.models.discount_code import DiscountCode
-from app.models.user import User
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import get_session, get_sessionmaker
+from app.models.discount_code import DiscountCode, normalize_code
+from app.services.principals import Principal
 from app.schemas.discounts import (
     DiscountCreate,
     DiscountUpdate,
     DiscountOut,
     DiscountGenerateIn,
+    DiscountBulkGenerateIn,
+    DiscountBatchOut,
 )
+from app.schemas.exports import ExportFormat
 
 
 from app.schemas.discounts import DiscountValidateOut
 from app.services.auth import get_current_user, require_roles
-from app.services.discounts import get_discount_by_code, validate_discount_code
+from app.services.discount_counters import set_counter_shards
+from app.services.discounts import (
+    count_discount_batch,
+    discount_batch_query,
+    forget_discount_code,
+    generate_discount_codes,
+    get_discount_by_code,
+    remember_discount_codes,
+    run_discount_generation,
+    stream_generated_codes,
+    validate_discount_code,
+)
+from app.services.exports import stream_export
 
 
 router = APIRouter()
 
 
-def _gen_code(prefix: str = "", length: int = 8) -> str:
-    alphabet = string.ascii_uppercase + string.digits
-    return prefix + "".join(secrets.choice(alphabet) for _ in range(length))
-
-
 @router.get("", response_model=list[DiscountOut])
 async def list_discounts(
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     res = await db.execute(select(DiscountCode).order_by(DiscountCode.id.desc()))
     return res.scalars().all()
@@ -45,21 +56,31 @@ async def list_discounts(
 async def create_discount(
     payload: DiscountCreate,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
     # case-insensitive uniqueness check
     existing = await db.execute(
-        select(DiscountCode).where(
-            func.lower(DiscountCode.code) == payload.code.lower()
+        select(DiscountCode.id).where(
+            DiscountCode.code_normalized == normalize_code(payload.code)
         )
     )
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=409, detail="Discount code already exists")
 
-    dc = DiscountCode(**payload.model_dump())
+    data = payload.model_dump()
+    counter_shards = data.pop("counter_shards")
+    if counter_shards and payload.single_use:
+        raise HTTPException(
+            status_code=400, detail="Sharded counters are only for multi-use codes"
+        )
+
+    dc = DiscountCode(**data)
     db.add(dc)
     await db.commit()
+    if counter_shards:
+        await set_counter_shards(db, dc, counter_shards)
     await db.refresh(dc)
+    await remember_discount_codes([dc.code])
     return dc
 
 
@@ -68,7 +89,7 @@ async def update_discount(
     discount_id: int,
     payload: DiscountUpdate,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
     res = await db.execute(select(DiscountCode).where(DiscountCode.id == discount_id))
     dc = res.scalar_one_or_none()
@@ -76,10 +97,17 @@ async def update_discount(
         raise HTTPException(status_code=404, detail="Discount code not found")
 
     data = payload.model_dump(exclude_unset=True)
+    counter_shards = data.pop("counter_shards", None)
     for k, v in data.items():
         setattr(dc, k, v)
 
     await db.commit()
+    # Shard quotas are split from max_uses, so a new limit re-splits them
+    if counter_shards is not None or ("max_uses" in data and dc.counter_shards):
+        await set_counter_shards(
+            db, dc, dc.counter_shards if counter_shards is None else counter_shards
+        )
+    forget_discount_code(dc.code)
     await db.refresh(dc)
     return dc
 
@@ -88,48 +116,77 @@ async def update_discount(
 async def generate_discounts(
     payload: DiscountGenerateIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
-    created: list[DiscountCode] = []
-
-    for _ in range(payload.count):
-        # avoid collisions by retrying a few times
-        for _try in range(5):
-            code = _gen_code(prefix=payload.prefix)
-            exists_res = await db.execute(
-                select(DiscountCode.id).where(
-                    func.lower(DiscountCode.code) == code.lower()
-                )
-            )
-            if not exists_res.scalar_one_or_none():
-                break
-        else:
-            raise HTTPException(
-                status_code=500, detail="Failed to generate unique code"
-            )
-
-        dc = DiscountCode(
-            code=code,
-            percent=payload.percent,
-            enabled=payload.enabled,
-            description=payload.description,
-            single_use=payload.single_use,
-            max_uses=payload.max_uses,
+    created = []
+    async for rows in generate_discount_codes(db, payload, secrets.token_hex(16)):
+        created += rows
+    return [DiscountOut.model_validate(row) for row in created]
+
+
+@router.post(
+    "/generate/bulk",
+    status_code=status.HTTP_200_OK,
+    responses={202: {"model": DiscountBatchOut}},
+)
+async def generate_discounts_bulk(
+    payload: DiscountBulkGenerateIn,
+    background_tasks: BackgroundTasks,
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
+):
+    """
+    Stream the new codes as NDJSON, or for large counts start a background
+    job and answer 202 with the batch to poll.
+    """
+    batch_id = secrets.token_hex(16)
+
+    if payload.count <= settings.discount_generate_stream_max:
+        return StreamingResponse(
+            stream_generated_codes(sessionmaker, payload, batch_id),
+            media_type="application/x-ndjson",
+            headers={"X-Batch-Id": batch_id},
         )
-        db.add(dc)
-        created.append(dc)
 
-    await db.commit()
-    for dc in created:
-        await db.refresh(dc)
-    return created
+    background_tasks.add_task(run_discount_generation, sessionmaker, payload, batch_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=DiscountBatchOut(
+            batch_id=batch_id, created=0, requested=payload.count
+        ).model_dump(),
+    )
+
+
+@router.get("/batches/{batch_id}", response_model=DiscountBatchOut)
+async def get_discount_batch(
+    batch_id: str,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
+):
+    return DiscountBatchOut(
+        batch_id=batch_id, created=await count_discount_batch(db, batch_id)
+    )
+
+
+@router.get("/batches/{batch_id}/codes")
+async def export_discount_batch(
+    batch_id: str,
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
+):
+    return StreamingResponse(
+        stream_export(
+            sessionmaker, discount_batch_query(batch_id), ExportFormat.ndjson
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get("/validate/{code}", response_model=DiscountValidateOut)
 async def validate_discount_code_public(
     code: str,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     try:
         dc = await get_discount_by_code(db, code)
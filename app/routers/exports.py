@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.session import get_sessionmaker
+from app.services.principals import Principal
+from app.schemas.exports import ExportFormat
+from app.services.auth import require_roles
+from app.services.exports import (
+    parking_sessions_export_query,
+    payments_export_query,
+    reservations_export_query,
+    stream_export,
+)
+
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def _export_response(
+    name: str,
+    build_query: Callable[..., Select],
+    sessionmaker: async_sessionmaker[AsyncSession],
+    format: ExportFormat,
+    gzip: bool,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    parking_lot_id: Optional[int],
+) -> StreamingResponse:
+    filename = f"{name}.{format.value}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(
+            sessionmaker, build_query(start, end, parking_lot_id), format, gzip
+        ),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/payments")
+async def export_payments(
+    format: ExportFormat = ExportFormat.ndjson,
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return _export_response(
+        "payments",
+        payments_export_query,
+        sessionmaker,
+        format,
+        gzip,
+        start,
+        end,
+        parking_lot_id,
+    )
+
+
+@router.get("/parking_sessions")
+async def export_parking_sessions(
+    format: ExportFormat = ExportFormat.ndjson,
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return _export_response(
+        "parking_sessions",
+        parking_sessions_export_query,
+        sessionmaker,
+        format,
+        gzip,
+        start,
+        end,
+        parking_lot_id,
+    )
+
+
+@router.get("/reservations")
+async def export_reservations(
+    format: ExportFormat = ExportFormat.ndjson,
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return _export_response(
+        "reservations",
+        reservations_export_query,
+        sessionmaker,
+        format,
+        gzip,
+        start,
+        end,
+        parking_lot_id,
+    )
@@ -1,9 +1,11 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_session
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.gate import GateEventIn, GateEventOut, GateIn, GateOut
-from app.services.auth import require_roles
+from app.services.api_keys import ensure_parking_lot_scope
+from app.services.auth import get_gate_client, require_roles
 from app.services.gate import create_gate, handle_gate_event
 
 
@@ -12,8 +14,13 @@ router = APIRouter()
 
 @router.post("/{gate_id}", response_model=GateEventOut, status_code=status.HTTP_200_OK)
 async def on_gate_event(
-    gate_id: int, payload: GateEventIn, db: AsyncSession = Depends(get_session)
+    gate_id: int,
+    payload: GateEventIn,
+    db: AsyncSession = Depends(get_session),
+    client: Optional[Principal] = Depends(get_gate_client),
 ):
+    if client is not None:
+        ensure_parking_lot_scope(client, payload.parking_lot_id)
     return await handle_gate_event(db, payload)
 
 
@@ -21,7 +28,7 @@ async def on_gate_event(
 async def add_gate(
     payload: GateIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     new_gate = await create_gate(db, payload)
     return GateOut(id=new_gate.id, parking_lot_id=new_gate.parking_lot_id)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_session
 
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.parking_lot import ParkingLotIn, ParkingLotOut
 from app.services.auth import get_current_user, require_roles
 from app.services.parking_lots import (
@@ -24,7 +24,7 @@ router = APIRouter()
 async def get_parking_lot(
     parking_lot_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     parking_lot = await retrieve_parking_lot(db, parking_lot_id)
     return ParkingLotOut.model_validate(parking_lot)
@@ -34,7 +34,7 @@ async def get_parking_lot(
 async def add_parking_lot(
     payload: ParkingLotIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
     new_parking_lot = await create_parking_lot(db, payload)
     return ParkingLotOut.model_validate(new_parking_lot)
@@ -47,7 +47,7 @@ async def update_lot(
     parking_lot_id: int,
     payload: ParkingLotIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
     updated = await update_parking_lot(db, parking_lot_id, payload, current_user)
     return ParkingLotOut.model_validate(updated)
@@ -57,6 +57,6 @@ async def update_lot(
 async def delete_lot(
     parking_lot_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin", "hotel_manager")),
+    current_user: Principal = Depends(require_roles("admin", "hotel_manager")),
 ):
     await delete_parking_lot(db, parking_lot_id, current_user)
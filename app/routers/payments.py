@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_session
-from app.models.user import User
-from app.schemas.payment import PaymentIn, PaymentOut
+from app.services.principals import Principal
+from app.schemas.payment import (
+    PaymentBatchIn,
+    PaymentBatchItemOut,
+    PaymentIn,
+    PaymentOut,
+)
+from app.services.api_keys import ensure_parking_lot_scope
 from app.services.auth import require_roles
-from app.services.payments import handle_payment, retrieve_payment
+from app.services.idempotency import run_idempotent
+from app.services.payments import (
+    handle_payment,
+    retrieve_payment,
+    settle_payment_batch,
+)
 
 
 router = APIRouter()
@@ -18,7 +30,7 @@ router = APIRouter()
 async def get_payment(
     payment_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("admin")),
+    current_user: Principal = Depends(require_roles("admin")),
 ):
     payment = await retrieve_payment(db, payment_id, current_user)
     return PaymentOut.model_validate(payment)
@@ -27,8 +39,37 @@ async def get_payment(
 @router.post("/pay", response_model=PaymentOut, status_code=status.HTTP_200_OK)
 async def pay_payment(
     payload: PaymentIn,
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(require_roles("parking_meter")),
+    current_user: Principal = Depends(require_roles("parking_meter")),
 ):
-    payment = await handle_payment(db, payload, current_user)
-    return PaymentOut.model_validate(payment)
+    ensure_parking_lot_scope(current_user, payload.parking_lot_id)
+
+    async def pay() -> PaymentOut:
+        payment = await handle_payment(db, payload, current_user)
+        return PaymentOut.model_validate(payment)
+
+    return await run_idempotent(
+        f"payments.pay:{current_user.id}",
+        idempotency_key,
+        payload,
+        status.HTTP_200_OK,
+        pay,
+    )
+
+
+@router.post(
+    "/pay/batch",
+    response_model=list[PaymentBatchItemOut],
+    status_code=status.HTTP_200_OK,
+)
+async def pay_payment_batch(
+    payload: PaymentBatchIn,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("parking_meter")),
+):
+    for item in payload.payments:
+        ensure_parking_lot_scope(current_user, item.parking_lot_id)
+    return await settle_payment_batch(db, payload.payments, current_user)
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_session
+from app.services.principals import Principal
+from app.schemas.reports import DiscountDayOut, RevenueBucketOut, RevenueGranularity
+from app.services.auth import require_roles
+from app.services.reports import get_discount_report, get_revenue
+
+
+router = APIRouter()
+
+
+@router.get(
+    "/revenue",
+    response_model=list[RevenueBucketOut],
+    status_code=status.HTTP_200_OK,
+)
+async def revenue_report(
+    granularity: RevenueGranularity = RevenueGranularity.hour,
+    parking_lot_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return await get_revenue(db, granularity, parking_lot_id, start, end)
+
+
+@router.get(
+    "/discounts",
+    response_model=list[DiscountDayOut],
+    status_code=status.HTTP_200_OK,
+)
+async def discount_report(
+    discount_code_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(require_roles("admin")),
+):
+    return await get_discount_report(db, discount_code_id, start, end)
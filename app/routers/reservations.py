@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_session
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.reservations import ReservationIn, ReservationOut
 from app.services.auth import get_current_user
+from app.services.idempotency import run_idempotent
 from app.services.reservations import create_reservation, delete_reservation, retrieve_reservation
 
 
@@ -18,7 +20,7 @@ router = APIRouter()
 async def get_reservation(
     reservation_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     reservation = await retrieve_reservation(db, reservation_id, current_user)
     return ReservationOut.model_validate(reservation)
@@ -27,18 +29,30 @@ async def get_reservation(
 @router.post("", response_model=ReservationOut, status_code=status.HTTP_201_CREATED)
 async def add_reservation(
     payload: ReservationIn,
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    # app.services.reservation.py
-    new_res = await create_reservation(db, payload, current_user)
-    return ReservationOut.model_validate(new_res)
+    async def reserve() -> ReservationOut:
+        # app.services.reservation.py
+        new_res = await create_reservation(db, payload, current_user)
+        return ReservationOut.model_validate(new_res)
+
+    return await run_idempotent(
+        f"reservations.create:{current_user.id}",
+        idempotency_key,
+        payload,
+        status.HTTP_201_CREATED,
+        reserve,
+    )
 
 
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_reservation(
     reservation_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     await delete_reservation(db, reservation_id, current_user)
\ No newline at end of file
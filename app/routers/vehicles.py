@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_session
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.vehicle import VehicleIn, VehicleOut
 from app.services.auth import get_current_user
 from app.services.vehicles import (
@@ -19,7 +19,7 @@ router = APIRouter()
 @router.get("", response_model=list[VehicleOut])
 async def list_my_vehicles(
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Get all vehicles for the current user."""
     vehicles = await get_user_vehicles(db, current_user)
@@ -30,7 +30,7 @@ async def list_my_vehicles(
 async def add_vehicle(
     payload: VehicleIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Create a new vehicle."""
     vehicle = await create_vehicle(db, payload, current_user)
@@ -41,7 +41,7 @@ async def add_vehicle(
 async def get_vehicle_by_id(
     vehicle_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Get a specific vehicle."""
     vehicle = await get_vehicle(db, vehicle_id, current_user)
@@ -53,7 +53,7 @@ async def update_vehicle_by_id(
     vehicle_id: int,
     payload: VehicleIn,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Update a vehicle."""
     vehicle = await update_vehicle(db, vehicle_id, payload, current_user)
@@ -64,7 +64,7 @@ async def update_vehicle_by_id(
 async def delete_vehicle_by_id(
     vehicle_id: int,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Delete a vehicle."""
     await delete_vehicle(db, vehicle_id, current_user)
@@ -0,0 +1,25 @@
+from typing import Optional
+from pydantic import BaseModel, constr
+
+
+class ApiKeyIn(BaseModel):
+    user_id: int
+    name: constr(min_length=3, max_length=100)  # pyright: ignore[reportInvalidTypeForm]
+    parking_lot_id: Optional[int] = None
+    gate_id: Optional[int] = None
+
+
+class ApiKeyOut(BaseModel):
+    model_config = {"from_attributes": True}
+    id: int
+    name: str
+    prefix: str
+    user_id: int
+    parking_lot_id: Optional[int] = None
+    gate_id: Optional[int] = None
+    revoked: bool
+
+
+class ApiKeyCreatedOut(ApiKeyOut):
+    # Only returned once, at creation
+    key: str
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr, constr
 
 
@@ -25,6 +26,11 @@ class LoginIn(BaseModel):
 class LoginOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+
+class RefreshIn(BaseModel):
+    refresh_token: str
 
 
 class UserOut(BaseModel):
@@ -12,6 +12,7 @@ class DiscountCreate(BaseModel):
     max_uses: Optional[int] = Field(default=None, ge=1)
     valid_from: Optional[datetime] = None
     valid_until: Optional[datetime] = None
+    counter_shards: int = Field(default=0, ge=0, le=64)
 
 
 class DiscountUpdate(BaseModel):
@@ -22,6 +23,7 @@ class DiscountUpdate(BaseModel):
     max_uses: Optional[int] = Field(default=None, ge=1)
     valid_from: Optional[datetime] = None
     valid_until: Optional[datetime] = None
+    counter_shards: Optional[int] = Field(default=None, ge=0, le=64)
 
 
 class DiscountOut(BaseModel):
@@ -37,6 +39,7 @@ class DiscountOut(BaseModel):
     uses_count: int
     valid_from: Optional[datetime] = None
     valid_until: Optional[datetime] = None
+    counter_shards: int = 0
 
 
 class DiscountGenerateIn(BaseModel):
@@ -49,6 +52,16 @@ class DiscountGenerateIn(BaseModel):
     description: Optional[str] = None
 
 
+class DiscountBulkGenerateIn(DiscountGenerateIn):
+    count: int = Field(default=1000, ge=1, le=1_000_000)
+
+
+class DiscountBatchOut(BaseModel):
+    batch_id: str
+    created: int
+    requested: Optional[int] = None
+
+
 class DiscountValidateOut(BaseModel):
     valid: bool
     code: str
@@ -1,6 +1,7 @@
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
 
 
 # Mirror SQLA Enum so input can be validated
@@ -20,3 +21,30 @@ class PaymentOut(BaseModel):
     amount: float
     completed_at: datetime
     status: PaymentStatus
+
+
+class PaymentBatchItemIn(PaymentIn):
+    # Queued on the meter while offline
+    idempotency_key: str = Field(..., min_length=1, max_length=255)
+    paid_at: datetime
+
+
+class PaymentBatchIn(BaseModel):
+    payments: list[PaymentBatchItemIn] = Field(..., min_length=1, max_length=1000)
+
+
+class PaymentBatchOutcome(str, Enum):
+    settled = "settled"
+    already_paid = "already_paid"
+    not_found = "not_found"
+    duplicate = "duplicate"
+    # Before the session started or in the future: a skewed meter clock
+    invalid_paid_at = "invalid_paid_at"
+    # More than one active session or pending payment for the plate
+    conflict = "conflict"
+
+
+class PaymentBatchItemOut(BaseModel):
+    idempotency_key: str
+    outcome: PaymentBatchOutcome
+    payment: Optional[PaymentOut] = None
@@ -0,0 +1,26 @@
+from datetime import date, datetime
+from enum import Enum
+from pydantic import BaseModel, ConfigDict
+
+
+class RevenueGranularity(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+class RevenueBucketOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    parking_lot_id: int
+    bucket_start: datetime
+    amount: float
+    payments_count: int
+
+
+class DiscountDayOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    discount_code_id: int
+    code: str
+    day: date
+    redemptions: int
+    original_amount: float
+    discount_amount: float
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.services.reports import rebuild_discount_rollups
+
+
+async def backfill() -> int:
+    async with AsyncSessionLocal() as db:
+        return await rebuild_discount_rollups(db)
+
+
+def main() -> None:
+    days = asyncio.run(backfill())
+    print(f"Discount rollups rebuilt: {days} code/day rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.services.reports import rebuild_revenue_rollups
+
+
+async def backfill() -> int:
+    async with AsyncSessionLocal() as db:
+        return await rebuild_revenue_rollups(db)
+
+
+def main() -> None:
+    buckets = asyncio.run(backfill())
+    print(f"Revenue rollups rebuilt: {buckets} lot/hour buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Recommend Argon2id parameters for this machine.
+
+Measures hash time for a range of memory costs and picks the most expensive
+parameters that stay under the target latency, then checks that the hashing
+pool can sustain the expected login rate with them.
+
+    python -m app.scripts.calibrate_argon2 [--target-ms 250] [--logins-per-second 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.security import make_hasher
+
+PASSWORD = "correct horse battery staple"
+# 19 MiB is the OWASP minimum for Argon2id
+MEMORY_COSTS_KIB = [19 * 1024, 32 * 1024, 64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024]
+MAX_TIME_COST = 10
+
+
+def measure_ms(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    hasher = make_hasher(time_cost, memory_cost, parallelism)
+    hasher.hash(PASSWORD)  # first call allocates
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash(PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    target_ms: float, parallelism: int, max_memory_kib: int, samples: int
+) -> list[dict]:
+    """Largest time cost under target_ms for every memory cost that fits."""
+    candidates = []
+    for memory_cost in MEMORY_COSTS_KIB:
+        if memory_cost > max_memory_kib:
+            break
+        base_ms = measure_ms(1, memory_cost, parallelism, samples)
+        if base_ms > target_ms:
+            break
+
+        # Time grows about linearly with time_cost; confirm the estimate
+        time_cost = min(MAX_TIME_COST, max(1, int(target_ms // base_ms)))
+        hash_ms = measure_ms(time_cost, memory_cost, parallelism, samples)
+        while time_cost > 1 and hash_ms > target_ms:
+            time_cost -= 1
+            hash_ms = measure_ms(time_cost, memory_cost, parallelism, samples)
+        while time_cost < MAX_TIME_COST:
+            next_ms = measure_ms(time_cost + 1, memory_cost, parallelism, samples)
+            if next_ms > target_ms:
+                break
+            time_cost, hash_ms = time_cost + 1, next_ms
+
+        candidates.append(
+            {
+                "memory_cost": memory_cost,
+                "time_cost": time_cost,
+                "parallelism": parallelism,
+                "hash_ms": round(hash_ms, 1),
+            }
+        )
+    return candidates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--parallelism", type=int, default=settings.argon2_parallelism)
+    parser.add_argument("--max-memory-mib", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=settings.password_hash_workers)
+    parser.add_argument("--logins-per-second", type=float, default=None)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    current_ms = measure_ms(
+        settings.argon2_time_cost,
+        settings.argon2_memory_cost,
+        settings.argon2_parallelism,
+        args.samples,
+    )
+    print(
+        f"current: m={settings.argon2_memory_cost} t={settings.argon2_time_cost} "
+        f"p={settings.argon2_parallelism} -> {current_ms:.1f} ms"
+    )
+
+    candidates = calibrate(
+        args.target_ms, args.parallelism, args.max_memory_mib * 1024, args.samples
+    )
+    for c in candidates:
+        print(
+            f"m={c['memory_cost']} t={c['time_cost']} p={c['parallelism']} "
+            f"-> {c['hash_ms']} ms"
+        )
+    if not candidates:
+        print(f"No parameters hash within {args.target_ms} ms on this machine")
+        return
+
+    # Memory is what makes GPU attacks expensive, so prefer it over passes
+    best = candidates[-1]
+    throughput = args.workers * 1000 / best["hash_ms"]
+    print(
+        f"\nrecommended ({args.workers} hashing workers, "
+        f"~{throughput:.1f} logins/s, "
+        f"{args.workers * best['memory_cost'] // 1024} MiB peak):"
+    )
+    print(f"ARGON2_TIME_COST={best['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={best['memory_cost']}")
+    print(f"ARGON2_PARALLELISM={best['parallelism']}")
+
+    if args.logins_per_second and throughput < args.logins_per_second:
+        workers = math.ceil(args.logins_per_second * best["hash_ms"] / 1000)
+        print(
+            f"PASSWORD_HASH_WORKERS={workers}"
+            f"  # {args.workers} workers cannot sustain {args.logins_per_second}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Exports the tables in the legacy formats the import_* scripts consume.
+
+Each table is streamed through a server-side cursor into <table>.json (a
+JSON array, as the legacy API serves it) and/or <table>.ndjson (one object
+per line, for analytics), with the keys and values the importers read
+back. Tables export in parallel on a process pool. All of them read one
+exported snapshot, so the files are consistent with each other: every
+reference points at an exported row. Rows the legacy format has no place
+for, such as drive-up reservations without a user, come out with null ids,
+which the importers reject. Reservations and payments have no natural key,
+so importing files back into the database they came from takes --own-ids,
+which maps rows that still exist onto themselves.
+
+    python -m app.scripts.export_all --out DIR [--format json ndjson]
+        [--password-hashes]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Optional
+
+from sqlalchemy import Select, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.models.parking_lot import ParkingLot
+from app.models.payment import Payment
+from app.models.reservation import Reservation
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.scripts.import_pipeline import STEPS
+from app.services.exports import EXPORT_CHUNK_ROWS
+
+FORMATS = ("json", "ndjson")
+
+# Legacy item keys, as the import_* scripts pick them
+EXPORTS: dict[str, Select] = {
+    "users": select(
+        User.id,
+        User.email,
+        User.username,
+        User.name,
+        User.phone,
+        User.role,
+        User.active,
+        User.birth_year,
+        User.password_hash,
+    ).order_by(User.id),
+    "parking_lots": select(
+        ParkingLot.id,
+        ParkingLot.name,
+        ParkingLot.location,
+        ParkingLot.address,
+        ParkingLot.capacity,
+        ParkingLot.reserved,
+        ParkingLot.tariff,
+        ParkingLot.daytariff,
+        ParkingLot.latitude,
+        ParkingLot.longitude,
+        ParkingLot.created_by,
+    ).order_by(ParkingLot.id),
+    "vehicles": select(
+        Vehicle.id,
+        Vehicle.user_id,
+        Vehicle.license_plate,
+        Vehicle.make,
+        Vehicle.model,
+        Vehicle.color,
+        Vehicle.year,
+    ).order_by(Vehicle.id),
+    "reservations": select(
+        Reservation.id,
+        Reservation.user_id,
+        Reservation.vehicle_id,
+        Reservation.parking_lot_id,
+        Reservation.license_plate,
+        Reservation.planned_start.label("start_time"),
+        Reservation.planned_end.label("end_time"),
+        Reservation.status,
+        Reservation.quoted_cost.label("cost"),
+    ).order_by(Reservation.id),
+    "payments": select(
+        Payment.id,
+        Payment.user_id,
+        Payment.reservation_id,
+        Payment.amount,
+        Payment.completed_at,
+    ).order_by(Payment.id),
+}
+
+
+@dataclass
+class ExportStats:
+    table: str
+    rows: int = 0
+    # Across the files written
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        mb_rate = self.bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.table}: {self.rows} rows, {self.bytes / 1024 / 1024:.1f} MB "
+            f"in {self.seconds:.1f}s, {rate:,.0f} rows/s, {mb_rate:.1f} MB/s"
+        )
+
+
+@dataclass(frozen=True)
+class ExportJob:
+    table: str
+    out_dir: Path
+    formats: tuple[str, ...]
+    database_url: str
+    # pg_export_snapshot() of the coordinating transaction
+    snapshot: str
+    fetch_rows: int = EXPORT_CHUNK_ROWS
+    # Only on request: the files often go where hashes must not
+    password_hashes: bool = False
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Legacy files use UTC with a "Z"; naive columns hold UTC already
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat() + "Z"
+    raise TypeError(f"Cannot export {value!r}")
+
+
+_encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False)
+
+
+def output_path(out_dir: Path, table: str, fmt: str) -> Path:
+    return out_dir / Path(STEPS[table].filename).with_suffix(f".{fmt}")
+
+
+async def _export(job: ExportJob) -> ExportStats:
+    stats = ExportStats(job.table)
+    started = time.perf_counter()
+    stmt = EXPORTS[job.table]
+    if not job.password_hashes:
+        stmt = stmt.with_only_columns(
+            *(c for c in stmt.selected_columns if c.name != "password_hash")
+        )
+
+    # Written next to the target and renamed when complete
+    parts = {fmt: output_path(job.out_dir, job.table, fmt) for fmt in job.formats}
+    files: dict[str, IO[str]] = {
+        fmt: open(f"{path}.part", "w", encoding="utf-8") for fmt, path in parts.items()
+    }
+    engine = create_async_engine(job.database_url, poolclass=NullPool)
+    done = False
+    try:
+        if "json" in files:
+            files["json"].write("[")
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+            async with conn.begin():
+                await conn.execute(text(f"SET TRANSACTION SNAPSHOT '{job.snapshot}'"))
+                result = await conn.stream(
+                    stmt.execution_options(yield_per=job.fetch_rows)
+                )
+                async for rows in result.mappings().partitions():
+                    items = [_encoder.encode(dict(row)) for row in rows]
+                    if "json" in files:
+                        lead = ",\n" if stats.rows else "\n"
+                        files["json"].write(lead + ",\n".join(items))
+                    if "ndjson" in files:
+                        files["ndjson"].write("\n".join(items) + "\n")
+                    stats.rows += len(items)
+        if "json" in files:
+            files["json"].write("\n]\n")
+        done = True
+    finally:
+        for fmt, f in files.items():
+            f.close()
+            if done:
+                os.replace(f.name, parts[fmt])
+            else:
+                os.remove(f.name)
+        await engine.dispose()
+
+    stats.bytes = sum(path.stat().st_size for path in parts.values())
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def run_export(job: ExportJob) -> ExportStats:
+    """Pool entry point: one table."""
+    return asyncio.run(_export(job))
+
+
+async def export_all(
+    out_dir: Path,
+    formats: tuple[str, ...] = ("json",),
+    workers: int = len(EXPORTS),
+    fetch_rows: int = EXPORT_CHUNK_ROWS,
+    password_hashes: bool = False,
+    database_url: Optional[str] = None,
+) -> dict[str, ExportStats]:
+    database_url = database_url or settings.database_url
+    out_dir.mkdir(parents=True, exist_ok=True)
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+            # The snapshot stays importable while this transaction is open
+            async with conn.begin():
+                snapshot = (
+                    await conn.execute(text("SELECT pg_export_snapshot()"))
+                ).scalar_one()
+                jobs = [
+                    ExportJob(
+                        table,
+                        out_dir,
+                        formats,
+                        database_url,
+                        snapshot,
+                        fetch_rows,
+                        password_hashes,
+                    )
+                    for table in EXPORTS
+                ]
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+
+                    async def export(job: ExportJob) -> ExportStats:
+                        stats = await loop.run_in_executor(pool, run_export, job)
+                        print(stats, flush=True)
+                        return stats
+
+                    results = await asyncio.gather(*(export(job) for job in jobs))
+    finally:
+        await engine.dispose()
+    return {stats.table: stats for stats in results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["json"])
+    parser.add_argument("--workers", type=int, default=len(EXPORTS))
+    parser.add_argument("--fetch-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument(
+        "--password-hashes",
+        action="store_true",
+        help="include password hashes in users, e.g. for a full migration",
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = asyncio.run(
+        export_all(
+            args.out,
+            tuple(args.format),
+            args.workers,
+            args.fetch_rows,
+            password_hashes=args.password_hashes,
+        )
+    )
+    rows = sum(s.rows for s in stats.values())
+    elapsed = time.perf_counter() - started
+    print(f"Export complete: {rows} rows in {elapsed:.1f}s to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
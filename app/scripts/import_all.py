@@ -1,39 +1,74 @@
 from __future__ import annotations
 
-from app.db.session import SessionLocal
-from app.scripts.import_common import ImportContext
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
 
-from app.scripts.import_users import import_users
-from app.scripts.import_parking_lots import import_parking_lots
-from app.scripts.import_vehicles import import_vehicles
-from app.scripts.import_reservations import import_reservations
-from app.scripts.import_payments import import_payments
+from app.scripts import import_common
+from app.scripts.import_engine import CHUNK_ROWS
+from app.scripts.import_pipeline import (
+    PARTITION_BYTES,
+    PARTITION_ITEMS,
+    ImportPipeline,
+)
+from app.scripts.import_validate import validate_all, write_report
 
 
 def main() -> None:
-    ctx = ImportContext.empty()
-    db = SessionLocal()
-    try:
-        # Order matters because of foreign keys
-        import_users(db, ctx, "users.json")
-        import_parking_lots(db, ctx, "parking_lots.json")
-        import_vehicles(db, ctx, "vehicles.json")
-        import_reservations(db, ctx, "reservations.json")
-        import_payments(db, ctx, "payments.json")
-
-        print("Import complete")
-        print(
-            f"Users={len(ctx.user_id_map)} "
-            f"Lots={len(ctx.lot_id_map)} "
-            f"Vehicles={len(ctx.vehicle_id_map)} "
-            f"Reservations={len(ctx.reservation_id_map)} "
-            f"Payments={len(ctx.payment_id_map)}"
-        )
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    parser = argparse.ArgumentParser(description="Import the legacy data files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--partition-mb", type=int, default=PARTITION_BYTES // (1024 * 1024)
+    )
+    parser.add_argument("--partition-items", type=int, default=PARTITION_ITEMS)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="forget checkpoints and id maps of earlier runs",
+    )
+    parser.add_argument(
+        "--own-ids",
+        action="store_true",
+        help="the files were exported from this database by export_all: "
+        "rows that still exist are kept instead of inserted again",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only validate the data files; the database is not touched",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=Path("import_dry_run.json"),
+        help="where --dry-run writes its error report",
+    )
+    args = parser.parse_args()
+
+    if args.dry_run:
+        reports = validate_all(import_common.DATA_DIR, args.workers)
+        for report in reports:
+            print(report)
+        write_report(reports, args.report)
+        problems = sum(report.invalid for report in reports)
+        print(f"Dry run: {problems} problems, report written to {args.report}")
+        sys.exit(1 if problems else 0)
+
+    pipeline = ImportPipeline(
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        partition_bytes=args.partition_mb * 1024 * 1024,
+        partition_items=args.partition_items,
+        restart=args.restart,
+        own_ids=args.own_ids,
+    )
+    stats = asyncio.run(pipeline.run())
+
+    print("Import complete")
+    print(" ".join(f"{table}={s.rows}" for table, s in stats.items()))
 
 
 if __name__ == "__main__":
@@ -1,25 +1,38 @@
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import os
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, Optional
 
-from sqlalchemy.orm import Session
+from app.scripts.json_stream import iter_json_array
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+# "auto" uses ijson when installed, "python" forces the built-in reader
+JSON_BACKEND = os.getenv("IMPORT_JSON_BACKEND", "auto")
 
 
-def load_json(filename: str) -> list[dict]:
+def iter_json(filename: str) -> Iterator[dict]:
+    """Stream the items of a data file holding a JSON array of objects."""
     path = DATA_DIR / filename
     if not path.exists():
         raise FileNotFoundError(f"Missing data file: {path}")
-    content = path.read_text(encoding="utf-8")
-    data = json.loads(content)
-    if not isinstance(data, list):
-        raise ValueError(f"{filename} must contain a JSON array (list of objects).")
-    return data
+    return iter_json_array(path, backend=JSON_BACKEND)
+
+
+class UnmappedReference(ValueError):
+    """A legacy foreign key whose row is not in the id map."""
+
+    def __init__(self, message: str, field: str, legacy_id: Any):
+        super().__init__(message)
+        self.field = field
+        self.legacy_id = legacy_id
+
+
+class InvalidDatetime(ValueError):
+    pass
 
 
 @dataclass
@@ -29,6 +42,8 @@ class ImportContext:
     lot_id_map: Dict[Any, int]
     reservation_id_map: Dict[Any, int]
     payment_id_map: Dict[Any, int]
+    # One per job, so it sniffs the datetime format of the file being read
+    parse_dt: "DatetimeParser" = field(default_factory=lambda: DatetimeParser())
 
     @staticmethod
     def empty() -> "ImportContext":
@@ -71,9 +86,93 @@ def parse_dt(value: Any) -> Optional[datetime]:
                     return datetime.strptime(s, fmt)
                 except ValueError:
                     pass
-    raise ValueError(f"Unsupported datetime value: {value!r}")
+    raise InvalidDatetime(f"Unsupported datetime value: {value!r}")
+
+
+# Fast paths by the kind of value they take
+_FAST_PATHS: dict[str, Callable[[Any], datetime]] = {
+    # Python 3.11 also accepts "Z", a space separator and plain dates
+    "iso": datetime.fromisoformat,
+    "epoch": datetime.fromtimestamp,
+}
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "epoch"
+    if isinstance(value, str):
+        try:
+            datetime.fromisoformat(value)
+            return "iso"
+        except ValueError:
+            pass
+    return "other"
+
+
+class DatetimeParser:
+    """
+    parse_dt for the values of one file.
+
+    The first sample_size values go through parse_dt while their kind is
+    counted; after that the dominant kind gets a direct call (e.g. straight
+    to datetime.fromisoformat). Values the fast path rejects go through
+    parse_dt, memoized up to cache_size distinct values, since files repeat
+    them; if they become common the format is sniffed again, and less often
+    each time the answer stays the same.
+    """
 
+    def __init__(self, sample_size: int = 1000, cache_size: int = 100_000):
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self._cache: dict[Any, Optional[datetime]] = {}
+        self._kinds: Counter = Counter()
+        self._fast: Optional[Callable[[Any], datetime]] = None
+        self._dominant: Optional[str] = None
+        self._misses = 0
+        self._miss_limit = sample_size // 2
+
+    def __call__(self, value: Any) -> Optional[datetime]:
+        if value is None:
+            return None
+        fast = self._fast
+        if fast is None:
+            return self._sniff(value)
+        try:
+            return fast(value)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return self._miss(value)
+
+    def _sniff(self, value: Any) -> Optional[datetime]:
+        parsed = parse_dt(value)
+        self._kinds[_kind(value)] += 1
+        if sum(self._kinds.values()) >= self.sample_size:
+            dominant = self._kinds.most_common(1)[0][0]
+            if dominant == self._dominant:
+                # Mixed formats, not a change; stop re-sniffing all the time
+                self._miss_limit *= 2
+            self._dominant = dominant
+            self._fast = _FAST_PATHS.get(dominant, self._slow)
+            self._kinds.clear()
+            self._misses = 0
+        return parsed
+
+    def _slow(self, value: Any) -> Optional[datetime]:
+        # A lookup costs about as much as fromisoformat, so only this is cached
+        try:
+            return self._cache[value]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable, parse_dt rejects it
+            return parse_dt(value)
+        parsed = parse_dt(value)
+        if len(self._cache) < self.cache_size:
+            self._cache[value] = parsed
+        return parsed
 
-def commit_every(db: Session, i: int, chunk: int = 500) -> None:
-    if i % chunk == 0:
-        db.commit()
+    def _miss(self, value: Any) -> Optional[datetime]:
+        parsed = self._slow(value)
+        self._misses += 1
+        if self._misses > self._miss_limit:
+            # The file changed format partway; sniff again
+            self._fast = None
+        return parsed
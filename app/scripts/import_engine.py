@@ -0,0 +1,375 @@
+"""
+Set-based loader shared by the import_* scripts.
+
+Per table, the natural keys already in the database are preloaded in one
+query, items are mapped to rows in Python, and rows are loaded in chunks:
+COPY into a temporary staging table, ids drawn from the table's sequence
+there, then one INSERT ... SELECT (and one UPDATE for rows that already
+existed). The staging table hands back the new ids to fill ImportContext.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import String, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.models.import_id_map import ImportIdMap
+from app.scripts.import_common import ImportContext, pick
+
+STAGING = "import_staging"
+CHUNK_ROWS = 50_000
+ID_MAP = ImportIdMap.__tablename__
+
+
+@dataclass
+class TableSpec:
+    table: Table
+    # ImportContext attribute mapping legacy ids to new ids
+    id_map: str
+    legacy_keys: tuple[str, ...]
+    # Maps an item to {column: value}; raises ValueError for bad items
+    to_row: Callable[[dict, ImportContext], dict[str, Any]]
+    columns: tuple[str, ...]
+    # Columns identifying a row that already exists; empty means always insert
+    natural_key: tuple[str, ...] = ()
+    # Overwritten on existing rows
+    update_columns: tuple[str, ...] = ()
+    # Set on existing rows only where they are empty
+    fill_columns: tuple[str, ...] = ()
+    # Runs against the filled staging table before the INSERT
+    before_insert: Optional[Callable[[AsyncConnection], Awaitable[None]]] = None
+
+
+@dataclass
+class ImportStats:
+    table: str
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    seconds: float = 0.0
+    # Unchanged since a completed import
+    skipped: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        if self.skipped:
+            return f"{self.table}: unchanged since the last import, skipped"
+        return (
+            f"{self.table}: {self.rows} rows ({self.inserted} inserted, "
+            f"{self.updated} updated) in {self.seconds:.1f}s, "
+            f"{self.rows_per_second:,.0f} rows/s"
+        )
+
+
+@dataclass
+class _Chunk:
+    # New rows; their legacy ids, and later legacy ids for the same natural key
+    rows: list[dict[str, Any]] = field(default_factory=list)
+    legacy_ids: list[list[Any]] = field(default_factory=list)
+    # Existing id -> row for update_columns / fill_columns; one source row
+    # per target for the UPDATE ... FROM, the last item for a key wins
+    existing: dict[int, dict[str, Any]] = field(default_factory=dict)
+    # Legacy ids resolved to rows that already existed
+    known_ids: dict[Any, int] = field(default_factory=dict)
+    pending: dict[tuple, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.existing) + len(self.known_ids)
+
+
+async def copy_records(
+    conn: AsyncConnection, table: str, columns: list[str], records: list[tuple]
+) -> None:
+    """COPY records into table, in the caller's transaction."""
+    raw = await conn.get_raw_connection()
+    driver = conn.dialect.driver
+    if driver == "asyncpg":
+        await raw.driver_connection.copy_records_to_table(
+            table, records=records, columns=columns
+        )
+    elif driver == "psycopg":
+        statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        async with raw.driver_connection.cursor() as cursor:
+            async with cursor.copy(statement) as copy:
+                for record in records:
+                    await copy.write_row(record)
+    else:
+        raise RuntimeError(f"COPY is not supported with the {driver} driver")
+
+
+async def record_ids(
+    conn: AsyncConnection, table: str, id_map: dict[Any, int]
+) -> None:
+    """Add legacy -> new ids to the id map table, in the caller's transaction."""
+    if not id_map:
+        return
+    await conn.execute(
+        text(
+            f"CREATE TEMP TABLE import_id_staging ON COMMIT DROP AS "
+            f"SELECT legacy_id, new_id FROM {ID_MAP} WITH NO DATA"
+        )
+    )
+    # JSON keeps 1 and "1" apart, as they are in the legacy files
+    await copy_records(
+        conn,
+        "import_id_staging",
+        ["legacy_id", "new_id"],
+        [(json.dumps(legacy), new) for legacy, new in id_map.items()],
+    )
+    await conn.execute(
+        text(
+            f"INSERT INTO {ID_MAP} (table_name, legacy_id, new_id) "
+            f"SELECT :table, legacy_id, new_id FROM import_id_staging "
+            f"ON CONFLICT (table_name, legacy_id) "
+            f"DO UPDATE SET new_id = EXCLUDED.new_id"
+        ),
+        {"table": table},
+    )
+    await conn.execute(text("DROP TABLE import_id_staging"))
+
+
+async def load_id_map(conn: AsyncConnection, table: str) -> dict[Any, int]:
+    result = await conn.execute(
+        text(f"SELECT legacy_id, new_id FROM {ID_MAP} WHERE table_name = :table"),
+        {"table": table},
+    )
+    return {json.loads(legacy): new for legacy, new in result}
+
+
+async def mapped_ids(
+    conn: AsyncConnection, table: str, legacy_ids: list[Any]
+) -> dict[Any, int]:
+    """The subset of legacy_ids already in the id map table."""
+    if not legacy_ids:
+        return {}
+    result = await conn.execute(
+        text(
+            f"SELECT legacy_id, new_id FROM {ID_MAP} "
+            f"WHERE table_name = :table AND legacy_id = ANY(:legacy_ids)"
+        ),
+        {"table": table, "legacy_ids": [json.dumps(legacy) for legacy in legacy_ids]},
+    )
+    return {json.loads(legacy): new for legacy, new in result}
+
+
+async def existing_ids(
+    conn: AsyncConnection, table: str, ids: list[Any]
+) -> dict[Any, int]:
+    """The subset of ids that are ids of rows in table, mapped onto themselves."""
+    ids = [i for i in ids if isinstance(i, int)]
+    if not ids:
+        return {}
+    result = await conn.execute(
+        text(f"SELECT id FROM {table} WHERE id = ANY(:ids)"), {"ids": ids}
+    )
+    return {row_id: row_id for row_id in result.scalars()}
+
+
+async def preload_keys(conn: AsyncConnection, spec: TableSpec) -> dict[tuple, int]:
+    """Natural key -> id for every row already in the table, in one query."""
+    if not spec.natural_key:
+        return {}
+    key_columns = ", ".join(spec.natural_key)
+    result = await conn.execute(
+        text(f"SELECT {key_columns}, id FROM {spec.table.name}")
+    )
+    return {tuple(row[:-1]): row[-1] for row in result}
+
+
+def _copy_value(value: Any) -> Any:
+    # Enums go over COPY as their text value
+    return getattr(value, "value", value)
+
+
+async def _load_chunk(
+    conn: AsyncConnection, spec: TableSpec, chunk: _Chunk
+) -> tuple[list[int], int]:
+    """Load one chunk in the caller's transaction; new ids in row order."""
+    table = spec.table.name
+    columns = ", ".join(spec.columns)
+
+    # CREATE TABLE AS keeps the column types but none of the NOT NULLs, so
+    # ids and columns that before_insert fills in can start out empty
+    await conn.execute(
+        text(
+            f"CREATE TEMP TABLE {STAGING} ON COMMIT DROP AS "
+            f"SELECT id, {columns} FROM {table} WITH NO DATA"
+        )
+    )
+    await conn.execute(text(f"ALTER TABLE {STAGING} ADD COLUMN import_row integer"))
+
+    records = [
+        (None, *(_copy_value(row[c]) for c in spec.columns), i)
+        for i, row in enumerate(chunk.rows)
+    ]
+    records += [
+        (row_id, *(_copy_value(row[c]) for c in spec.columns), None)
+        for row_id, row in chunk.existing.items()
+    ]
+    await copy_records(conn, STAGING, ["id", *spec.columns, "import_row"], records)
+
+    await conn.execute(
+        text(
+            f"UPDATE {STAGING} "
+            f"SET id = nextval(pg_get_serial_sequence('{table}', 'id')) "
+            f"WHERE import_row IS NOT NULL"
+        )
+    )
+    if spec.before_insert is not None:
+        await spec.before_insert(conn)
+    await conn.execute(
+        text(
+            f"INSERT INTO {table} (id, {columns}) "
+            f"SELECT id, {columns} FROM {STAGING} WHERE import_row IS NOT NULL"
+        )
+    )
+
+    updated = 0
+    if chunk.existing and (spec.update_columns or spec.fill_columns):
+        assignments = [f"{c} = s.{c}" for c in spec.update_columns]
+        for c in spec.fill_columns:
+            current = f"{table}.{c}"
+            if isinstance(spec.table.c[c].type, String):
+                current = f"NULLIF({current}, '')"
+            assignments.append(f"{c} = COALESCE({current}, s.{c})")
+        result = await conn.execute(
+            text(
+                f"UPDATE {table} SET {', '.join(assignments)} FROM {STAGING} s "
+                f"WHERE {table}.id = s.id AND s.import_row IS NULL"
+            )
+        )
+        updated = result.rowcount
+
+    result = await conn.execute(
+        text(
+            f"SELECT import_row, id FROM {STAGING} "
+            f"WHERE import_row IS NOT NULL ORDER BY import_row"
+        )
+    )
+    return [row_id for _, row_id in result], updated
+
+
+def _drop_known(chunk: _Chunk, done: dict[Any, int]) -> None:
+    # Rows that are already in the table become mappings to their ids
+    if not done:
+        return
+    rows, legacy_ids = [], []
+    for row, ids in zip(chunk.rows, chunk.legacy_ids):
+        row_id = next((done[i] for i in ids if i in done), None)
+        if row_id is None:
+            rows.append(row)
+            legacy_ids.append(ids)
+        else:
+            chunk.known_ids.update((i, row_id) for i in ids)
+    chunk.rows, chunk.legacy_ids = rows, legacy_ids
+
+
+async def _drop_mapped(conn: AsyncConnection, spec: TableSpec, chunk: _Chunk) -> None:
+    # Loaded by an earlier run
+    legacy_ids = [i for ids in chunk.legacy_ids for i in ids]
+    _drop_known(chunk, await mapped_ids(conn, spec.table.name, legacy_ids))
+
+
+async def _drop_existing(
+    conn: AsyncConnection, spec: TableSpec, chunk: _Chunk
+) -> None:
+    # Exported from this database
+    legacy_ids = [i for ids in chunk.legacy_ids for i in ids]
+    _drop_known(chunk, await existing_ids(conn, spec.table.name, legacy_ids))
+
+
+async def bulk_import(
+    engine: AsyncEngine,
+    spec: TableSpec,
+    ctx: ImportContext,
+    items: Iterable[dict],
+    chunk_rows: int = CHUNK_ROWS,
+    share_ids: bool = False,
+    start_at: int = 0,
+    checkpoint: Optional[Callable[[AsyncConnection, int], Awaitable[None]]] = None,
+    skip_mapped: bool = False,
+    own_ids: bool = False,
+) -> ImportStats:
+    """
+    Import items into spec.table, one transaction per chunk of rows.
+
+    With share_ids, every chunk also writes its legacy ids to the id map
+    table, and checkpoint(conn, items) records how many items are done, both
+    in the chunk's transaction. start_at skips items a previous run
+    committed; skip_mapped drops items whose legacy id is already mapped,
+    for reruns where that is not known exactly. own_ids is for files that
+    export_all wrote from this same database: the legacy ids are ids of
+    its rows, and items whose row still exists map onto it instead of
+    being inserted again.
+    """
+    stats = ImportStats(spec.table.name)
+    started = time.perf_counter()
+    id_map: dict[Any, int] = getattr(ctx, spec.id_map)
+
+    async with engine.connect() as conn:
+        known = await preload_keys(conn, spec)
+
+    async def flush(chunk: _Chunk) -> None:
+        async with engine.begin() as conn:
+            if skip_mapped:
+                await _drop_mapped(conn, spec, chunk)
+            if own_ids:
+                await _drop_existing(conn, spec, chunk)
+            new_ids, updated = [], 0
+            if chunk.rows or chunk.existing:
+                new_ids, updated = await _load_chunk(conn, spec, chunk)
+            mapped = dict(chunk.known_ids)
+            for legacy_ids, row_id in zip(chunk.legacy_ids, new_ids):
+                mapped.update((legacy_id, row_id) for legacy_id in legacy_ids)
+            if share_ids:
+                await record_ids(conn, spec.table.name, mapped)
+            if checkpoint is not None:
+                await checkpoint(conn, start_at + stats.rows)
+
+        for row, row_id in zip(chunk.rows, new_ids):
+            if spec.natural_key:
+                known[tuple(row[c] for c in spec.natural_key)] = row_id
+        id_map.update(mapped)
+        stats.inserted += len(new_ids)
+        stats.updated += updated
+
+    chunk = _Chunk()
+    for item in itertools.islice(items, start_at, None):
+        stats.rows += 1
+        row = spec.to_row(item, ctx)
+        legacy_id = pick(item, *spec.legacy_keys)
+        key = tuple(row[c] for c in spec.natural_key) if spec.natural_key else None
+
+        if key is not None and key in known:
+            if legacy_id is not None:
+                chunk.known_ids[legacy_id] = known[key]
+            if spec.update_columns or spec.fill_columns:
+                chunk.existing[known[key]] = row
+        elif key is not None and key in chunk.pending:
+            # Same natural key twice in the file: one row, both legacy ids
+            if legacy_id is not None:
+                chunk.legacy_ids[chunk.pending[key]].append(legacy_id)
+        else:
+            if key is not None:
+                chunk.pending[key] = len(chunk.rows)
+            chunk.rows.append(row)
+            chunk.legacy_ids.append([] if legacy_id is None else [legacy_id])
+
+        if len(chunk) >= chunk_rows:
+            await flush(chunk)
+            chunk = _Chunk()
+
+    if len(chunk):
+        await flush(chunk)
+
+    stats.seconds = time.perf_counter() - started
+    return stats
@@ -1,23 +1,13 @@
 from __future__ import annotations
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 from app.models.parking_lot import ParkingLot
-from app.scripts.import_common import ImportContext, load_json, pick, commit_every
+from app.scripts.import_common import ImportContext, iter_json, pick
+from app.scripts.import_engine import CHUNK_ROWS, ImportStats, TableSpec, bulk_import
 
 
-def _find_existing_lot(db: Session, name: str, address: str) -> ParkingLot | None:
-    return (
-        db.query(ParkingLot)
-        .filter(ParkingLot.name == name)
-        .filter(ParkingLot.address == address)
-        .first()
-    )
-
-
-def import_parking_lots(
-    db: Session, ctx: ImportContext, filename: str = "parking_lots.json"
-) -> None:
+def parking_lot_row(item: dict, ctx: ImportContext) -> dict:
     """
     Expected JSON item keys (flexible):
     - id / lot_id
@@ -25,41 +15,60 @@ def import_parking_lots(
     - capacity, reserved
     - tariff, daytariff
     - latitude, longitude
+    - created_by (optional)
     """
-    items = load_json(filename)
+    name = pick(item, "name")
+    address = pick(item, "address")
+    if not name or not address:
+        raise ValueError(f"ParkingLot missing name/address: {item}")
 
-    for i, item in enumerate(items, start=1):
-        old_id = pick(item, "id", "lot_id", "parking_lot_id", "parkingLotId")
+    return {
+        "name": name,
+        "location": pick(item, "location", default=""),
+        "address": address,
+        "capacity": int(pick(item, "capacity", default=0) or 0),
+        "reserved": int(pick(item, "reserved", default=0) or 0),
+        "tariff": float(pick(item, "tariff", default=0.0) or 0.0),
+        "daytariff": float(pick(item, "daytariff", "day_tariff", default=0.0) or 0.0),
+        "latitude": float(pick(item, "latitude", "lat", default=0.0) or 0.0),
+        "longitude": float(pick(item, "longitude", "lng", "lon", default=0.0) or 0.0),
+        "created_by": int(pick(item, "created_by", "createdBy", default=0) or 0),
+    }
 
-        name = pick(item, "name")
-        address = pick(item, "address")
-        location = pick(item, "location", default="")
-        if not name or not address:
-            raise ValueError(f"ParkingLot missing name/address: {item}")
 
-        lot = _find_existing_lot(db, name=name, address=address)
-        if not lot:
-            lot = ParkingLot(
-                name=name,
-                location=location,
-                address=address,
-                capacity=int(pick(item, "capacity", default=0) or 0),
-                reserved=int(pick(item, "reserved", default=0) or 0),
-                tariff=float(pick(item, "tariff", default=0.0) or 0.0),
-                daytariff=float(
-                    pick(item, "daytariff", "day_tariff", default=0.0) or 0.0
-                ),
-                latitude=float(pick(item, "latitude", "lat", default=0.0) or 0.0),
-                longitude=float(
-                    pick(item, "longitude", "lng", "lon", default=0.0) or 0.0
-                ),
-            )
-            db.add(lot)
-            db.flush()
+PARKING_LOTS = TableSpec(
+    table=ParkingLot.__table__,
+    id_map="lot_id_map",
+    legacy_keys=("id", "lot_id", "parking_lot_id", "parkingLotId"),
+    to_row=parking_lot_row,
+    columns=(
+        "name",
+        "location",
+        "address",
+        "capacity",
+        "reserved",
+        "tariff",
+        "daytariff",
+        "latitude",
+        "longitude",
+        "created_by",
+    ),
+    natural_key=("name", "address"),
+)
 
-        if old_id is not None:
-            ctx.lot_id_map[old_id] = lot.id
 
-        commit_every(db, i, chunk=500)
-
-    db.commit()
+async def import_parking_lots(
+    engine: AsyncEngine,
+    ctx: ImportContext,
+    filename: str = "parking_lots.json",
+    chunk_rows: int = CHUNK_ROWS,
+    own_ids: bool = False,
+) -> ImportStats:
+    return await bulk_import(
+        engine,
+        PARKING_LOTS,
+        ctx,
+        iter_json(filename),
+        chunk_rows,
+        own_ids=own_ids,
+    )
@@ -1,73 +1,149 @@
 from __future__ import annotations
 
-from sqlalchemy.orm import Session
+from datetime import timezone
 
-from app.models.payment import Payment
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.models.payment import Payment, PaymentStatus
+from app.models.revenue_rollup import RevenueRollup
 from app.scripts.import_common import (
     ImportContext,
-    load_json,
+    UnmappedReference,
+    iter_json,
     pick,
-    parse_dt,
-    commit_every,
+)
+from app.scripts.import_engine import (
+    CHUNK_ROWS,
+    STAGING,
+    ImportStats,
+    TableSpec,
+    bulk_import,
 )
 
 
-def import_payments(
-    db: Session, ctx: ImportContext, filename: str = "payments.json"
-) -> None:
+def payment_row(item: dict, ctx: ImportContext) -> dict:
     """
     Expected JSON item keys (flexible):
     - id / payment_id
     - user_id (old)
-    - reservation_id (old, optional)
-    - transaction (unique)
+    - reservation_id (old)
     - amount
-    - initiator
     - completed_at
-    - hash
-    - t_data (dict)
     """
-    items = load_json(filename)
+    old_user_id = pick(item, "user_id", "userId")
+    if old_user_id not in ctx.user_id_map:
+        raise UnmappedReference(
+            f"Payment user_id not mapped. item={item}", "user_id", old_user_id
+        )
+
+    # Every payment belongs to a parking session, made from the reservation
+    old_res_id = pick(item, "reservation_id", "reservationId")
+    if old_res_id not in ctx.reservation_id_map:
+        raise UnmappedReference(
+            f"Payment reservation_id not mapped. item={item}",
+            "reservation_id",
+            old_res_id,
+        )
 
-    for i, item in enumerate(items, start=1):
-        old_id = pick(item, "id", "payment_id", "paymentId")
-        transaction = pick(item, "transaction", "transaction_id", "transactionId")
-        if not transaction:
-            raise ValueError(f"Payment missing transaction: {item}")
+    completed_at = ctx.parse_dt(pick(item, "completed_at", "completedAt"))
+    if completed_at is not None and completed_at.tzinfo is not None:
+        # completed_at is stored as naive UTC
+        completed_at = completed_at.astimezone(timezone.utc).replace(tzinfo=None)
 
-        old_user_id = pick(item, "user_id", "userId")
-        if old_user_id not in ctx.user_id_map:
-            raise ValueError(f"Payment user_id not mapped. item={item}")
-        user_id = ctx.user_id_map[old_user_id]
+    return {
+        "user_id": ctx.user_id_map[old_user_id],
+        "reservation_id": ctx.reservation_id_map[old_res_id],
+        "session_id": None,
+        "amount": float(pick(item, "amount", default=0.0) or 0.0),
+        "status": PaymentStatus.paid if completed_at else PaymentStatus.pending,
+        "completed_at": completed_at,
+    }
 
-        old_res_id = pick(item, "reservation_id", "reservationId")
-        reservation_id = None
-        if old_res_id is not None:
-            reservation_id = ctx.reservation_id_map.get(old_res_id)
 
-        existing = db.query(Payment).filter(Payment.transaction == transaction).first()
-        if not existing:
-            payment = Payment(
-                user_id=user_id,
-                reservation_id=reservation_id,
-                transaction=transaction,
-                amount=float(pick(item, "amount", default=0.0) or 0.0),
-                initiator=pick(item, "initiator"),
-                completed_at=parse_dt(pick(item, "completed_at", "completedAt")),
-                hash=pick(item, "hash"),
-                t_data=pick(item, "t_data", "tData"),
+async def _sessions_and_revenue(conn: AsyncConnection) -> None:
+    await conn.execute(
+        text(
+            f"UPDATE {STAGING} SET session_id = "
+            f"nextval(pg_get_serial_sequence('parking_sessions', 'id')) "
+            f"WHERE import_row IS NOT NULL"
+        )
+    )
+    await conn.execute(
+        text(
+            f"""
+            INSERT INTO parking_sessions (
+                id, parking_lot_id, reservation_id, license_plate,
+                entry_time, exit_time, status, amount_due, amount_paid, closed_at
             )
-            db.add(payment)
-            db.flush()
-        else:
-            # keep links consistent
-            existing.user_id = user_id
-            existing.reservation_id = reservation_id
+            SELECT
+                s.session_id, r.parking_lot_id, r.id, r.license_plate,
+                r.planned_start, r.planned_end, 'closed', s.amount,
+                CASE WHEN s.status = 'paid' THEN s.amount ELSE 0 END,
+                s.completed_at AT TIME ZONE 'UTC'
+            FROM {STAGING} s
+            JOIN reservations r ON r.id = s.reservation_id
+            WHERE s.import_row IS NOT NULL
+            """
+        )
+    )
+    # Paid payments count in the revenue rollups, like settlements do
+    # (record_revenue); same buckets as rebuild_revenue_rollups
+    await conn.execute(
+        text(
+            f"""
+            INSERT INTO {RevenueRollup.__tablename__} (
+                parking_lot_id, bucket_start, amount, payments_count
+            )
+            SELECT
+                r.parking_lot_id,
+                timezone('UTC', date_trunc('hour', s.completed_at)) AS bucket,
+                COALESCE(SUM(s.amount), 0.0),
+                COUNT(*)
+            FROM {STAGING} s
+            JOIN reservations r ON r.id = s.reservation_id
+            WHERE s.import_row IS NOT NULL
+              AND s.status = 'paid'
+              AND s.completed_at IS NOT NULL
+            GROUP BY r.parking_lot_id, bucket
+            ON CONFLICT (parking_lot_id, bucket_start) DO UPDATE SET
+                amount = {RevenueRollup.__tablename__}.amount + EXCLUDED.amount,
+                payments_count = {RevenueRollup.__tablename__}.payments_count
+                    + EXCLUDED.payments_count
+            """
+        )
+    )
+
 
-        # map old -> new (for completeness)
-        if old_id is not None:
-            ctx.payment_id_map[old_id] = existing.id if existing else payment.id
+PAYMENTS = TableSpec(
+    table=Payment.__table__,
+    id_map="payment_id_map",
+    legacy_keys=("id", "payment_id", "paymentId"),
+    to_row=payment_row,
+    columns=(
+        "user_id",
+        "reservation_id",
+        "session_id",
+        "amount",
+        "status",
+        "completed_at",
+    ),
+    before_insert=_sessions_and_revenue,
+)
 
-        commit_every(db, i, chunk=500)
 
-    db.commit()
+async def import_payments(
+    engine: AsyncEngine,
+    ctx: ImportContext,
+    filename: str = "payments.json",
+    chunk_rows: int = CHUNK_ROWS,
+    own_ids: bool = False,
+) -> ImportStats:
+    return await bulk_import(
+        engine,
+        PAYMENTS,
+        ctx,
+        iter_json(filename),
+        chunk_rows,
+        own_ids=own_ids,
+    )
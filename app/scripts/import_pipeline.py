@@ -0,0 +1,348 @@
+"""
+Runs the table imports as a dependency DAG on a process pool.
+
+A table starts as soon as the tables it references are done, so users and
+parking lots load side by side. Large files of tables without a natural
+key (reservations, payments) are cut into batches that pool workers load
+concurrently; tables deduplicated on a natural key run as one job, since
+concurrent jobs could insert the same key twice. Jobs in other processes
+resolve foreign keys through the id map table.
+
+Runs are resumable. Every file has a checkpoint: its content hash and how
+many leading items are committed. A rerun skips files that were imported
+completely and have not changed, and continues the others where they
+stopped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.models.import_checkpoint import ImportCheckpoint
+from app.models.import_id_map import ImportIdMap
+from app.scripts import import_common
+from app.scripts.import_common import ImportContext
+from app.scripts.import_engine import (
+    CHUNK_ROWS,
+    ImportStats,
+    TableSpec,
+    bulk_import,
+    load_id_map,
+)
+from app.scripts.import_parking_lots import PARKING_LOTS
+from app.scripts.import_payments import PAYMENTS
+from app.scripts.import_reservations import RESERVATIONS
+from app.scripts.import_users import USERS
+from app.scripts.import_vehicles import VEHICLES
+from app.scripts.json_stream import iter_json_array
+
+PARTITION_BYTES = 256 * 1024 * 1024
+PARTITION_ITEMS = 200_000
+
+
+@dataclass(frozen=True)
+class ImportStep:
+    spec: TableSpec
+    filename: str
+    # Tables whose id maps this one's rows refer to
+    depends_on: tuple[str, ...] = ()
+
+    @property
+    def name(self) -> str:
+        return self.spec.table.name
+
+
+STEPS = {
+    step.name: step
+    for step in (
+        ImportStep(USERS, "users.json"),
+        ImportStep(PARKING_LOTS, "parking_lots.json"),
+        ImportStep(VEHICLES, "vehicles.json", ("users",)),
+        ImportStep(
+            RESERVATIONS, "reservations.json", ("users", "vehicles", "parking_lots")
+        ),
+        ImportStep(PAYMENTS, "payments.json", ("users", "reservations")),
+    )
+}
+
+
+@dataclass(frozen=True)
+class JobOptions:
+    database_url: str
+    data_dir: Path
+    chunk_rows: int
+    # Files export_all wrote from this database; see bulk_import
+    own_ids: bool = False
+
+
+@dataclass(frozen=True)
+class Job:
+    step_name: str
+    # None: stream the whole file from start_at, checkpointing as it goes
+    items: Optional[list[dict]] = None
+    start_at: int = 0
+    skip_mapped: bool = False
+
+
+# Id maps of finished tables, kept per worker process across its jobs
+_dependency_maps: dict[str, dict] = {}
+
+
+def _engine(database_url: str):
+    # One connection per job; pools do not survive across event loops
+    return create_async_engine(database_url, poolclass=NullPool)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def _save_checkpoint(
+    conn: AsyncConnection, filename: str, items_done: int, completed: bool = False
+) -> None:
+    # Batches of a partitioned file commit their checkpoints concurrently;
+    # one committing late must not move it back
+    await conn.execute(
+        update(ImportCheckpoint)
+        .where(ImportCheckpoint.filename == filename)
+        .values(
+            items_done=func.greatest(ImportCheckpoint.items_done, items_done),
+            completed=completed,
+        )
+    )
+
+
+async def _import(job: Job, options: JobOptions) -> ImportStats:
+    step = STEPS[job.step_name]
+    engine = _engine(options.database_url)
+    try:
+        ctx = ImportContext.empty()
+        async with engine.connect() as conn:
+            for dep in step.depends_on:
+                if dep not in _dependency_maps:
+                    _dependency_maps[dep] = await load_id_map(conn, dep)
+                setattr(ctx, STEPS[dep].spec.id_map, _dependency_maps[dep])
+
+        items, checkpoint = job.items, None
+        if items is None:
+            items = iter_json_array(options.data_dir / step.filename)
+
+            async def checkpoint(conn: AsyncConnection, items_done: int) -> None:
+                await _save_checkpoint(conn, step.filename, items_done)
+
+        return await bulk_import(
+            engine,
+            step.spec,
+            ctx,
+            items,
+            options.chunk_rows,
+            share_ids=True,
+            start_at=job.start_at,
+            checkpoint=checkpoint,
+            skip_mapped=job.skip_mapped,
+            own_ids=options.own_ids,
+        )
+    finally:
+        await engine.dispose()
+
+
+def run_job(job: Job, options: JobOptions) -> ImportStats:
+    """Pool entry point: a whole table or one batch of it."""
+    return asyncio.run(_import(job, options))
+
+
+def _batches(items: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+
+class ImportPipeline:
+    def __init__(
+        self,
+        workers: int,
+        data_dir: Optional[Path] = None,
+        chunk_rows: int = CHUNK_ROWS,
+        partition_bytes: int = PARTITION_BYTES,
+        partition_items: int = PARTITION_ITEMS,
+        database_url: Optional[str] = None,
+        restart: bool = False,
+        own_ids: bool = False,
+    ):
+        self.workers = workers
+        self.data_dir = data_dir or import_common.DATA_DIR
+        self.options = JobOptions(
+            database_url or settings.database_url, self.data_dir, chunk_rows, own_ids
+        )
+        self.partition_bytes = partition_bytes
+        self.partition_items = partition_items
+        self.restart = restart
+        self.stats: dict[str, ImportStats] = {}
+        # For checkpoints; jobs open their own connections
+        self.engine = _engine(self.options.database_url)
+
+    def partitioned(self, step: ImportStep) -> bool:
+        path = self.data_dir / step.filename
+        return not step.spec.natural_key and path.stat().st_size > self.partition_bytes
+
+    async def _start_step(self, step: ImportStep) -> Optional[tuple[int, bool]]:
+        """(start_at, resuming) for this run, or None if the file is done."""
+        path = self.data_dir / step.filename
+        if not path.exists():
+            raise FileNotFoundError(f"Missing data file: {path}")
+        content_hash = await asyncio.to_thread(file_hash, path)
+
+        async with self.engine.begin() as conn:
+            previous = (
+                await conn.execute(
+                    select(ImportCheckpoint).where(
+                        ImportCheckpoint.filename == step.filename
+                    )
+                )
+            ).one_or_none()
+            unchanged = previous is not None and previous.content_hash == content_hash
+            if unchanged and previous.completed:
+                return None
+
+            start_at = previous.items_done if unchanged else 0
+            stmt = pg_insert(ImportCheckpoint).values(
+                filename=step.filename,
+                content_hash=content_hash,
+                items_done=start_at,
+                completed=False,
+            )
+            await conn.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[ImportCheckpoint.filename],
+                    set_={
+                        "content_hash": stmt.excluded.content_hash,
+                        "items_done": stmt.excluded.items_done,
+                        "completed": False,
+                    },
+                )
+            )
+        # A changed file starts over, and batches of an interrupted run may
+        # have committed past the checkpoint, even one still at 0; rows an
+        # earlier run loaded are recognized by their legacy ids instead of
+        # being inserted again
+        return start_at, previous is not None
+
+    async def _run_partitioned(
+        self,
+        step: ImportStep,
+        pool: ProcessPoolExecutor,
+        start_at: int,
+        resuming: bool,
+    ) -> list[ImportStats]:
+        # Read here, load in the pool; at most one batch per worker in flight
+        # keeps memory bounded
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        items = itertools.islice(
+            iter_json_array(self.data_dir / step.filename), start_at, None
+        )
+        batches = _batches(items, self.partition_items)
+        # Batches finish out of order, so the checkpoint only covers the
+        # prefix that is done; a resumed run drops the rest by legacy id
+        finished: dict[int, int] = {}
+        items_done = start_at
+
+        async def load(job: Job, start: int) -> ImportStats:
+            nonlocal items_done
+            try:
+                result = await loop.run_in_executor(pool, run_job, job, self.options)
+            finally:
+                slots.release()
+            finished[start] = start + result.rows
+            if items_done in finished:
+                while items_done in finished:
+                    items_done = finished.pop(items_done)
+                async with self.engine.begin() as conn:
+                    await _save_checkpoint(conn, step.filename, items_done)
+            return result
+
+        jobs = []
+        start = start_at
+        while True:
+            await slots.acquire()
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                slots.release()
+                break
+            job = Job(step.name, batch, skip_mapped=resuming)
+            jobs.append(asyncio.ensure_future(load(job, start)))
+            start += len(batch)
+        return list(await asyncio.gather(*jobs))
+
+    async def _run_step(
+        self, step: ImportStep, pool: ProcessPoolExecutor, done: dict
+    ) -> None:
+        await asyncio.gather(*(done[dep] for dep in step.depends_on))
+        started = time.perf_counter()
+        resume = await self._start_step(step)
+        if resume is None:
+            self.stats[step.name] = ImportStats(step.name, skipped=True)
+            print(self.stats[step.name], flush=True)
+            return
+
+        start_at, resuming = resume
+        if self.partitioned(step):
+            results = await self._run_partitioned(step, pool, start_at, resuming)
+        else:
+            # Checkpointed chunk by chunk, so a resume of an unchanged file
+            # is exact; skip_mapped is for a changed one
+            job = Job(step.name, start_at=start_at, skip_mapped=resuming)
+            loop = asyncio.get_running_loop()
+            results = [await loop.run_in_executor(pool, run_job, job, self.options)]
+
+        items_done = start_at + sum(result.rows for result in results)
+        async with self.engine.begin() as conn:
+            await _save_checkpoint(conn, step.filename, items_done, completed=True)
+
+        stats = ImportStats(step.name, seconds=time.perf_counter() - started)
+        for result in results:
+            stats.rows += result.rows
+            stats.inserted += result.inserted
+            stats.updated += result.updated
+        self.stats[step.name] = stats
+        print(stats, flush=True)
+
+    async def run(self) -> dict[str, ImportStats]:
+        try:
+            if self.restart:
+                async with self.engine.begin() as conn:
+                    await conn.execute(delete(ImportCheckpoint))
+                    await conn.execute(delete(ImportIdMap))
+
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                done: dict[str, asyncio.Future] = {}
+                # STEPS lists every table after the ones it depends on
+                for step in STEPS.values():
+                    done[step.name] = asyncio.ensure_future(
+                        self._run_step(step, pool, done)
+                    )
+                try:
+                    await asyncio.gather(*done.values())
+                except BaseException:
+                    for step_done in done.values():
+                        step_done.cancel()
+                    raise
+        finally:
+            await self.engine.dispose()
+        return self.stats
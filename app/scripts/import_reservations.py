@@ -1,14 +1,25 @@
 from __future__ import annotations
 
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
-from app.models.reservation import Reservation, ReservationStatus
+from app.models.reservation import (
+    Reservation,
+    ReservationChannel,
+    ReservationStatus,
+)
 from app.scripts.import_common import (
     ImportContext,
-    load_json,
+    UnmappedReference,
+    iter_json,
     pick,
-    parse_dt,
-    commit_every,
+)
+from app.scripts.import_engine import (
+    CHUNK_ROWS,
+    STAGING,
+    ImportStats,
+    TableSpec,
+    bulk_import,
 )
 
 
@@ -22,12 +33,14 @@ def _parse_status(value) -> ReservationStatus:
         return ReservationStatus.confirmed
     if s in ("cancelled", "canceled", "cancel"):
         return ReservationStatus.cancelled
+    if s in ("expired",):
+        return ReservationStatus.expired
+    if s in ("completed", "complete"):
+        return ReservationStatus.completed
     return ReservationStatus.confirmed
 
 
-def import_reservations(
-    db: Session, ctx: ImportContext, filename: str = "reservations.json"
-) -> None:
+def reservation_row(item: dict, ctx: ImportContext) -> dict:
     """
     Expected JSON item keys (flexible):
     - id / reservation_id
@@ -35,43 +48,97 @@ def import_reservations(
     - start_time, end_time (iso string or timestamp)
     - status
     - cost
+    - license_plate (optional, taken from the vehicle otherwise)
     """
-    items = load_json(filename)
+    old_user_id = pick(item, "user_id", "userId")
+    old_vehicle_id = pick(item, "vehicle_id", "vehicleId")
+    old_lot_id = pick(item, "parking_lot_id", "parkingLotId", "lot_id")
 
-    for i, item in enumerate(items, start=1):
-        old_id = pick(item, "id", "reservation_id", "reservationId")
+    if old_user_id not in ctx.user_id_map:
+        raise UnmappedReference(
+            f"Reservation user_id not mapped. item={item}", "user_id", old_user_id
+        )
+    if old_vehicle_id not in ctx.vehicle_id_map:
+        raise UnmappedReference(
+            f"Reservation vehicle_id not mapped. item={item}",
+            "vehicle_id",
+            old_vehicle_id,
+        )
+    if old_lot_id not in ctx.lot_id_map:
+        raise UnmappedReference(
+            f"Reservation parking_lot_id not mapped. item={item}",
+            "parking_lot_id",
+            old_lot_id,
+        )
 
-        old_user_id = pick(item, "user_id", "userId")
-        old_vehicle_id = pick(item, "vehicle_id", "vehicleId")
-        old_lot_id = pick(item, "parking_lot_id", "parkingLotId", "lot_id")
+    start_time = ctx.parse_dt(pick(item, "start_time", "startTime", "start"))
+    end_time = ctx.parse_dt(pick(item, "end_time", "endTime", "end"))
+    if not start_time or not end_time:
+        raise ValueError(f"Reservation missing start/end time: {item}")
+    if end_time <= start_time:
+        raise ValueError(f"Reservation ends before it starts: {item}")
 
-        if old_user_id not in ctx.user_id_map:
-            raise ValueError(f"Reservation user_id not mapped. item={item}")
-        if old_vehicle_id not in ctx.vehicle_id_map:
-            raise ValueError(f"Reservation vehicle_id not mapped. item={item}")
-        if old_lot_id not in ctx.lot_id_map:
-            raise ValueError(f"Reservation parking_lot_id not mapped. item={item}")
+    cost = float(pick(item, "cost", "price", default=0.0) or 0.0)
+    return {
+        "user_id": ctx.user_id_map[old_user_id],
+        "vehicle_id": ctx.vehicle_id_map[old_vehicle_id],
+        "parking_lot_id": ctx.lot_id_map[old_lot_id],
+        "license_plate": pick(item, "license_plate", "licensePlate"),
+        "planned_start": start_time,
+        "planned_end": end_time,
+        # Legacy reservations always belong to a user and a vehicle
+        "channel": ReservationChannel.registered,
+        "status": _parse_status(pick(item, "status")),
+        "quoted_cost": cost,
+        "original_cost": cost,
+        # NOT NULL with only ORM defaults, which COPY does not apply
+        "discount_amount": 0.0,
+    }
 
-        start_time = parse_dt(pick(item, "start_time", "startTime", "start"))
-        end_time = parse_dt(pick(item, "end_time", "endTime", "end"))
-        if not start_time or not end_time:
-            raise ValueError(f"Reservation missing start/end time: {item}")
 
-        reservation = Reservation(
-            user_id=ctx.user_id_map[old_user_id],
-            vehicle_id=ctx.vehicle_id_map[old_vehicle_id],
-            parking_lot_id=ctx.lot_id_map[old_lot_id],
-            start_time=start_time,
-            end_time=end_time,
-            status=_parse_status(pick(item, "status")),
-            cost=float(pick(item, "cost", "price", default=0.0) or 0.0),
+async def _plates_from_vehicles(conn: AsyncConnection) -> None:
+    await conn.execute(
+        text(
+            f"UPDATE {STAGING} s SET license_plate = v.license_plate "
+            f"FROM vehicles v WHERE v.id = s.vehicle_id AND s.license_plate IS NULL"
         )
-        db.add(reservation)
-        db.flush()
+    )
+
 
-        if old_id is not None:
-            ctx.reservation_id_map[old_id] = reservation.id
+RESERVATIONS = TableSpec(
+    table=Reservation.__table__,
+    id_map="reservation_id_map",
+    legacy_keys=("id", "reservation_id", "reservationId"),
+    to_row=reservation_row,
+    columns=(
+        "user_id",
+        "vehicle_id",
+        "parking_lot_id",
+        "license_plate",
+        "planned_start",
+        "planned_end",
+        "channel",
+        "status",
+        "quoted_cost",
+        "original_cost",
+        "discount_amount",
+    ),
+    before_insert=_plates_from_vehicles,
+)
 
-        commit_every(db, i, chunk=500)
 
-    db.commit()
+async def import_reservations(
+    engine: AsyncEngine,
+    ctx: ImportContext,
+    filename: str = "reservations.json",
+    chunk_rows: int = CHUNK_ROWS,
+    own_ids: bool = False,
+) -> ImportStats:
+    return await bulk_import(
+        engine,
+        RESERVATIONS,
+        ctx,
+        iter_json(filename),
+        chunk_rows,
+        own_ids=own_ids,
+    )
@@ -0,0 +1,209 @@
+"""
+Dry run of the imports: validates the data files without a database.
+
+Every item is mapped to a row the way the importer would map it, so a
+single run reports every item that would fail: schema problems (bad or
+missing fields, values too long for their column), legacy foreign keys
+that no file defines, unparseable datetimes, and legacy ids used twice in
+a file. Items with the same natural key are not errors; the import merges
+them.
+
+Work runs on a process pool in two overlapping passes: the legacy ids of
+every file that others refer to, then each file against the ids of the
+files it depends on. A reference to an item that is itself invalid counts
+as resolvable; that item's own error is reported.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import String
+
+from app.scripts.import_common import (
+    ImportContext,
+    InvalidDatetime,
+    UnmappedReference,
+    pick,
+)
+from app.scripts.import_engine import TableSpec
+from app.scripts.import_pipeline import STEPS
+from app.scripts.json_stream import iter_json_array
+
+# Per file, to keep the report readable
+EXAMPLES_PER_CATEGORY = 5
+MISSING_IDS_PER_FIELD = 20
+MESSAGE_CHARS = 300
+
+
+@dataclass
+class FileReport:
+    filename: str
+    items: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    # category -> invalid items
+    errors: dict[str, int] = field(default_factory=dict)
+    # field -> {"references": items, "ids": first distinct legacy ids}
+    missing: dict[str, dict] = field(default_factory=dict)
+    examples: list[dict] = field(default_factory=list)
+
+    def add(
+        self, index: Optional[int], legacy_id: Any, category: str, message: str
+    ) -> None:
+        self.invalid += 1
+        self.errors[category] = self.errors.get(category, 0) + 1
+        if self.errors[category] <= EXAMPLES_PER_CATEGORY:
+            self.examples.append(
+                {
+                    "item": index,
+                    "id": legacy_id,
+                    "category": category,
+                    "error": message[:MESSAGE_CHARS],
+                }
+            )
+
+    def add_missing(self, field_name: str, legacy_id: Any) -> None:
+        missing = self.missing.setdefault(field_name, {"references": 0, "ids": []})
+        missing["references"] += 1
+        ids = missing["ids"]
+        if len(ids) < MISSING_IDS_PER_FIELD and legacy_id not in ids:
+            ids.append(legacy_id)
+
+    def __str__(self) -> str:
+        if not self.invalid:
+            return f"{self.filename}: {self.items} items, all valid"
+        errors = ", ".join(f"{n} {category}" for category, n in self.errors.items())
+        return f"{self.filename}: {self.items} items, {self.invalid} invalid ({errors})"
+
+
+def _path(data_dir: Path, step_name: str) -> Path:
+    return data_dir / STEPS[step_name].filename
+
+
+def legacy_ids(step_name: str, data_dir: Path) -> set:
+    """Pool entry point: every legacy id defined in a step's file."""
+    spec = STEPS[step_name].spec
+    ids = set()
+    try:
+        for item in iter_json_array(_path(data_dir, step_name)):
+            legacy_id = pick(item, *spec.legacy_keys)
+            if legacy_id is not None and not isinstance(legacy_id, (dict, list)):
+                ids.add(legacy_id)
+    except ValueError:
+        pass  # validate_file reports where the file breaks
+    return ids
+
+
+def _check_columns(spec: TableSpec, row: dict[str, Any]) -> Optional[str]:
+    # COPY rejects strings longer than their column
+    for name in spec.columns:
+        column_type = spec.table.c[name].type
+        value = row[name]
+        if (
+            isinstance(column_type, String)
+            and column_type.length
+            and isinstance(value, str)
+            and len(value) > column_type.length
+        ):
+            return f"{name} longer than {column_type.length} characters: {value!r}"
+    return None
+
+
+def validate_file(
+    step_name: str, data_dir: Path, dependency_ids: dict[str, set]
+) -> FileReport:
+    """Pool entry point: check every item of a step's file."""
+    step = STEPS[step_name]
+    spec = step.spec
+    report = FileReport(step.filename)
+    started = time.perf_counter()
+
+    ctx = ImportContext.empty()
+    for dep, ids in dependency_ids.items():
+        # to_row only needs the keys; the new ids do not exist yet
+        setattr(ctx, STEPS[dep].spec.id_map, dict.fromkeys(ids, 0))
+
+    seen = set()
+    index = None
+    try:
+        for index, item in enumerate(iter_json_array(data_dir / step.filename)):
+            report.items += 1
+            legacy_id = pick(item, *spec.legacy_keys)
+            if isinstance(legacy_id, (dict, list)):
+                report.add(index, None, "schema", f"Legacy id is not a value: {item}")
+                continue
+            if legacy_id is not None:
+                if legacy_id in seen:
+                    report.add(
+                        index, legacy_id, "uniqueness", f"Duplicate legacy id: {item}"
+                    )
+                    continue
+                seen.add(legacy_id)
+
+            try:
+                row = spec.to_row(item, ctx)
+            except UnmappedReference as exc:
+                report.add(index, legacy_id, "foreign_key", str(exc))
+                report.add_missing(exc.field, exc.legacy_id)
+            except InvalidDatetime as exc:
+                report.add(index, legacy_id, "datetime", f"{exc}: {item}")
+            except ValueError as exc:
+                report.add(index, legacy_id, "schema", str(exc))
+            except (TypeError, KeyError) as exc:
+                report.add(index, legacy_id, "schema", f"{exc!r}: {item}")
+            else:
+                problem = _check_columns(spec, row)
+                if problem is not None:
+                    report.add(index, legacy_id, "schema", problem)
+    except ValueError as exc:
+        # Malformed JSON or a non-object item: the rest cannot be read
+        after = "at the start" if index is None else f"after item {index}"
+        report.add(None, None, "schema", f"Unreadable {after}: {exc}")
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def validate_all(data_dir: Path, workers: int) -> list[FileReport]:
+    """Validate every data file, in STEPS order."""
+    missing = {
+        name: FileReport(step.filename)
+        for name, step in STEPS.items()
+        if not _path(data_dir, name).exists()
+    }
+    for name, report in missing.items():
+        report.add(None, None, "schema", f"Missing data file: {_path(data_dir, name)}")
+    referenced = {dep for step in STEPS.values() for dep in step.depends_on}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ids: dict[str, Future] = {
+            name: pool.submit(legacy_ids, name, data_dir)
+            for name in STEPS
+            if name in referenced and name not in missing
+        }
+        reports: dict[str, Future] = {}
+        # Files without dependencies start right away, next to the id passes
+        for name, step in STEPS.items():
+            if name in missing:
+                continue
+            dependency_ids = {
+                dep: ids[dep].result() if dep in ids else set()
+                for dep in step.depends_on
+            }
+            reports[name] = pool.submit(validate_file, name, data_dir, dependency_ids)
+        return [
+            missing[name] if name in missing else reports[name].result()
+            for name in STEPS
+        ]
+
+
+def write_report(reports: list[FileReport], path: Path) -> None:
+    problems = sum(report.invalid for report in reports)
+    content = {"problems": problems, "files": [asdict(r) for r in reports]}
+    path.write_text(json.dumps(content, indent=2, default=str), encoding="utf-8")
@@ -0,0 +1,134 @@
+"""
+Incremental reader for files holding one JSON array of objects.
+
+Yields the array items one by one, so memory stays at one buffer plus one
+item however large the file is. Uses ijson when it is installed (it picks
+its C backend if that was built) and a pure-Python reader on top of
+json.JSONDecoder.raw_decode otherwise.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import IO, Iterator
+
+try:
+    import ijson
+except ImportError:  # optional
+    ijson = None
+
+BUFFER_CHARS = 1 << 16
+_WHITESPACE = " \t\n\r"
+# Some legacy exports start with one; json.load would reject it too
+_BOM = b"\xef\xbb\xbf"
+
+
+def _not_an_array(path: Path) -> ValueError:
+    return ValueError(f"{path.name} must contain a JSON array (list of objects).")
+
+
+def _iter_python(f: IO[str], path: Path, buffer_chars: int) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    read_size = buffer_chars
+
+    def fill() -> bool:
+        # Appends the next block; drops what was consumed so buf stays small
+        nonlocal buf, pos, eof
+        block = f.read(read_size)
+        if not block:
+            eof = True
+            return False
+        buf = buf[pos:] + block
+        pos = 0
+        return True
+
+    def skip(chars: str) -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    skip(_WHITESPACE)
+    if pos == len(buf) or buf[pos] != "[":
+        raise _not_an_array(path)
+    pos += 1
+
+    first = True
+    while True:
+        skip(_WHITESPACE)
+        if pos < len(buf) and buf[pos] == "]":
+            pos += 1
+            skip(_WHITESPACE)
+            # A second array or garbage after it means the file is not one array
+            if pos < len(buf):
+                raise ValueError(f"{path.name}: unexpected data after the array")
+            return
+        if not first:
+            if pos == len(buf) or buf[pos] != ",":
+                raise ValueError(f"{path.name}: expected ',' or ']' at item boundary")
+            pos += 1
+            skip(_WHITESPACE)
+        first = False
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                item, end = None, None
+            # A value ending right at the buffer edge may continue (numbers)
+            if end is not None and (end < len(buf) or eof):
+                break
+            if not fill():
+                if end is not None:
+                    break
+                raise ValueError(f"{path.name}: truncated or invalid JSON")
+            if end is None:
+                # Item larger than the buffer: read more per retry, so a
+                # huge item is not re-parsed once per block
+                read_size *= 2
+        read_size = buffer_chars
+        pos = end
+
+        if not isinstance(item, dict):
+            raise ValueError(f"{path.name}: array items must be objects, got {item!r}")
+        yield item
+
+
+def _iter_ijson(path: Path) -> Iterator[dict]:
+    with path.open("rb") as f:
+        head = f.read(BUFFER_CHARS)
+        start = len(_BOM) if head.startswith(_BOM) else 0
+        if not head[start:].lstrip().startswith(b"["):
+            raise _not_an_array(path)
+        f.seek(start)
+        try:
+            # Parses to the end of the file, so data after the array fails
+            for item in ijson.items(f, "item", use_float=True):
+                if not isinstance(item, dict):
+                    raise ValueError(
+                        f"{path.name}: array items must be objects, got {item!r}"
+                    )
+                yield item
+        except ijson.JSONError as exc:
+            # Malformed JSON is a ValueError, as with the Python reader
+            raise ValueError(f"{path.name}: {exc}") from exc
+
+
+def iter_json_array(
+    path: Path, backend: str = "auto", buffer_chars: int = BUFFER_CHARS
+) -> Iterator[dict]:
+    """Items of the JSON array in path; backend is "auto", "ijson" or "python"."""
+    if backend == "ijson" or (backend == "auto" and ijson is not None):
+        if ijson is None:
+            raise RuntimeError("ijson is not installed")
+        yield from _iter_ijson(path)
+        return
+
+    with path.open("r", encoding="utf-8-sig") as f:
+        yield from _iter_python(f, path, buffer_chars)
@@ -0,0 +1,163 @@
+import hmac
+import secrets
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.api_key import ApiKey
+from app.models.gate import Gate
+from app.models.parking_lot import ParkingLot
+from app.models.user import User, UserRole
+from app.schemas.api_key import ApiKeyIn
+from app.services.exceptions import (
+    AccessForbidden,
+    ApiKeyNotFound,
+    GateNotFound,
+    InvalidApiKeyOwner,
+    ParkingLotNotFound,
+    UserNotFound,
+)
+from app.services.principals import Principal
+from app.services.security import hmac_digest
+
+KEY_PREFIX = "moby"
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedKey:
+    key_hash: str
+    principal: Principal
+
+
+# Prefix -> key, or None for prefixes with no active key so that garbage
+# keys do not reach the database either. A revoked key, or one whose owner was
+# deactivated, stays usable for at most the TTL.
+_keys = TTLCache(
+    maxsize=settings.api_key_cache_max_entries,
+    ttl=settings.api_key_cache_ttl_seconds,
+)
+_MISSING = object()
+
+
+def _parse(key: str) -> Optional[tuple[str, str]]:
+    # "moby_<prefix>_<secret>"
+    parts = key.split("_", 2)
+    if len(parts) != 3 or parts[0] != KEY_PREFIX or not parts[1] or not parts[2]:
+        return None
+    return parts[1], parts[2]
+
+
+async def _load(db: AsyncSession, prefix: str) -> Optional[_CachedKey]:
+    result = await db.execute(
+        select(
+            ApiKey.key_hash,
+            ApiKey.user_id,
+            ApiKey.role,
+            ApiKey.parking_lot_id,
+            ApiKey.gate_id,
+        )
+        .join(User, User.id == ApiKey.user_id)
+        # Keys of a deactivated account stop working with it
+        .where(
+            ApiKey.prefix == prefix,
+            ApiKey.revoked.is_(False),
+            User.active.is_(True),
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    return _CachedKey(
+        key_hash=row.key_hash,
+        principal=Principal(
+            id=row.user_id,
+            role=row.role,
+            active=True,
+            parking_lot_id=row.parking_lot_id,
+            gate_id=row.gate_id,
+        ),
+    )
+
+
+async def authenticate_api_key(db: AsyncSession, key: str) -> Optional[Principal]:
+    """Principal for a machine API key; no database access on a cache hit."""
+    parsed = _parse(key)
+    if parsed is None:
+        return None
+    prefix, secret = parsed
+
+    cached = _keys.get(prefix, _MISSING)
+    if cached is _MISSING:
+        cached = await _load(db, prefix)
+        _keys.set(prefix, cached)
+    if cached is None:
+        return None
+
+    if not hmac.compare_digest(cached.key_hash, hmac_digest(secret)):
+        return None
+    return cached.principal
+
+
+def ensure_parking_lot_scope(principal: Principal, parking_lot_id: int) -> None:
+    """Reject a scoped machine client acting on another parking lot."""
+    if (
+        principal.parking_lot_id is not None
+        and principal.parking_lot_id != parking_lot_id
+    ):
+        raise AccessForbidden()
+
+
+async def create_api_key(db: AsyncSession, payload: ApiKeyIn) -> tuple[ApiKey, str]:
+    user = await db.get(User, payload.user_id)
+    if user is None:
+        raise UserNotFound()
+    # Keys never carry human privileges
+    if user.role != UserRole.parking_meter:
+        raise InvalidApiKeyOwner()
+
+    parking_lot_id = payload.parking_lot_id
+    if payload.gate_id is not None:
+        gate = await db.get(Gate, payload.gate_id)
+        if gate is None:
+            raise GateNotFound()
+        if parking_lot_id is not None and parking_lot_id != gate.parking_lot_id:
+            raise InvalidApiKeyOwner()
+        parking_lot_id = gate.parking_lot_id
+    elif parking_lot_id is not None and await db.get(ParkingLot, parking_lot_id) is None:
+        raise ParkingLotNotFound()
+
+    prefix = secrets.token_hex(6)
+    secret = secrets.token_urlsafe(32)
+    api_key = ApiKey(
+        name=payload.name,
+        prefix=prefix,
+        key_hash=hmac_digest(secret),
+        user_id=user.id,
+        role=user.role,
+        parking_lot_id=parking_lot_id,
+        gate_id=payload.gate_id,
+    )
+    db.add(api_key)
+    await db.commit()
+    await db.refresh(api_key)
+    return api_key, f"{KEY_PREFIX}_{prefix}_{secret}"
+
+
+async def list_api_keys(db: AsyncSession) -> list[ApiKey]:
+    result = await db.execute(select(ApiKey).order_by(ApiKey.id))
+    return list(result.scalars())
+
+
+async def revoke_api_key(db: AsyncSession, api_key_id: int) -> ApiKey:
+    api_key = await db.get(ApiKey, api_key_id)
+    if api_key is None:
+        raise ApiKeyNotFound()
+
+    api_key.revoked = True
+    await db.commit()
+    _keys.pop(api_key.prefix)
+    await db.refresh(api_key)
+    return api_key
@@ -1,52 +1,76 @@
 from datetime import datetime, timedelta, timezone
+import logging
 import os
-from typing import Callable
-from fastapi import Depends, HTTPException, status
+import secrets
+from typing import Callable, Optional
+from fastapi import BackgroundTasks, Depends, HTTPException, Security, status
 import jwt
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from app.core import metrics
+from app.core.config import settings
 from app.db.session import get_session
 from app.models.user import User
-from app.schemas.auth import LoginIn, LoginOut, RegisterIn, UserUpdateIn
+from app.schemas.auth import LoginIn, LoginOut, RefreshIn, RegisterIn, UserUpdateIn
 from app.services.exceptions import (
     AccountAlreadyExists,
     InvalidCredentials,
+    PasswordHashingBusy,
     UserNotFound,
 )
-from app.services.security import hash_password, needs_update, verify_password
-from fastapi.security import OAuth2PasswordBearer
+from app.services.api_keys import authenticate_api_key
+from app.services.principals import Principal, get_principal, invalidate_principal
+from app.services.rate_limit import limit_login_attempts
+from app.services.refresh_tokens import (
+    issue_refresh_token,
+    new_family_id,
+    revoke_refresh_family,
+    rotate_refresh_token,
+)
+from app.services.revocation import is_token_revoked, revoke_token
+from app.services.security import (
+    dummy_hash,
+    hash_password_async,
+    needs_update,
+    verify_password_async,
+)
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+
+logger = logging.getLogger(__name__)
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-insecure-change-me")
 JWT_ALG = os.getenv("JWT_ALG", "HS256")
 JWT_EXP_MIN = int(os.getenv("JWT_EXP_MIN", "30"))
 
-# A precomputed dummy hash to equalize timing on nonexistent users.
-DUMMY_HASH = (
-    "$argon2id$v=19$m=65536,t=3,p=4$J3y9q7dF9J2mP7c9bZ2xVA$C3Xj2mD5ZQBM3pqT+o7+4w"
-)
-
-
-def create_access_token(sub: str) -> str:
+def create_access_token(sub: str, family_id: Optional[str] = None) -> str:
     now = datetime.now(tz=timezone.utc)
     exp = now + timedelta(minutes=JWT_EXP_MIN)
-    payload = {"sub": sub, "iat": int(now.timestamp()), "exp": int(exp.timestamp())}
+    payload = {
+        "sub": sub,
+        "jti": secrets.token_urlsafe(16),
+        "iat": int(now.timestamp()),
+        "exp": int(exp.timestamp()),
+    }
+    # The refresh token family of the login, so logout can revoke it
+    if family_id is not None:
+        payload["fam"] = family_id
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# Machine clients send an API key instead of a bearer token
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+UNAUTHORIZED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid or expired authentication token",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_session),
-) -> User:
-    unauthorized = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid or expired authentication token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
+def decode_access_token(token: str) -> dict:
     try:
         # PyJWT verifies exp by default if present, unless we disable it in options.
         payload = jwt.decode(
@@ -57,8 +81,7 @@ async def get_current_user(
                 "require": ["exp", "sub"],  # ensure these claims exist
             },
         )
-        sub = payload.get("sub")
-        user_id = int(sub)  # cast because sub is encoded as string
+        int(payload.get("sub"))  # sub is the user id, encoded as string
 
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -68,18 +91,51 @@ async def get_current_user(
         )
     except (jwt.InvalidTokenError, ValueError, TypeError):
         # Invalid signature, malformed token, missing claims, non-int sub, etc.
-        raise unauthorized
+        raise UNAUTHORIZED
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    if user is None or not user.active:
-        raise unauthorized
+    return payload
 
-    return user
+
+async def get_current_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Security(api_key_header),
+    db: AsyncSession = Depends(get_session),
+) -> Principal:
+    if api_key is not None:
+        principal = await authenticate_api_key(db, api_key)
+        if principal is None:
+            raise UNAUTHORIZED
+        return principal
+
+    if token is None:
+        raise UNAUTHORIZED
+    payload = decode_access_token(token)
+
+    # Tokens issued before jti was added cannot be revoked individually
+    jti = payload.get("jti")
+    if jti is not None and await is_token_revoked(jti):
+        raise UNAUTHORIZED
+
+    principal = await get_principal(db, int(payload["sub"]))
+    if principal is None or not principal.active:
+        raise UNAUTHORIZED
+
+    return principal
+
+
+async def logout(db: AsyncSession, token: str) -> None:
+    payload = decode_access_token(token)
+    jti = payload.get("jti")
+    if jti is not None:
+        await revoke_token(jti, payload["exp"])
+    # Otherwise the session's refresh token could mint new access tokens
+    family_id = payload.get("fam")
+    if family_id is not None:
+        await revoke_refresh_family(db, family_id)
 
 
 def require_roles(*allowed_roles: str) -> Callable:
-    async def _dep(current_user: User = Depends(get_current_user)) -> User:
+    async def _dep(current_user: Principal = Depends(get_current_user)) -> Principal:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -90,6 +146,28 @@ def require_roles(*allowed_roles: str) -> Callable:
     return _dep
 
 
+async def get_gate_client(
+    gate_id: int,
+    api_key: Optional[str] = Security(api_key_header),
+    db: AsyncSession = Depends(get_session),
+) -> Optional[Principal]:
+    """API key of the controller calling /gate/{gate_id}, if it sent one."""
+    if api_key is None:
+        if settings.gate_require_api_key:
+            raise UNAUTHORIZED
+        return None
+
+    principal = await authenticate_api_key(db, api_key)
+    if principal is None:
+        raise UNAUTHORIZED
+    if principal.gate_id is not None and principal.gate_id != gate_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API key is not valid for this gate",
+        )
+    return principal
+
+
 async def create_user(db: AsyncSession, payload: RegisterIn):
     existing = await db.execute(select(User).where(User.email == payload.email))
     if existing.scalar_one_or_none():
@@ -103,7 +181,7 @@ async def create_user(db: AsyncSession, payload: RegisterIn):
         phone=payload.phone,
         active=payload.active,
         birth_year=payload.birth_year,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password_async(payload.password),
     )
 
     db.add(user)
@@ -113,7 +191,9 @@ async def create_user(db: AsyncSession, payload: RegisterIn):
     return user
 
 
-async def update_user(db: AsyncSession, payload: UserUpdateIn, current_user: User):
+async def update_user(
+    db: AsyncSession, payload: UserUpdateIn, current_user: Principal
+):
     existing = await db.execute(select(User).where(User.email == payload.email))
 
     user = existing.scalar_one_or_none()
@@ -121,6 +201,7 @@ async def update_user(db: AsyncSession, payload: UserUpdateIn, current_user: Use
         return UserNotFound()
 
     await db.commit()
+    await invalidate_principal(user.id)
     await db.refresh(user)
     return user
 
@@ -134,6 +215,7 @@ async def delete_user(db: AsyncSession, user_id: int):
 
     await db.delete(user)
     await db.commit()
+    await invalidate_principal(user_id)
 
 
 async def create_admin(db: AsyncSession, payload: RegisterIn):
@@ -149,7 +231,7 @@ async def create_admin(db: AsyncSession, payload: RegisterIn):
         phone=payload.phone,
         active=payload.active,
         birth_year=payload.birth_year,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password_async(payload.password),
     )
 
     db.add(admin)
@@ -159,7 +241,54 @@ async def create_admin(db: AsyncSession, payload: RegisterIn):
     return admin
 
 
-async def login_account(db: AsyncSession, payload: LoginIn):
+# Users with a rehash already scheduled in this worker
+_rehash_pending: set[int] = set()
+
+
+async def rehash_password(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    user_id: int,
+    plain: str,
+    old_hash: str,
+) -> None:
+    """
+    Upgrade a password hash to the current Argon2 policy, after the response.
+
+    The write only applies if the stored hash is still the one that was
+    verified, so a password change in the meantime is never overwritten.
+    """
+    try:
+        new_hash = await hash_password_async(plain)
+        async with sessionmaker() as db:
+            result = await db.execute(
+                update(User)
+                .where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=new_hash)
+            )
+            await db.commit()
+        if result.rowcount:
+            metrics.inc("password_rehash_total")
+        else:
+            metrics.inc("password_rehash_stale_total")
+    except PasswordHashingBusy:
+        # The pool is busy with logins; the next login schedules it again
+        metrics.inc("password_rehash_skipped_total")
+    except Exception:
+        logger.exception("Password rehash failed for user %s", user_id)
+    finally:
+        _rehash_pending.discard(user_id)
+
+
+async def login_account(
+    db: AsyncSession,
+    payload: LoginIn,
+    client_ip: Optional[str] = None,
+    background_tasks: Optional[BackgroundTasks] = None,
+    sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None,
+):
+    # 0) rate limit before spending any Argon2 time
+    await limit_login_attempts(client_ip, payload.email)
+
     # 1) fetch user by email
     res = await db.execute(select(User).where(User.email == payload.email))
     user: User | None = res.scalar_one_or_none()
@@ -167,21 +296,40 @@ async def login_account(db: AsyncSession, payload: LoginIn):
     # 2) verify password (timing-safe pattern)
     if not user:
         # do a dummy verify to keep timing similar
-        verify_password(payload.password, DUMMY_HASH)
+        await verify_password_async(payload.password, await dummy_hash())
         raise InvalidCredentials()
 
-    if not verify_password(payload.password, user.password_hash):
+    if not await verify_password_async(payload.password, user.password_hash):
         raise InvalidCredentials()
 
-    # 3) optional: upgrade hash transparently if policy changed
-    if needs_update(user.password_hash):
-        user.password_hash = hash_password(payload.password)
-        await db.flush()
-        await db.commit()
+    # 3) optional: upgrade hash transparently if policy changed, off the
+    # request path so logins stay fast during a policy migration
+    if (
+        background_tasks is not None
+        and sessionmaker is not None
+        and user.id not in _rehash_pending
+        and needs_update(user.password_hash)
+    ):
+        _rehash_pending.add(user.id)
+        background_tasks.add_task(
+            rehash_password, sessionmaker, user.id, payload.password, user.password_hash
+        )
 
-    # 4) issue JWT
-    token = create_access_token(sub=str(user.id))
-    return LoginOut(access_token=token, token_type="bearer")
+    # 4) issue JWT, plus a refresh token so clients can renew without a password
+    family_id = new_family_id()
+    token = create_access_token(sub=str(user.id), family_id=family_id)
+    refresh_token = await issue_refresh_token(db, user.id, family_id)
+    await db.commit()
+    return LoginOut(access_token=token, token_type="bearer", refresh_token=refresh_token)
+
+
+async def refresh_access_token(db: AsyncSession, payload: RefreshIn) -> LoginOut:
+    # Checks that the user is still active before using the token up
+    user_id, family_id, refresh_token = await rotate_refresh_token(
+        db, payload.refresh_token
+    )
+    token = create_access_token(sub=str(user_id), family_id=family_id)
+    return LoginOut(access_token=token, token_type="bearer", refresh_token=refresh_token)
 
 
 async def get_user(db: AsyncSession, user_id: int) -> User:
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.models.discount_code import DiscountCode
+from app.models.discount_code_shard import DiscountCodeShard
+
+logger = logging.getLogger(__name__)
+
+
+def redeemable(now: datetime):
+    """Conditions under which a discount code can take another use."""
+    return and_(
+        DiscountCode.enabled.is_(True),
+        or_(DiscountCode.single_use.is_(False), DiscountCode.uses_count < 1),
+        or_(
+            DiscountCode.max_uses.is_(None),
+            DiscountCode.uses_count < DiscountCode.max_uses,
+        ),
+        or_(DiscountCode.valid_from.is_(None), DiscountCode.valid_from <= now),
+        or_(DiscountCode.valid_until.is_(None), DiscountCode.valid_until >= now),
+    )
+
+
+def split_quota(
+    max_uses: Optional[int], uses_count: int, shards: int
+) -> list[Optional[int]]:
+    """Share what is left of max_uses between shards, summing to exactly that."""
+    if max_uses is None:
+        return [None] * shards
+    remaining = max(0, max_uses - uses_count)
+    return [
+        remaining // shards + (1 if i < remaining % shards else 0)
+        for i in range(shards)
+    ]
+
+
+async def redeem_from_shards(
+    db: AsyncSession, discount_code_id: int, shards: int, now: datetime
+) -> bool:
+    """
+    Take one use from a random shard with quota left.
+
+    Concurrent redemptions spread over the shard rows instead of queueing on
+    the code row. A shard that ran out of quota falls through to the next
+    one; only when all are exhausted is max_uses reached.
+    """
+    order = random.sample(range(shards), shards)
+    for shard in order:
+        result = await db.execute(
+            update(DiscountCodeShard)
+            .where(
+                DiscountCodeShard.discount_code_id == discount_code_id,
+                DiscountCodeShard.shard == shard,
+                or_(
+                    DiscountCodeShard.quota.is_(None),
+                    DiscountCodeShard.uses < DiscountCodeShard.quota,
+                ),
+                DiscountCode.id == DiscountCodeShard.discount_code_id,
+                redeemable(now),
+            )
+            .values(uses=DiscountCodeShard.uses + 1)
+            .returning(DiscountCodeShard.uses)
+            .execution_options(synchronize_session=False)
+        )
+        if result.scalar_one_or_none() is not None:
+            return True
+    return False
+
+
+async def _rebalance(db: AsyncSession, dc: DiscountCode, shards: int) -> None:
+    """
+    Fold shard uses into uses_count and lay out `shards` fresh quotas.
+
+    The caller holds the code row lock. Locking the shard rows waits for
+    in-flight redemptions, which are then counted; later ones see the new
+    quotas.
+    """
+    result = await db.execute(
+        select(DiscountCodeShard)
+        .where(DiscountCodeShard.discount_code_id == dc.id)
+        .order_by(DiscountCodeShard.shard)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    existing = list(result.scalars())
+    dc.uses_count += sum(s.uses for s in existing)
+
+    for extra in existing[shards:]:
+        await db.delete(extra)
+    quotas = split_quota(dc.max_uses, dc.uses_count, shards)
+    for i, quota in enumerate(quotas):
+        if i < len(existing):
+            existing[i].uses = 0
+            existing[i].quota = quota
+        else:
+            db.add(
+                DiscountCodeShard(discount_code_id=dc.id, shard=i, uses=0, quota=quota)
+            )
+    dc.counter_shards = shards
+
+
+async def fold_discount_shards(db: AsyncSession, discount_code_id: int) -> None:
+    """Move shard uses into uses_count and rebalance the quotas."""
+    dc = await db.get(
+        DiscountCode, discount_code_id, with_for_update=True, populate_existing=True
+    )
+    if dc is None or not dc.counter_shards:
+        await db.rollback()
+        return
+
+    await _rebalance(db, dc, dc.counter_shards)
+    await db.commit()
+
+
+async def set_counter_shards(db: AsyncSession, dc: DiscountCode, shards: int) -> None:
+    """
+    Switch a code between a plain counter (0) and N shards, or re-split the
+    quotas after max_uses changed. Commits.
+    """
+    if shards and dc.single_use:
+        raise HTTPException(
+            status_code=400, detail="Sharded counters are only for multi-use codes"
+        )
+
+    await db.refresh(dc, with_for_update=True)
+    await _rebalance(db, dc, shards)
+    await db.commit()
+
+
+async def fold_all_discount_shards(
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    async with sessionmaker() as db:
+        result = await db.execute(
+            select(DiscountCode.id).where(DiscountCode.counter_shards > 0)
+        )
+        for discount_code_id in result.scalars().all():
+            await fold_discount_shards(db, discount_code_id)
+
+
+async def run_discount_shard_folding(
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Background task: fold sharded counters so uses_count stays current.
+
+    Every worker runs it; folds of the same code serialize on its row lock
+    and a fold with nothing to move is a no-op.
+    """
+    while True:
+        await asyncio.sleep(settings.discount_shard_fold_seconds)
+        try:
+            await fold_all_discount_shards(sessionmaker)
+        except Exception:
+            logger.exception("Folding sharded discount counters failed")
@@ -1,12 +1,72 @@
-from typing import Optional, Tuple
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import logging
+import secrets
+import string
+from typing import AsyncIterator, Optional, Tuple
+from sqlalchemy import func, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from datetime import datetime, timezone
 from fastapi import HTTPException
 
-from app.models.discount_code import DiscountCode
+from app.core import metrics
+from app.core.bloom import BloomFilter
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import REDIS_ERRORS, follow_channel, get_redis, mark_redis_unavailable
+from app.db.session import get_sessionmaker
+from app.models.discount_code import DiscountCode, normalize_code
 from app.models.discount_redemption import DiscountRedemption
+from app.services.discount_counters import redeem_from_shards, redeemable
+from app.services.reports import record_discount_rollup
 from app.models.reservation import Reservation
+from app.schemas.discounts import DiscountGenerateIn, DiscountOut
+
+logger = logging.getLogger(__name__)
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+# Random bytes at or above this are dropped so every character is equally likely
+_UNBIASED_BYTE_LIMIT = 256 - 256 % len(CODE_ALPHABET)
+
+# Rows per INSERT: 8 parameters each, well below the 65535 Postgres allows
+GENERATE_CHUNK_ROWS = 5000
+# Rounds of regenerating collided codes before giving up on a chunk
+GENERATE_MAX_ROUNDS = 10
+
+# New codes are published here so other workers add them to their filter
+DISCOUNT_CODES_CHANNEL = "discount_codes"
+
+# Codes looked up recently. Validation from a cached copy may see a stale
+# uses_count; the redemption itself is an atomic UPDATE, so that is harmless.
+_codes = TTLCache(
+    maxsize=settings.discount_cache_max_entries,
+    ttl=settings.discount_cache_ttl_seconds,
+)
+# Every existing code, so unknown codes are rejected without a query.
+# None until built by sync_discount_codes; lookups go to the database then.
+_known_codes: Optional[BloomFilter] = None
+# Periodic catch-ups only read codes past an id watermark. It trails the
+# highest id seen by one round: ids are drawn before their transaction
+# commits, so a lower id may still show up after a higher one.
+_known_through = 0
+_catch_up_from = 0
+# Rows per fetch when reading codes into the filter
+FILTER_FETCH_ROWS = 10000
+
+_GENERATED_COLUMNS = (
+    DiscountCode.id,
+    DiscountCode.code,
+    DiscountCode.percent,
+    DiscountCode.enabled,
+    DiscountCode.description,
+    DiscountCode.single_use,
+    DiscountCode.max_uses,
+    DiscountCode.uses_count,
+    DiscountCode.valid_from,
+    DiscountCode.valid_until,
+)
 
 
 def calculate_discount(original_cost: float, percent: int) -> float:
@@ -16,19 +76,127 @@ def calculate_discount(original_cost: float, percent: int) -> float:
     return (percent / 100.0) * original_cost
 
 
+def _detached_copy(dc: DiscountCode) -> DiscountCode:
+    # Safe to share between requests: bound to no session
+    columns = inspect(DiscountCode).column_attrs
+    return DiscountCode(**{attr.key: getattr(dc, attr.key) for attr in columns})
+
+
 async def get_discount_by_code(db: AsyncSession, code: str) -> DiscountCode:
     """Get discount code by code string (case-insensitive)."""
+    normalized = normalize_code(code)
+    dc = _codes.get(normalized)
+    if dc is not None:
+        return dc
+
+    # Only trusted while Redis is up: otherwise new codes from other workers
+    # may not have reached this filter
+    if (
+        _known_codes is not None
+        and get_redis() is not None
+        and normalized not in _known_codes
+    ):
+        metrics.inc("discount_code_filter_rejected_total")
+        raise HTTPException(status_code=404, detail="Discount code not found")
+
     result = await db.execute(
-        select(DiscountCode).where(func.lower(DiscountCode.code) == code.lower())
+        select(DiscountCode).where(DiscountCode.code_normalized == normalized)
     )
     dc = result.scalar_one_or_none()
 
     if not dc:
         raise HTTPException(status_code=404, detail="Discount code not found")
 
+    dc = _detached_copy(dc)
+    _codes.set(normalized, dc)
     return dc
 
 
+def forget_discount_code(code: str) -> None:
+    """Drop a cached code after it was changed."""
+    _codes.pop(normalize_code(code))
+
+
+async def remember_discount_codes(codes: list[str]) -> None:
+    """Make newly created codes known to every worker's filter."""
+    normalized = [normalize_code(code) for code in codes]
+    if _known_codes is not None:
+        for code in normalized:
+            _known_codes.add(code)
+
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.publish(DISCOUNT_CODES_CHANNEL, "\n".join(normalized))
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
+
+
+def _add_all(known: BloomFilter, codes: list[str]) -> None:
+    for code in codes:
+        known.add(code)
+
+
+async def _add_codes_since(
+    known: BloomFilter, after_id: int, in_thread: bool = False
+) -> int:
+    """Add codes with ids above after_id to known; returns the highest id."""
+    async with get_sessionmaker()() as db:
+        result = await db.stream(
+            select(DiscountCode.id, DiscountCode.code_normalized)
+            .where(DiscountCode.id > after_id)
+            .order_by(DiscountCode.id)
+            .execution_options(yield_per=FILTER_FETCH_ROWS)
+        )
+        async for rows in result.partitions():
+            codes = [row.code_normalized for row in rows]
+            if in_thread:
+                await asyncio.to_thread(_add_all, known, codes)
+            else:
+                _add_all(known, codes)
+            after_id = rows[-1].id
+    return after_id
+
+
+async def rebuild_discount_filter() -> None:
+    """Build the filter from every code; runs when the channel (re)subscribes."""
+    global _known_codes, _known_through, _catch_up_from
+    known = BloomFilter(capacity=settings.discount_bloom_capacity)
+    # Hashing a million codes is seconds of pure Python: off the event loop.
+    # Safe because nothing else touches this filter until it is swapped in.
+    through = await _add_codes_since(known, 0, in_thread=True)
+    _known_codes, _known_through, _catch_up_from = known, through, through
+
+
+async def catch_up_discount_filter() -> None:
+    """Add codes created since the last build, in case a publish was missed."""
+    global _known_through, _catch_up_from
+    if _known_codes is None:
+        await rebuild_discount_filter()
+        return
+    # On the loop: published codes are added to this same filter concurrently
+    through = await _add_codes_since(_known_codes, _catch_up_from)
+    _catch_up_from, _known_through = _known_through, max(through, _known_through)
+
+
+def _add_published_codes(data: str) -> None:
+    if _known_codes is not None:
+        for code in data.split("\n"):
+            _known_codes.add(code)
+
+
+async def sync_discount_codes() -> None:
+    """Background task: build the known-codes filter and keep it current."""
+    await follow_channel(
+        DISCOUNT_CODES_CHANNEL,
+        _add_published_codes,
+        rebuild_discount_filter,
+        settings.discount_filter_refresh_seconds,
+        catch_up=catch_up_discount_filter,
+    )
+
+
 async def validate_discount_code(db: AsyncSession, dc: DiscountCode) -> None:
     """Validate that a discount code can be used."""
 
@@ -79,20 +247,210 @@ async def apply_discount(
         return original_cost, 0.0, None, None
 
 
+async def _counter_shards(db: AsyncSession, discount_code_id: int) -> int:
+    return await db.scalar(
+        select(DiscountCode.counter_shards).where(DiscountCode.id == discount_code_id)
+    )
+
+
+async def redeem_discount_code(
+    db: AsyncSession, discount_code_id: int, counter_shards: int = 0
+) -> bool:
+    """
+    Take one use of a discount code, if it still has one.
+
+    A single conditional UPDATE, so concurrent redemptions of the same code
+    serialize on its row lock and can never exceed max_uses. Codes with
+    sharded counters take the use from one of their shards instead.
+    """
+    now = datetime.now(timezone.utc)
+    if counter_shards:
+        if await redeem_from_shards(db, discount_code_id, counter_shards, now):
+            return True
+        # Sharding may have been switched off or resized since the caller
+        # read the code
+        current = await _counter_shards(db, discount_code_id)
+        if current:
+            return current != counter_shards and await redeem_from_shards(
+                db, discount_code_id, current, now
+            )
+
+    result = await db.execute(
+        update(DiscountCode)
+        .where(
+            DiscountCode.id == discount_code_id,
+            DiscountCode.counter_shards == 0,
+            redeemable(now),
+        )
+        .values(uses_count=DiscountCode.uses_count + 1)
+        .returning(DiscountCode.uses_count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is not None:
+        return True
+
+    # Sharding may have been switched on since the caller read the code
+    shards = await _counter_shards(db, discount_code_id)
+    if shards:
+        return await redeem_from_shards(db, discount_code_id, shards, now)
+    return False
+
+
 async def record_discount_redemption(
     db: AsyncSession,
     discount_code: DiscountCode,
     user_id: int,
     reservation: Reservation,
 ):
-    """Record that a discount code was used."""
+    """Record that a discount code was used; the reservation must be flushed."""
+    # Validated when the price was quoted, but another redemption may have
+    # taken the last use since
+    if not await redeem_discount_code(
+        db, discount_code.id, discount_code.counter_shards
+    ):
+        raise HTTPException(status_code=409, detail="Discount code usage limit reached")
+
+    # Stamped here rather than by the server, so the rollup day matches
+    redeemed_at = datetime.now(timezone.utc)
     redemption = DiscountRedemption(
         discount_code_id=discount_code.id,
         user_id=user_id,
         reservation_id=reservation.id,
+        original_amount=reservation.original_cost,
+        discount_amount=reservation.discount_amount,
+        created_at=redeemed_at,
     )
     db.add(redemption)
+    await record_discount_rollup(
+        db,
+        discount_code.id,
+        redeemed_at,
+        redemption.original_amount,
+        redemption.discount_amount,
+        discount_code.counter_shards,
+    )
+
+
+def random_codes(prefix: str, count: int, length: int = CODE_LENGTH) -> set[str]:
+    """count distinct random codes, drawn from one os.urandom call per round."""
+    codes: set[str] = set()
+    while len(codes) < count:
+        # ~2% of bytes are rejected; ask for a little more than needed
+        raw = secrets.token_bytes((count - len(codes)) * length * 17 // 16 + length)
+        chars = [
+            CODE_ALPHABET[b % len(CODE_ALPHABET)]
+            for b in raw
+            if b < _UNBIASED_BYTE_LIMIT
+        ]
+        for i in range(0, len(chars) - length + 1, length):
+            codes.add(prefix + "".join(chars[i : i + length]))
+            if len(codes) == count:
+                break
+    return codes
+
+
+async def generate_discount_codes(
+    db: AsyncSession, payload: DiscountGenerateIn, batch_id: str
+) -> AsyncIterator[list[Row]]:
+    """
+    Create payload.count new codes, yielding each chunk once committed.
+
+    Candidates are generated in memory and inserted with
+    ON CONFLICT DO NOTHING RETURNING; only the ones that collided with an
+    existing code are regenerated, so there is no per-code lookup.
+    """
+    template = {
+        "percent": payload.percent,
+        "enabled": payload.enabled,
+        "description": payload.description,
+        "single_use": payload.single_use,
+        "max_uses": payload.max_uses,
+        "uses_count": 0,
+        "batch_id": batch_id,
+    }
+
+    remaining = payload.count
+    while remaining:
+        wanted = min(remaining, GENERATE_CHUNK_ROWS)
+        created: list[Row] = []
+        for _ in range(GENERATE_MAX_ROUNDS):
+            candidates = random_codes(payload.prefix, wanted - len(created))
+            result = await db.execute(
+                pg_insert(DiscountCode)
+                .values(
+                    [
+                        {
+                            **template,
+                            "code": code,
+                            "code_normalized": normalize_code(code),
+                        }
+                        for code in candidates
+                    ]
+                )
+                # Either unique index: code, or code_normalized
+                .on_conflict_do_nothing()
+                .returning(*_GENERATED_COLUMNS)
+            )
+            created += result.all()
+            if len(created) == wanted:
+                break
+        else:
+            await db.rollback()
+            raise HTTPException(
+                status_code=500, detail="Failed to generate unique code"
+            )
+
+        await db.commit()
+        await remember_discount_codes([row.code for row in created])
+        remaining -= wanted
+        yield created
+
+
+async def stream_generated_codes(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    payload: DiscountGenerateIn,
+    batch_id: str,
+) -> AsyncIterator[bytes]:
+    """NDJSON of the new codes, sent chunk by chunk as they are committed."""
+    # Own session: the request-scoped one is closed before streaming starts
+    async with sessionmaker() as db:
+        async for rows in generate_discount_codes(db, payload, batch_id):
+            yield "".join(
+                DiscountOut.model_validate(row).model_dump_json() + "\n"
+                for row in rows
+            ).encode("utf-8")
 
-    # Increment usage counter
-    discount_code.uses_count += 1
 
+async def run_discount_generation(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    payload: DiscountGenerateIn,
+    batch_id: str,
+) -> None:
+    """Background job for large batches; progress is visible per chunk."""
+    created = 0
+    try:
+        async with sessionmaker() as db:
+            async for rows in generate_discount_codes(db, payload, batch_id):
+                created += len(rows)
+    except Exception:
+        logger.exception(
+            "Discount batch %s stopped after %s of %s codes",
+            batch_id,
+            created,
+            payload.count,
+        )
+
+
+async def count_discount_batch(db: AsyncSession, batch_id: str) -> int:
+    result = await db.execute(
+        select(func.count()).where(DiscountCode.batch_id == batch_id)
+    )
+    return result.scalar_one()
+
+
+def discount_batch_query(batch_id: str):
+    return (
+        select(*_GENERATED_COLUMNS)
+        .where(DiscountCode.batch_id == batch_id)
+        .order_by(DiscountCode.id)
+    )
@@ -47,6 +47,37 @@ class AccessForbidden(AuthError):
     pass
 
 
+class PasswordHashingBusy(AuthError):
+    pass
+
+
+class InvalidRefreshToken(AuthError):
+    pass
+
+
+class LoginRateLimited(AuthError):
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class ApiKeyNotFound(AuthError):
+    pass
+
+
+class InvalidApiKeyOwner(AuthError):
+    pass
+
+
+# Gates
+class GateError(Exception):
+    pass
+
+
+class GateNotFound(GateError):
+    pass
+
+
 # Users
 class UserError(Exception):
     pass
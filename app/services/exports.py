@@ -0,0 +1,161 @@
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.parking_session import ParkingSession
+from app.models.payment import Payment
+from app.models.reservation import Reservation
+from app.schemas.exports import ExportFormat
+
+# Rows fetched per server-side cursor round trip, and written per chunk
+EXPORT_CHUNK_ROWS = 5000
+
+
+def payments_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+) -> Select:
+    query = select(
+        Payment.id,
+        Payment.session_id,
+        Payment.user_id,
+        Payment.reservation_id,
+        Payment.amount,
+        Payment.status,
+        Payment.created_at,
+        Payment.completed_at,
+    ).order_by(Payment.id)
+    if parking_lot_id is not None:
+        query = query.join(ParkingSession, Payment.session_id == ParkingSession.id)
+        query = query.where(ParkingSession.parking_lot_id == parking_lot_id)
+    # completed_at is stored as naive UTC; ix_payments_completed_at covers it
+    if start is not None:
+        query = query.where(Payment.completed_at >= _naive_utc(start))
+    if end is not None:
+        query = query.where(Payment.completed_at < _naive_utc(end))
+    return query
+
+
+def parking_sessions_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+) -> Select:
+    query = select(
+        ParkingSession.id,
+        ParkingSession.parking_lot_id,
+        ParkingSession.reservation_id,
+        ParkingSession.license_plate,
+        ParkingSession.entry_time,
+        ParkingSession.exit_time,
+        ParkingSession.status,
+        ParkingSession.amount_due,
+        ParkingSession.amount_paid,
+        ParkingSession.closed_at,
+    ).order_by(ParkingSession.id)
+    # (parking_lot_id, entry_time) is covered by ix_session_lot_entry
+    if parking_lot_id is not None:
+        query = query.where(ParkingSession.parking_lot_id == parking_lot_id)
+    if start is not None:
+        query = query.where(ParkingSession.entry_time >= start)
+    if end is not None:
+        query = query.where(ParkingSession.entry_time < end)
+    return query
+
+
+def reservations_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    parking_lot_id: Optional[int] = None,
+) -> Select:
+    query = select(
+        Reservation.id,
+        Reservation.parking_lot_id,
+        Reservation.user_id,
+        Reservation.vehicle_id,
+        Reservation.license_plate,
+        Reservation.planned_start,
+        Reservation.planned_end,
+        Reservation.channel,
+        Reservation.status,
+        Reservation.original_cost,
+        Reservation.discount_amount,
+        Reservation.discount_code_id,
+        Reservation.quoted_cost,
+    ).order_by(Reservation.id)
+    # (parking_lot_id, planned_start) is covered by ix_reservation_lot_time
+    if parking_lot_id is not None:
+        query = query.where(Reservation.parking_lot_id == parking_lot_id)
+    if start is not None:
+        query = query.where(Reservation.planned_start >= start)
+    if end is not None:
+        query = query.where(Reservation.planned_start < end)
+    return query
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _encode(columns: list[str], rows, fmt: ExportFormat) -> bytes:
+    buf = io.StringIO()
+    if fmt == ExportFormat.csv:
+        writer = csv.writer(buf)
+        writer.writerows([_plain(v) for v in row] for row in rows)
+    else:
+        for row in rows:
+            buf.write(json.dumps(dict(zip(columns, map(_plain, row)))))
+            buf.write("\n")
+    return buf.getvalue().encode("utf-8")
+
+
+async def stream_export(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    query: Select,
+    fmt: ExportFormat,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Stream query results as NDJSON or CSV chunks.
+
+    Rows come from a server-side cursor EXPORT_CHUNK_ROWS at a time and each
+    chunk is encoded (and optionally gzipped) before the next one is fetched,
+    so memory stays flat regardless of the export size.
+    """
+    gzipper = zlib.compressobj(wbits=31) if compress else None
+
+    def out(data: bytes) -> bytes:
+        return gzipper.compress(data) if gzipper else data
+
+    # Own session: the request-scoped one is closed before streaming starts
+    async with sessionmaker() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        columns = list(result.keys())
+
+        if fmt == ExportFormat.csv:
+            yield out(_encode(columns, [columns], fmt))
+
+        async for rows in result.partitions():
+            chunk = out(_encode(columns, rows, fmt))
+            if chunk:
+                yield chunk
+
+    if gzipper:
+        yield gzipper.flush()
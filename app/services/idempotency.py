@@ -0,0 +1,181 @@
+import hashlib
+import json
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import REDIS_ERRORS, get_redis, mark_redis_unavailable
+
+# How long a key stays claimed while its first request is still running
+IN_PROGRESS_TTL_SECONDS = 60
+
+# In-process fallback when Redis is unavailable
+_local = TTLCache(
+    maxsize=settings.idempotency_max_entries, ttl=settings.idempotency_ttl_seconds
+)
+
+
+def _fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+def _key(scope: str, key: str) -> str:
+    return f"idempotency:{scope}:{key}"
+
+
+async def _claim(store_key: str, fingerprint: str) -> Optional[dict]:
+    """Claim the key for this request, or return what is already stored."""
+    claim = json.dumps({"fingerprint": fingerprint, "in_progress": True})
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            if await redis.set(store_key, claim, nx=True, ex=IN_PROGRESS_TTL_SECONDS):
+                return None
+            stored = await redis.get(store_key)
+            # Expired between SET and GET: treat as a fresh claim
+            return json.loads(stored) if stored else None
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+
+    if _local.add(store_key, claim, ttl=IN_PROGRESS_TTL_SECONDS):
+        return None
+    return json.loads(_local.get(store_key))
+
+
+async def _store(store_key: str, value: Optional[str]) -> None:
+    redis = get_redis()
+    if redis is not None:
+        try:
+            if value is None:
+                await redis.delete(store_key)
+            else:
+                await redis.set(store_key, value, ex=settings.idempotency_ttl_seconds)
+            return
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+
+    if value is None:
+        _local.pop(store_key)
+    else:
+        _local.set(store_key, value)
+
+
+async def run_idempotent(
+    scope: str,
+    key: Optional[str],
+    payload: BaseModel,
+    status_code: int,
+    call: Callable[[], Awaitable[BaseModel]],
+):
+    """
+    Run call() at most once per (scope, Idempotency-Key).
+
+    Replays of a completed request get the stored response back without
+    touching the database. Only successful responses are stored; a failed
+    request releases the key so the client can retry it.
+    """
+    if not key:
+        return await call()
+
+    store_key = _key(scope, key)
+    fingerprint = _fingerprint(payload)
+
+    stored = await _claim(store_key, fingerprint)
+    if stored is not None:
+        if stored["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        if stored.get("in_progress"):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        return JSONResponse(
+            status_code=stored["status_code"],
+            content=stored["body"],
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        result = await call()
+    except BaseException:
+        await _store(store_key, None)
+        raise
+
+    await _store(
+        store_key,
+        json.dumps(
+            {
+                "fingerprint": fingerprint,
+                "status_code": status_code,
+                "body": result.model_dump(mode="json"),
+            }
+        ),
+    )
+    return result
+
+
+async def stored_results(
+    scope: str, payloads: dict[str, BaseModel]
+) -> dict[str, Optional[dict]]:
+    """
+    Results stored by store_results for keys of a batch, without claiming.
+
+    Maps each key that has a result to its body, or to None when the key
+    was used for a different payload. Keys without a result are left out.
+    """
+    store_keys = [_key(scope, key) for key in payloads]
+    values: Optional[list] = None
+    redis = get_redis()
+    if redis is not None and store_keys:
+        try:
+            values = await redis.mget(store_keys)
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+    if values is None:
+        values = [_local.get(store_key) for store_key in store_keys]
+
+    results: dict[str, Optional[dict]] = {}
+    for (key, payload), value in zip(payloads.items(), values):
+        if value is None:
+            continue
+        stored = json.loads(value)
+        if stored.get("in_progress"):
+            continue
+        same = stored["fingerprint"] == _fingerprint(payload)
+        results[key] = stored["body"] if same else None
+    return results
+
+
+async def store_results(
+    scope: str, results: list[tuple[str, BaseModel, BaseModel]]
+) -> None:
+    """Store (key, payload, result) of batch items for stored_results."""
+    values = {
+        _key(scope, key): json.dumps(
+            {
+                "fingerprint": _fingerprint(payload),
+                "body": result.model_dump(mode="json"),
+            }
+        )
+        for key, payload, result in results
+    }
+    redis = get_redis()
+    if redis is not None and values:
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for store_key, value in values.items():
+                    pipe.set(store_key, value, ex=settings.idempotency_ttl_seconds)
+                await pipe.execute()
+            return
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+
+    for store_key, value in values.items():
+        _local.set(store_key, value)
@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.parking_lot import ParkingLot
-from app.models.user import User, UserRole
+from app.models.user import UserRole
+from app.services.principals import Principal
 from app.schemas.parking_lot import ParkingLotCostIn, ParkingLotIn
 from app.services.exceptions import AccessForbidden, ParkingLotNotFound
 
@@ -40,7 +41,7 @@ async def create_parking_lot(db: AsyncSession, payload: ParkingLotIn):
 
 
 async def update_parking_lot(
-    db: AsyncSession, parking_lot_id: int, payload: ParkingLotIn, current_user: User
+    db: AsyncSession, parking_lot_id: int, payload: ParkingLotIn, current_user: Principal
 ) -> ParkingLot:
     parking_lot = await retrieve_parking_lot(db, parking_lot_id)
 
@@ -67,7 +68,7 @@ async def update_parking_lot(
 
 
 async def delete_parking_lot(
-    db: AsyncSession, parking_lot_id: int, current_user: User
+    db: AsyncSession, parking_lot_id: int, current_user: Principal
 ) -> None:
     parking_lot = await retrieve_parking_lot(db, parking_lot_id)
     if (
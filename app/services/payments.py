@@ -1,20 +1,32 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
+from app.models.parking_lot import ParkingLot
 from app.models.parking_session import ParkingSession, SessionStatus
 from app.models.payment import Payment, PaymentStatus
-from app.models.user import User
-from app.schemas.payment import PaymentIn
+from app.models.reservation import Reservation
+from app.services.principals import Principal
+from app.schemas.payment import (
+    PaymentBatchItemIn,
+    PaymentBatchItemOut,
+    PaymentBatchOutcome,
+    PaymentIn,
+    PaymentOut,
+)
 from app.services.exceptions import (
     PaymentNoEntryOrExitTime,
     PaymentNotFound,
 )
+from app.services.idempotency import store_results, stored_results
+from app.services.reports import record_revenue
 
 
 async def retrieve_payment(
-    db: AsyncSession, payment_id: int, current_user: User
+    db: AsyncSession, payment_id: int, current_user: Principal
 ) -> Payment:
     existing = await db.execute(
         select(Payment)
@@ -28,93 +40,311 @@ async def retrieve_payment(
     return payment
 
 
-async def retrieve_payment_by_plate_and_parking_lot_id(
-    db: AsyncSession, payment: PaymentIn, current_user: User
+async def create_payment(
+    db: AsyncSession, payload: PaymentIn, current_user: Principal
 ) -> Payment:
+    new_payment = Payment()
+
+    db.add(new_payment)
+    await db.flush()  # get PK (new_payment.id)
+
+    await db.commit()
+    await db.refresh(new_payment)
+    return new_payment
+
+
+def calculate_amount_due(
+    entry_time: datetime,
+    amount_due: float,
+    tariff: float,
+    planned_end: Optional[datetime],
+    paid_at: datetime,
+) -> float:
+    # Anonymous session: pay for the time parked
+    if planned_end is None:
+        return (paid_at - entry_time).total_seconds() / 3600 * tariff
+
+    # Reservations
+    # Calculate difference between planned end and actual end
+    difference = (paid_at - planned_end).total_seconds()
+    leeway = 60 * 5
+    if difference - leeway > 0:
+        return amount_due + (difference / 60 + 1) * tariff
+    return amount_due
+
+
+async def lock_payment_for_settlement(db: AsyncSession, payment: PaymentIn):
+    """Lock the active payment row and fetch only what settlement needs."""
     existing = await db.execute(
-        select(Payment)
-        .join(Payment.session)
+        select(
+            Payment.id,
+            Payment.status,
+            Payment.session_id,
+            ParkingSession.entry_time,
+            ParkingSession.amount_due,
+            ParkingLot.tariff,
+            Reservation.planned_end,
+        )
+        .join(ParkingSession, Payment.session_id == ParkingSession.id)
+        .join(ParkingLot, ParkingSession.parking_lot_id == ParkingLot.id)
+        .outerjoin(Reservation, ParkingSession.reservation_id == Reservation.id)
         .where(ParkingSession.parking_lot_id == payment.parking_lot_id)
         .where(ParkingSession.license_plate == payment.license_plate)
         .where(ParkingSession.status == SessionStatus.active)
-        .options(
-            joinedload(Payment.session).joinedload(ParkingSession.parking_lot),
-            joinedload(Payment.session).joinedload(ParkingSession.reservation),
-        )
+        .with_for_update(of=Payment)
     )
 
-    existing_payment = existing.scalar_one_or_none()
-    if existing_payment is None:
+    locked = existing.one_or_none()
+    if locked is None:
         raise PaymentNotFound()
 
-    return existing_payment
+    return locked
 
 
-async def create_payment(
-    db: AsyncSession, payload: PaymentIn, current_user: User
-) -> Payment:
-    new_payment = Payment()
+async def handle_payment(db: AsyncSession, payment: PaymentIn, user: Principal):
+    locked = await lock_payment_for_settlement(db, payment)
+
+    # Someone else settled it while we were waiting on the lock
+    if locked.status == PaymentStatus.paid:
+        await db.commit()
+        return await db.get(Payment, locked.id)
+
+    if locked.entry_time is None:
+        raise PaymentNoEntryOrExitTime()
+
+    paid_at = datetime.now(timezone.utc)
+    amount = calculate_amount_due(
+        locked.entry_time,
+        locked.amount_due,
+        locked.tariff,
+        locked.planned_end,
+        paid_at,
+    )
+    return await mark_payment_paid(
+        db, locked.id, locked.session_id, payment.parking_lot_id, amount, paid_at
+    )
 
-    db.add(new_payment)
-    await db.flush()  # get PK (new_payment.id)
+
+async def mark_payment_paid(
+    db: AsyncSession,
+    payment_id: int,
+    session_id: int,
+    parking_lot_id: int,
+    amount: float,
+    paid_at: datetime,
+) -> Payment:
+    # Settle the session and the payment in one statement:
+    # WITH settled_session AS (UPDATE parking_sessions ... RETURNING id)
+    # UPDATE payments ... FROM settled_session ... RETURNING payments.*
+    settled_session = (
+        update(ParkingSession)
+        .where(ParkingSession.id == session_id)
+        .values(amount_paid=amount, amount_due=0.0)
+        .returning(ParkingSession.id)
+        .cte("settled_session")
+    )
+    result = await db.execute(
+        update(Payment)
+        .where(Payment.id == payment_id)
+        .where(Payment.session_id == settled_session.c.id)
+        .values(
+            status=PaymentStatus.paid,
+            completed_at=paid_at.replace(tzinfo=None),
+            amount=amount,
+        )
+        .returning(Payment)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    paid_payment = result.scalar_one()
+    await record_revenue(db, [(parking_lot_id, paid_at, amount)])
 
     await db.commit()
-    await db.refresh(new_payment)
-    return new_payment
+    return paid_payment
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Meters without a timezone report UTC, like the gates do
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
 
+async def settle_payment_batch(
+    db: AsyncSession, items: list[PaymentBatchItemIn], user: Principal
+) -> list[PaymentBatchItemOut]:
+    """
+    Settle payments queued by an offline meter in a single transaction.
 
-async def handle_payment(db: AsyncSession, payment: PaymentIn, user: User):
-    active_payment = await retrieve_payment_by_plate_and_parking_lot_id(
-        db, payment, user
+    Outcomes are kept per idempotency key in the idempotency store, so an
+    item uploaded again in a later request gets its first outcome back.
+    """
+    scope = f"payments.batch:{user.id}"
+    replays = await stored_results(
+        scope, {item.idempotency_key: item for item in items}
     )
+    latest_paid_at = datetime.now(timezone.utc) + timedelta(
+        seconds=settings.payment_clock_skew_seconds
+    )
+    plates = list({(item.parking_lot_id, item.license_plate) for item in items})
 
-    # Calculate cost
-    active_session = active_payment.session
-
-    # Anonymous session
-    if active_session.reservation is None:
-        entry_time = active_session.entry_time
-        if entry_time is None:
-            raise PaymentNoEntryOrExitTime()
-        active_session.amount_due = (
-            (datetime.now(timezone.utc) - entry_time).total_seconds()
-            / 3600
-            * active_session.parking_lot.tariff
+    # Resolve every active session in one query, locked in a stable order
+    existing = await db.execute(
+        select(
+            Payment.id,
+            Payment.status,
+            Payment.session_id,
+            Payment.amount,
+            Payment.completed_at,
+            ParkingSession.parking_lot_id,
+            ParkingSession.license_plate,
+            ParkingSession.entry_time,
+            ParkingSession.amount_due,
+            ParkingLot.tariff,
+            Reservation.planned_end,
         )
-        return await mark_payment_paid(db, payment, user)
+        .join(ParkingSession, Payment.session_id == ParkingSession.id)
+        .join(ParkingLot, ParkingSession.parking_lot_id == ParkingLot.id)
+        .outerjoin(Reservation, ParkingSession.reservation_id == Reservation.id)
+        .where(
+            tuple_(ParkingSession.parking_lot_id, ParkingSession.license_plate).in_(
+                plates
+            )
+        )
+        .where(ParkingSession.status == SessionStatus.active)
+        .order_by(Payment.id)
+        .with_for_update(of=Payment)
+    )
+    locked: dict[tuple[int, str], list] = {}
+    for row in existing:
+        locked.setdefault((row.parking_lot_id, row.license_plate), []).append(row)
 
-    # Reservations
-    # Calculate difference between planned end and actual end
-    planned_end = active_session.reservation.planned_end
+    results: list[PaymentBatchItemOut] = []
+    seen_keys: set[str] = set()
+    settled: dict[tuple[int, str], PaymentOut] = {}
+    payment_updates: list[dict] = []
+    session_updates: list[dict] = []
+    revenue: list[tuple[int, datetime, float]] = []
 
-    completed_at = datetime.now()
+    for item in items:
+        if item.idempotency_key in seen_keys:
+            results.append(
+                PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.duplicate,
+                )
+            )
+            continue
+        seen_keys.add(item.idempotency_key)
 
-    difference = (completed_at - planned_end).total_seconds()
-    leeway = 60 * 5
-    if difference - leeway > 0:
-        active_session.amount_due += (
-            difference / 60 + 1
-        ) * active_session.parking_lot.tariff
-    return await mark_payment_paid(db, payment, user)
+        if item.idempotency_key in replays:
+            stored = replays[item.idempotency_key]
+            results.append(
+                PaymentBatchItemOut.model_validate(stored)
+                if stored is not None
+                # The key was used before for a different payment
+                else PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.duplicate,
+                )
+            )
+            continue
 
+        plate = (item.parking_lot_id, item.license_plate)
+        rows = locked.get(plate, [])
+        # Which of them the meter charged for is unknown; leave it to staff
+        if len(rows) > 1:
+            results.append(
+                PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.conflict,
+                )
+            )
+            continue
+        row = rows[0] if rows else None
+        if row is None or row.entry_time is None:
+            results.append(
+                PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.not_found,
+                )
+            )
+            continue
 
-async def mark_payment_paid(
-    db: AsyncSession, payment: PaymentIn, user: User
-) -> Payment:
-    active_payment = await retrieve_payment_by_plate_and_parking_lot_id(
-        db, payment, user
-    )
+        # Paid before (online, or earlier in this batch)
+        if plate in settled or row.status == PaymentStatus.paid:
+            results.append(
+                PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.already_paid,
+                    payment=settled.get(plate)
+                    or PaymentOut(
+                        id=row.id,
+                        amount=row.amount or 0.0,
+                        completed_at=row.completed_at,
+                        status=PaymentStatus.paid,
+                    ),
+                )
+            )
+            continue
 
-    if active_payment.status == PaymentStatus.paid:
-        return active_payment
+        # The meter's clock sets the amount and the revenue bucket, so it
+        # must fall within the session
+        paid_at = _as_utc(item.paid_at)
+        if not row.entry_time <= paid_at <= latest_paid_at:
+            results.append(
+                PaymentBatchItemOut(
+                    idempotency_key=item.idempotency_key,
+                    outcome=PaymentBatchOutcome.invalid_paid_at,
+                )
+            )
+            continue
 
-    active_payment.status = PaymentStatus.paid
-    active_payment.completed_at = datetime.now()
-    active_payment.session.amount_paid = active_payment.session.amount_due
-    active_payment.session.amount_due = 0.0
-    active_payment.amount = active_payment.session.amount_due
-    print(active_payment.amount)
+        amount = calculate_amount_due(
+            row.entry_time, row.amount_due, row.tariff, row.planned_end, paid_at
+        )
+        completed_at = paid_at.replace(tzinfo=None)
+
+        session_updates.append(
+            {"id": row.session_id, "amount_paid": amount, "amount_due": 0.0}
+        )
+        payment_updates.append(
+            {
+                "id": row.id,
+                "status": PaymentStatus.paid,
+                "completed_at": completed_at,
+                "amount": amount,
+            }
+        )
+        revenue.append((item.parking_lot_id, paid_at, amount))
+        settled[plate] = PaymentOut(
+            id=row.id,
+            amount=amount,
+            completed_at=completed_at,
+            status=PaymentStatus.paid,
+        )
+        results.append(
+            PaymentBatchItemOut(
+                idempotency_key=item.idempotency_key,
+                outcome=PaymentBatchOutcome.settled,
+                payment=settled[plate],
+            )
+        )
+
+    # Bulk UPDATE by primary key, one executemany per table
+    if payment_updates:
+        await db.execute(update(ParkingSession), session_updates)
+        await db.execute(update(Payment), payment_updates)
+        await record_revenue(db, revenue)
 
     await db.commit()
-    await db.refresh(active_payment)
-    return active_payment
+    # Final outcomes only; not_found may still change, e.g. a late gate event
+    final = (PaymentBatchOutcome.settled, PaymentBatchOutcome.already_paid)
+    await store_results(
+        scope,
+        [
+            (item.idempotency_key, item, result)
+            for item, result in zip(items, results)
+            if result.outcome in final and item.idempotency_key not in replays
+        ],
+    )
+    return results
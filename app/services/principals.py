@@ -0,0 +1,104 @@
+import json
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import REDIS_ERRORS, get_redis, mark_redis_unavailable
+from app.models.user import User, UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated caller: only the user fields authorization needs."""
+
+    id: int
+    role: UserRole
+    active: bool
+    # Only set for machine clients using a scoped API key
+    parking_lot_id: Optional[int] = None
+    gate_id: Optional[int] = None
+
+
+# Per-worker copy in front of the shared Redis entry. Its TTL bounds how long
+# another worker can serve a principal after it was invalidated.
+_local = TTLCache(
+    maxsize=settings.principal_cache_max_entries,
+    ttl=settings.principal_cache_local_ttl_seconds,
+)
+
+
+def _key(user_id: int) -> str:
+    return f"principal:{user_id}"
+
+
+async def _load_from_redis(user_id: int) -> Optional[Principal]:
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        stored = await redis.get(_key(user_id))
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
+        return None
+    if stored is None:
+        return None
+
+    data = json.loads(stored)
+    return Principal(id=data["id"], role=UserRole(data["role"]), active=data["active"])
+
+
+async def _store_in_redis(principal: Principal) -> None:
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.set(
+            _key(principal.id),
+            json.dumps(
+                {
+                    "id": principal.id,
+                    "role": principal.role.value,
+                    "active": principal.active,
+                }
+            ),
+            ex=settings.principal_cache_ttl_seconds,
+        )
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
+
+
+async def get_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Principal for user_id from the local cache, then Redis, then the database."""
+    principal = _local.get(user_id)
+    if principal is not None:
+        return principal
+
+    principal = await _load_from_redis(user_id)
+    if principal is None:
+        result = await db.execute(
+            select(User.id, User.role, User.active).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        principal = Principal(id=row.id, role=row.role, active=bool(row.active))
+        await _store_in_redis(principal)
+
+    _local.set(user_id, principal)
+    return principal
+
+
+async def invalidate_principal(user_id: int) -> None:
+    """Drop a cached principal after its user row changed or was deleted."""
+    _local.pop(user_id)
+
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.delete(_key(user_id))
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
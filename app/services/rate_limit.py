@@ -0,0 +1,138 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+from redis.commands.core import AsyncScript
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis import REDIS_ERRORS, get_redis, mark_redis_unavailable
+from app.services.exceptions import LoginRateLimited
+
+# Token buckets checked and charged together: a request is admitted only if
+# every bucket has a token, and then takes one from each.
+# KEYS: bucket keys. ARGV: now, then capacity and refill rate per key.
+# Returns {seconds until admitted (as a string, 0 when admitted), index of the
+# bucket that limited (1-based, 0 when admitted)}.
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local limited = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    tokens[i] = level
+    if level < 1 and (1 - level) / rate > wait then
+        wait = (1 - level) / rate
+        limited = i
+    end
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local level = tokens[i]
+    if limited == 0 then
+        level = level - 1
+    end
+    redis.call('HSET', key, 'tokens', level, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate))
+end
+return {tostring(wait), limited}
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Bucket:
+    key: str
+    capacity: int
+    refill_per_second: float
+
+
+# In-process fallback while Redis is unavailable: limits become per worker
+_local = TTLCache(maxsize=settings.rate_limit_max_entries, ttl=3600)
+_script: Optional[AsyncScript] = None
+
+
+def _take_local(buckets: list[Bucket], now: float) -> tuple[float, int]:
+    levels = []
+    wait, limited = 0.0, 0
+    for i, bucket in enumerate(buckets, start=1):
+        level, ts = _local.get(bucket.key, (bucket.capacity, now))
+        level = min(
+            bucket.capacity, level + max(0.0, now - ts) * bucket.refill_per_second
+        )
+        levels.append(level)
+        if level < 1 and (1 - level) / bucket.refill_per_second > wait:
+            wait = (1 - level) / bucket.refill_per_second
+            limited = i
+
+    for bucket, level in zip(buckets, levels):
+        if limited == 0:
+            level -= 1
+        _local.set(
+            bucket.key,
+            (level, now),
+            ttl=bucket.capacity / bucket.refill_per_second,
+        )
+    return wait, limited
+
+
+async def take(buckets: list[Bucket]) -> tuple[float, int]:
+    """
+    Take a token from every bucket, atomically across workers.
+
+    Returns (0, 0) when admitted, otherwise the seconds until a retry can
+    succeed and the 1-based index of the bucket that ran dry.
+    """
+    now = time.time()
+
+    redis = get_redis()
+    if redis is not None:
+        args: list = [now]
+        for bucket in buckets:
+            args += [bucket.capacity, bucket.refill_per_second]
+        global _script
+        if _script is None or _script.registered_client is not redis:
+            # Runs by SHA after the first call, loading the script on NOSCRIPT
+            _script = redis.register_script(TOKEN_BUCKET_LUA)
+        try:
+            wait, limited = await _script(keys=[b.key for b in buckets], args=args)
+            return float(wait), int(limited)
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+
+    metrics.inc("rate_limit_local_fallback_total")
+    return _take_local(buckets, now)
+
+
+async def limit_login_attempts(client_ip: Optional[str], email: str) -> None:
+    """Charge a login attempt to the caller's IP and to the target account."""
+    # Hashed so Redis does not hold a list of email addresses
+    account = hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+    buckets = [
+        Bucket(
+            f"ratelimit:login:email:{account}",
+            settings.login_rate_email_burst,
+            settings.login_rate_email_per_minute / 60,
+        )
+    ]
+    if client_ip is not None:
+        buckets.append(
+            Bucket(
+                f"ratelimit:login:ip:{client_ip}",
+                settings.login_rate_ip_burst,
+                settings.login_rate_ip_per_minute / 60,
+            )
+        )
+
+    wait, limited = await take(buckets)
+    if limited:
+        metrics.inc("login_rate_limited_total")
+        metrics.inc("login_rate_limited_email" if limited == 1 else "login_rate_limited_ip")
+        raise LoginRateLimited(retry_after=wait)
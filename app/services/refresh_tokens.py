@@ -0,0 +1,106 @@
+import hmac
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.services.exceptions import InvalidRefreshToken
+from app.services.security import hmac_digest
+
+
+def _parse(token: str) -> tuple[int, str]:
+    # "<row id>.<secret>": the id finds the row without an index on the hash
+    token_id, _, secret = token.partition(".")
+    if not token_id.isdigit() or not secret:
+        raise InvalidRefreshToken()
+    return int(token_id), secret
+
+
+def new_family_id() -> str:
+    """Id of a login session's refresh tokens; access tokens carry it too."""
+    return secrets.token_hex(16)
+
+
+async def issue_refresh_token(
+    db: AsyncSession, user_id: int, family_id: Optional[str] = None
+) -> str:
+    """Create a refresh token; the caller commits."""
+    secret = secrets.token_urlsafe(32)
+    token = RefreshToken(
+        user_id=user_id,
+        family_id=family_id or new_family_id(),
+        token_hash=hmac_digest(secret),
+        expires_at=datetime.now(tz=timezone.utc)
+        + timedelta(days=settings.refresh_token_expire_days),
+    )
+    db.add(token)
+    await db.flush()
+    return f"{token.id}.{secret}"
+
+
+async def revoke_refresh_family(db: AsyncSession, family_id: str) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id)
+        .values(revoked=True)
+    )
+    await db.commit()
+
+
+async def rotate_refresh_token(
+    db: AsyncSession, token: str
+) -> tuple[int, str, str]:
+    """
+    Exchange a refresh token for a new one in the same family.
+
+    Returns (user_id, family_id, new token). Each token can be exchanged
+    once. Presenting an already exchanged token means it leaked, so the
+    whole family is revoked and both the thief and the legitimate client
+    have to log in again. Tokens of deactivated users are refused without
+    being used up.
+    """
+    token_id, secret = _parse(token)
+    result = await db.execute(
+        select(
+            RefreshToken.user_id,
+            RefreshToken.family_id,
+            RefreshToken.token_hash,
+            RefreshToken.expires_at,
+            RefreshToken.used_at,
+            RefreshToken.revoked,
+            User.active,
+        )
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.id == token_id)
+    )
+    row = result.one_or_none()
+    if row is None or not hmac.compare_digest(row.token_hash, hmac_digest(secret)):
+        raise InvalidRefreshToken()
+    if row.revoked:
+        raise InvalidRefreshToken()
+    if row.used_at is not None:
+        await revoke_refresh_family(db, row.family_id)
+        raise InvalidRefreshToken()
+
+    now = datetime.now(tz=timezone.utc)
+    if row.expires_at <= now or not row.active:
+        raise InvalidRefreshToken()
+
+    # Conditional so two concurrent exchanges cannot both succeed
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == token_id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+        .returning(RefreshToken.id)
+    )
+    if claimed.scalar_one_or_none() is None:
+        await revoke_refresh_family(db, row.family_id)
+        raise InvalidRefreshToken()
+
+    new_token = await issue_refresh_token(db, row.user_id, row.family_id)
+    await db.commit()
+    return row.user_id, row.family_id, new_token
@@ -0,0 +1,232 @@
+import random
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional
+from sqlalchemy import Date, cast, delete, func, insert, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.discount_code import DiscountCode
+from app.models.discount_redemption import DiscountRedemption
+from app.models.discount_rollup import DiscountRollup
+from app.models.parking_session import ParkingSession
+from app.models.payment import Payment, PaymentStatus
+from app.models.revenue_rollup import RevenueRollup
+from app.schemas.reports import DiscountDayOut, RevenueBucketOut, RevenueGranularity
+
+# Inlined rather than bound, so GROUP BY matches the selected expression
+HOUR = literal_column("'hour'")
+DAY = literal_column("'day'")
+UTC = literal_column("'UTC'")
+
+
+def hour_bucket(paid_at: datetime) -> datetime:
+    return paid_at.replace(minute=0, second=0, microsecond=0)
+
+
+async def record_revenue(
+    db: AsyncSession, settlements: Iterable[tuple[int, datetime, float]]
+) -> None:
+    """
+    Add settled (parking_lot_id, paid_at, amount) entries to the hourly rollup.
+
+    Runs inside the settlement transaction, so the rollup commits or rolls
+    back together with the payments it counts.
+    """
+    buckets: dict[tuple[int, datetime], list[float]] = defaultdict(lambda: [0.0, 0])
+    for parking_lot_id, paid_at, amount in settlements:
+        bucket = buckets[(parking_lot_id, hour_bucket(paid_at))]
+        bucket[0] += amount
+        bucket[1] += 1
+
+    if not buckets:
+        return
+
+    # One row per bucket: ON CONFLICT cannot touch the same row twice. Rows
+    # are locked in key order, so concurrent settlements cannot deadlock
+    stmt = pg_insert(RevenueRollup).values(
+        [
+            {
+                "parking_lot_id": parking_lot_id,
+                "bucket_start": bucket_start,
+                "amount": amount,
+                "payments_count": count,
+            }
+            for (parking_lot_id, bucket_start), (amount, count) in sorted(
+                buckets.items()
+            )
+        ]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[RevenueRollup.parking_lot_id, RevenueRollup.bucket_start],
+            set_={
+                "amount": RevenueRollup.amount + stmt.excluded.amount,
+                "payments_count": RevenueRollup.payments_count
+                + stmt.excluded.payments_count,
+            },
+        )
+    )
+
+
+async def get_revenue(
+    db: AsyncSession,
+    granularity: RevenueGranularity,
+    parking_lot_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[RevenueBucketOut]:
+    """Revenue per lot per hour or day, read from the rollup table only."""
+    if granularity == RevenueGranularity.hour:
+        bucket_start = RevenueRollup.bucket_start
+    else:
+        bucket_start = func.date_trunc(DAY, RevenueRollup.bucket_start, UTC)
+
+    query = select(
+        RevenueRollup.parking_lot_id,
+        bucket_start.label("bucket_start"),
+        func.sum(RevenueRollup.amount).label("amount"),
+        func.sum(RevenueRollup.payments_count).label("payments_count"),
+    )
+    if parking_lot_id is not None:
+        query = query.where(RevenueRollup.parking_lot_id == parking_lot_id)
+    if start is not None:
+        query = query.where(RevenueRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(RevenueRollup.bucket_start < end)
+
+    query = query.group_by(RevenueRollup.parking_lot_id, bucket_start).order_by(
+        RevenueRollup.parking_lot_id, bucket_start
+    )
+    result = await db.execute(query)
+    return [RevenueBucketOut.model_validate(row) for row in result]
+
+
+async def rebuild_revenue_rollups(db: AsyncSession) -> int:
+    """Rebuild the whole rollup table from paid payments in one set-based pass."""
+    # completed_at is stored as naive UTC
+    bucket_start = func.timezone(UTC, func.date_trunc(HOUR, Payment.completed_at))
+    history = (
+        select(
+            ParkingSession.parking_lot_id,
+            bucket_start,
+            func.coalesce(func.sum(Payment.amount), 0.0),
+            func.count(Payment.id),
+        )
+        .join(ParkingSession, Payment.session_id == ParkingSession.id)
+        .where(Payment.status == PaymentStatus.paid)
+        .where(Payment.completed_at.is_not(None))
+        .group_by(ParkingSession.parking_lot_id, bucket_start)
+    )
+
+    await db.execute(delete(RevenueRollup))
+    result = await db.execute(
+        insert(RevenueRollup).from_select(
+            ["parking_lot_id", "bucket_start", "amount", "payments_count"], history
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def record_discount_rollup(
+    db: AsyncSession,
+    discount_code_id: int,
+    redeemed_at: datetime,
+    original_amount: float,
+    discount_amount: float,
+    counter_shards: int = 0,
+) -> None:
+    """
+    Add one redemption to the daily rollup of its code.
+
+    Runs inside the redemption transaction, like record_revenue.
+    """
+    stmt = pg_insert(DiscountRollup).values(
+        discount_code_id=discount_code_id,
+        day=redeemed_at.astimezone(timezone.utc).date(),
+        shard=random.randrange(max(1, counter_shards)),
+        redemptions=1,
+        original_amount=original_amount,
+        discount_amount=discount_amount,
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[
+                DiscountRollup.discount_code_id,
+                DiscountRollup.day,
+                DiscountRollup.shard,
+            ],
+            set_={
+                "redemptions": DiscountRollup.redemptions + 1,
+                "original_amount": DiscountRollup.original_amount
+                + stmt.excluded.original_amount,
+                "discount_amount": DiscountRollup.discount_amount
+                + stmt.excluded.discount_amount,
+            },
+        )
+    )
+
+
+async def get_discount_report(
+    db: AsyncSession,
+    discount_code_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> list[DiscountDayOut]:
+    """Redemptions per code per day, read from the rollup table only."""
+    query = select(
+        DiscountRollup.discount_code_id,
+        DiscountCode.code,
+        DiscountRollup.day,
+        func.sum(DiscountRollup.redemptions).label("redemptions"),
+        func.sum(DiscountRollup.original_amount).label("original_amount"),
+        func.sum(DiscountRollup.discount_amount).label("discount_amount"),
+    ).join(DiscountCode, DiscountRollup.discount_code_id == DiscountCode.id)
+    if discount_code_id is not None:
+        query = query.where(DiscountRollup.discount_code_id == discount_code_id)
+    if start is not None:
+        query = query.where(DiscountRollup.day >= start)
+    if end is not None:
+        query = query.where(DiscountRollup.day < end)
+
+    query = query.group_by(
+        DiscountRollup.discount_code_id, DiscountCode.code, DiscountRollup.day
+    ).order_by(DiscountRollup.day, DiscountRollup.discount_code_id)
+    result = await db.execute(query)
+    return [DiscountDayOut.model_validate(row) for row in result]
+
+
+async def rebuild_discount_rollups(db: AsyncSession) -> int:
+    """
+    Rebuild the discount rollups from the redemption log in one pass.
+
+    Redemptions carry the amounts record_discount_rollup added, so the
+    rebuild agrees with it even after a reservation changed or was deleted.
+    """
+    day = cast(func.timezone(UTC, DiscountRedemption.created_at), Date)
+    history = select(
+        DiscountRedemption.discount_code_id,
+        day,
+        literal(0),
+        func.count(DiscountRedemption.id),
+        func.coalesce(func.sum(DiscountRedemption.original_amount), 0.0),
+        func.coalesce(func.sum(DiscountRedemption.discount_amount), 0.0),
+    ).group_by(DiscountRedemption.discount_code_id, day)
+
+    await db.execute(delete(DiscountRollup))
+    result = await db.execute(
+        insert(DiscountRollup).from_select(
+            [
+                "discount_code_id",
+                "day",
+                "shard",
+                "redemptions",
+                "original_amount",
+                "discount_amount",
+            ],
+            history,
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -5,7 +5,7 @@ from datetime import datetime
 
 from app.models.reservation import Reservation, ReservationStatus, ReservationChannel
 from app.models.parking_lot import ParkingLot
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.reservations import ReservationIn
 from app.services.exceptions import (
     ParkingLotNotFound,
@@ -74,7 +74,7 @@ async def calculate_reservation_cost(
 
 
 async def create_reservation(
-    db: AsyncSession, payload: ReservationIn, current_user: User
+    db: AsyncSession, payload: ReservationIn, current_user: Principal
 ) -> Reservation:
     """Create a new reservation with capacity checking."""
 
@@ -113,12 +113,12 @@ async def create_reservation(
     )
 
     db.add(reservation)
+    await db.flush()
 
     # 5. Record discount redemption if used
     if discount_code_id and dc:
         await record_discount_redemption(db, dc, current_user.id, reservation)
 
-    await db.flush()
     await db.commit()
     await db.refresh(reservation)
 
@@ -126,7 +126,7 @@ async def create_reservation(
 
 
 async def retrieve_reservation(
-    db: AsyncSession, reservation_id: int, current_user: User
+    db: AsyncSession, reservation_id: int, current_user: Principal
 ) -> Reservation:
     """Get a reservation by ID."""
     reservation = await db.get(Reservation, reservation_id)
@@ -162,7 +162,7 @@ async def try_get_valid_reservation_by_plate(
 
 
 async def delete_reservation(
-    db: AsyncSession, reservation_id: int, current_user: User
+    db: AsyncSession, reservation_id: int, current_user: Principal
 ) -> None:
     """Delete a reservation by ID."""
     reservation = await db.get(Reservation, reservation_id)
@@ -0,0 +1,96 @@
+import time
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.db.redis import (
+    REDIS_ERRORS,
+    follow_channel,
+    get_redis,
+    mark_redis_unavailable,
+)
+
+# Sorted set of revoked jti, scored by the token's exp
+REVOKED_KEY = "revoked_tokens"
+REVOKED_CHANNEL = "revoked_tokens"
+
+_bloom = BloomFilter(capacity=settings.revocation_bloom_capacity)
+# Revocations this worker made while Redis was unavailable (jti -> exp)
+_local_revoked: dict[str, int] = {}
+
+
+async def revoke_token(jti: str, exp: int) -> None:
+    """Revoke a token until it would have expired anyway."""
+    _bloom.add(jti)
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.zadd(REVOKED_KEY, {jti: exp})
+                pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+                pipe.publish(REVOKED_CHANNEL, jti)
+                await pipe.execute()
+            return
+        except REDIS_ERRORS:
+            mark_redis_unavailable()
+
+    _local_revoked[jti] = exp
+
+
+async def is_token_revoked(jti: str) -> bool:
+    # Fast path: the filter has no false negatives, so no network call
+    if jti not in _bloom:
+        return False
+
+    if jti in _local_revoked:
+        return True
+
+    redis = get_redis()
+    if redis is None:
+        # Cannot confirm; a filter hit is most likely a real revocation
+        return True
+    try:
+        return await redis.zscore(REVOKED_KEY, jti) is not None
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
+        return True
+
+
+async def rebuild_revocation_filter() -> None:
+    """Reload the filter from Redis, dropping tokens that have expired."""
+    global _bloom
+    redis = get_redis()
+    if redis is None:
+        return
+
+    now = time.time()
+    try:
+        live = await redis.zrangebyscore(REVOKED_KEY, now, "+inf")
+    except REDIS_ERRORS:
+        mark_redis_unavailable()
+        return
+
+    bloom = BloomFilter(capacity=settings.revocation_bloom_capacity)
+    for jti in live:
+        bloom.add(jti.decode() if isinstance(jti, bytes) else jti)
+    for jti, exp in list(_local_revoked.items()):
+        if exp < now:
+            del _local_revoked[jti]
+        else:
+            bloom.add(jti)
+    _bloom = bloom
+
+
+async def sync_revocations() -> None:
+    """
+    Background task: keep this worker's filter in step with other workers.
+
+    New revocations arrive over pub/sub; a periodic rebuild drops expired
+    tokens and catches anything published while we were disconnected.
+    """
+    await follow_channel(
+        REVOKED_CHANNEL,
+        lambda jti: _bloom.add(jti),
+        rebuild_revocation_filter,
+        settings.revocation_refresh_seconds,
+    )
@@ -1,13 +1,111 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, TypeVar
 from passlib.hash import argon2
 
+from app.core import metrics
+from app.core.config import settings
+from app.services.exceptions import PasswordHashingBusy
+
+T = TypeVar("T")
+
+_pool: ProcessPoolExecutor | None = None
+_in_flight = 0
+_dummy_hash: Optional[str] = None
+
+
+def make_hasher(time_cost: int, memory_cost: int, parallelism: int):
+    return argon2.using(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+
+
+# Built at import, so pool workers pick up the same parameters
+_hasher = make_hasher(
+    settings.argon2_time_cost, settings.argon2_memory_cost, settings.argon2_parallelism
+)
+
 
 def hash_password(plain: str) -> str:
-    return argon2.hash(plain)
+    return _hasher.hash(plain)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return argon2.verify(plain, hashed)
+    return _hasher.verify(plain, hashed)
 
 
 def needs_update(hashed: str) -> bool:
-    return argon2.needs_update(hashed)
+    # True for hashes made with other parameters than the configured ones
+    return _hasher.needs_update(hashed)
+
+
+def hmac_digest(secret: str) -> str:
+    """
+    Keyed SHA-256 of a high-entropy random secret (refresh tokens, API keys).
+
+    Such secrets cannot be brute forced, so they do not need Argon2.
+    """
+    return hmac.new(
+        settings.jwt_secret.encode("utf-8"), secret.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+    return _pool
+
+
+def shutdown_hashing_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def hashing_queue_depth() -> int:
+    """Hash jobs submitted to the pool and not finished yet."""
+    return _in_flight
+
+
+metrics.register_gauge("password_hashing_queue_depth", hashing_queue_depth)
+
+
+async def _run_in_pool(fn: Callable[..., T], *args) -> T:
+    # Argon2 burns tens of ms of CPU; off the event loop so gates keep flowing
+    global _in_flight
+    if _in_flight >= settings.password_hash_workers + settings.password_hash_max_queue:
+        metrics.inc("password_hashing_rejected_total")
+        raise PasswordHashingBusy()
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password_async(plain: str) -> str:
+    return await _run_in_pool(hash_password, plain)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_in_pool(verify_password, plain, hashed)
+
+
+async def dummy_hash() -> str:
+    """
+    Hash of a random password with the live parameters.
+
+    Verified against when the account does not exist, so that an unknown
+    email costs the same time and CPU as a wrong password.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password_async(secrets.token_urlsafe(16))
+    return _dummy_hash
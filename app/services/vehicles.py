@@ -3,12 +3,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
 from app.models.vehicle import Vehicle
-from app.models.user import User
+from app.services.principals import Principal
 from app.schemas.vehicle import VehicleIn
 
 
 async def create_vehicle(
-    db: AsyncSession, payload: VehicleIn, current_user: User
+    db: AsyncSession, payload: VehicleIn, current_user: Principal
 ) -> Vehicle:
     """Create a new vehicle for the current user."""
 
@@ -40,13 +40,13 @@ async def create_vehicle(
     return vehicle
 
 
-async def get_user_vehicles(db: AsyncSession, current_user: User) -> list[Vehicle]:
+async def get_user_vehicles(db: AsyncSession, current_user: Principal) -> list[Vehicle]:
     """Get all vehicles for the current user."""
     result = await db.execute(select(Vehicle).where(Vehicle.user_id == current_user.id))
     return list(result.scalars().all())
 
 
-async def get_vehicle(db: AsyncSession, vehicle_id: int, current_user: User) -> Vehicle:
+async def get_vehicle(db: AsyncSession, vehicle_id: int, current_user: Principal) -> Vehicle:
     """Get a specific vehicle."""
     vehicle = await db.get(Vehicle, vehicle_id)
 
@@ -61,7 +61,7 @@ async def get_vehicle(db: AsyncSession, vehicle_id: int, current_user: User) ->
 
 
 async def update_vehicle(
-    db: AsyncSession, vehicle_id: int, payload: VehicleIn, current_user: User
+    db: AsyncSession, vehicle_id: int, payload: VehicleIn, current_user: Principal
 ) -> Vehicle:
     """Update a vehicle."""
     vehicle = await get_vehicle(db, vehicle_id, current_user)
@@ -90,7 +90,7 @@ async def update_vehicle(
     return vehicle
 
 
-async def delete_vehicle(db: AsyncSession, vehicle_id: int, current_user: User) -> None:
+async def delete_vehicle(db: AsyncSession, vehicle_id: int, current_user: Principal) -> None:
     """Delete a vehicle."""
     vehicle = await get_vehicle(db, vehicle_id, current_user)
 
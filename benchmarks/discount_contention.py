@@ -0,0 +1,109 @@
+"""
+Concurrent redemptions of one discount code.
+
+Fires --redemptions concurrent redemptions at a single code limited to
+--max-uses, each in its own session and transaction, and compares the old
+read-then-increment with the conditional UPDATE in app.services.discounts.
+Needs a database with the schema applied (DATABASE_URL); the code it creates
+is deleted afterwards.
+
+    python -m benchmarks.discount_contention [--redemptions 500] [--max-uses 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import statistics
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.discount_code import DiscountCode
+from app.services.discounts import redeem_discount_code
+
+
+async def _read_then_increment(db: AsyncSession, code_id: int) -> bool:
+    # What record_discount_redemption did before: validate, then += 1
+    dc = await db.get(DiscountCode, code_id)
+    if dc.max_uses and dc.uses_count >= dc.max_uses:
+        return False
+    dc.uses_count += 1
+    return True
+
+
+async def _run(sessionmaker, redeem, redemptions: int, max_uses: int) -> dict:
+    async with sessionmaker() as db:
+        dc = DiscountCode(
+            code=f"BENCH-{secrets.token_hex(6)}",
+            percent=10,
+            max_uses=max_uses,
+            uses_count=0,
+        )
+        db.add(dc)
+        await db.commit()
+        code_id = dc.id
+
+    latencies: list[float] = []
+
+    async def one() -> bool:
+        started = time.perf_counter()
+        async with sessionmaker() as db:
+            ok = await redeem(db, code_id)
+            await db.commit()
+        latencies.append((time.perf_counter() - started) * 1000)
+        return ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(redemptions)))
+    elapsed = time.perf_counter() - started
+
+    async with sessionmaker() as db:
+        uses_count = (await db.get(DiscountCode, code_id)).uses_count
+        await db.execute(delete(DiscountCode).where(DiscountCode.id == code_id))
+        await db.commit()
+
+    latencies.sort()
+    accepted = sum(results)
+    return {
+        "redemptions": redemptions,
+        "max_uses": max_uses,
+        "accepted": accepted,
+        "uses_count": uses_count,
+        # Accepted redemptions the counter does not reflect
+        "lost_updates": accepted - uses_count,
+        "over_limit": max(0, accepted - max_uses),
+        "elapsed_s": round(elapsed, 2),
+        "latency_p50_ms": round(statistics.median(latencies), 1),
+        "latency_p99_ms": round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1
+        ),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redemptions", type=int, default=500)
+    parser.add_argument("--max-uses", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_async_engine(
+        settings.database_url, pool_size=args.pool_size, max_overflow=0
+    )
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        for name, redeem in (
+            ("read_then_increment", _read_then_increment),
+            ("conditional_update", redeem_discount_code),
+        ):
+            print(name, await _run(sessionmaker, redeem, args.redemptions, args.max_uses))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Peak memory of reading a large legacy data file.
+
+Writes a synthetic reservations-like JSON array of --size-mb megabytes, then
+reads it in a fresh process per reader and reports peak RSS and items/s:
+json.load (what the importers did before; skipped above --json-load-max-mb)
+and app.scripts.json_stream with each available backend.
+
+    python -m benchmarks.json_reader_memory [--size-mb 2048] [--keep]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.scripts import json_stream
+
+
+def write_file(path: Path, size_mb: int) -> int:
+    target = size_mb * 1024 * 1024
+    written = 0
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[")
+        while written < target:
+            item = json.dumps(
+                {
+                    "id": count,
+                    "user_id": count % 100_000,
+                    "vehicle_id": count % 150_000,
+                    "parking_lot_id": count % 1_500,
+                    "start_time": "2024-03-01T10:00:00Z",
+                    "end_time": "2024-03-01T12:30:00Z",
+                    "status": "confirmed",
+                    "cost": 12.5,
+                }
+            )
+            if count:
+                f.write(",\n")
+            f.write(item)
+            written += len(item) + 2
+            count += 1
+        f.write("]")
+    return count
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def _read(path: str, reader: str, results) -> None:
+    started = time.perf_counter()
+    if reader == "json.load":
+        with open(path, encoding="utf-8") as f:
+            count = len(json.load(f))
+    else:
+        count = sum(1 for _ in json_stream.iter_json_array(Path(path), backend=reader))
+    elapsed = time.perf_counter() - started
+    results.put((count, elapsed, _peak_rss_mb()))
+
+
+def measure(path: Path, reader: str) -> dict:
+    # A fresh process per reader, so peaks do not carry over
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_read, args=(str(path), reader, results))
+    process.start()
+    count, elapsed, peak_mb = results.get()
+    process.join()
+    return {
+        "reader": reader,
+        "items": count,
+        "elapsed_s": round(elapsed, 1),
+        "items_per_s": round(count / elapsed),
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--json-load-max-mb", type=int, default=1024)
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    path = Path(args.dir) / f"bench_reservations_{args.size_mb}mb.json"
+    if not path.exists():
+        started = time.perf_counter()
+        count = write_file(path, args.size_mb)
+        print(f"wrote {count} items to {path} in {time.perf_counter() - started:.1f}s")
+
+    readers = ["python"]
+    if json_stream.ijson is not None:
+        readers.append("ijson")
+        print(f"ijson backend: {json_stream.ijson.backend}")
+    if args.size_mb <= args.json_load_max_mb:
+        readers.insert(0, "json.load")
+    try:
+        for reader in readers:
+            print(measure(path, reader))
+    finally:
+        if not args.keep:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Gate latency during a login storm.
+
+Simulates gate traffic as a coroutine that wakes up every few milliseconds
+and records how late it was scheduled, while a burst of Argon2 verifies runs
+concurrently. Compares the old inline verify (on the event loop) with the
+process pool from app.services.security.
+
+    python -m benchmarks.login_storm [--logins 200] [--gate-interval-ms 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services import security
+from app.services.exceptions import PasswordHashingBusy
+
+PASSWORD = "correct horse battery staple"
+
+
+async def _gate_traffic(stop: asyncio.Event, interval: float) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+    return lags
+
+
+async def _inline_login(hashed: str) -> None:
+    # What login_account did before: verify on the event loop
+    security.verify_password(PASSWORD, hashed)
+    await asyncio.sleep(0)
+
+
+async def _pooled_login(hashed: str) -> bool:
+    try:
+        await security.verify_password_async(PASSWORD, hashed)
+        return True
+    except PasswordHashingBusy:
+        return False
+
+
+async def _storm(login, logins: int, interval: float, hashed: str) -> dict:
+    stop = asyncio.Event()
+    gate = asyncio.create_task(_gate_traffic(stop, interval))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await gate
+
+    lags.sort()
+    return {
+        "logins": logins,
+        "rejected_429": sum(1 for r in results if r is False),
+        "elapsed_s": round(elapsed, 2),
+        "gate_ticks": len(lags),
+        "gate_lag_p50_ms": round(statistics.median(lags), 2),
+        "gate_lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 2),
+        "gate_lag_max_ms": round(lags[-1], 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--gate-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    interval = args.gate_interval_ms / 1000
+
+    hashed = security.hash_password(PASSWORD)
+    # Warm the pool so worker start-up is not counted
+    await security.verify_password_async(PASSWORD, hashed)
+
+    try:
+        for name, login in (("inline", _inline_login), ("pool", _pooled_login)):
+            print(name, await _storm(login, args.logins, interval, hashed))
+    finally:
+        security.shutdown_hashing_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Datetime parsing throughput of the importers.
+
+Parses --count legacy timestamps with import_common.parse_dt and with a
+DatetimeParser, with and without its cache, in the formats legacy files
+use; "mixed" has one epoch value in ten among ISO strings, which the cache
+is for. --distinct sets how many different values there are. Best of
+--repeat runs.
+
+    python -m benchmarks.parse_datetimes [--count 10000000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.scripts.import_common import DatetimeParser, parse_dt
+
+BATCH = 100_000
+FORMATS = {
+    "iso_z": lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    "iso_offset": lambda dt: dt.isoformat(),
+    "space": lambda dt: dt.strftime("%Y-%m-%d %H:%M:%S"),
+    "epoch": lambda dt: int(dt.timestamp()),
+    "mixed": lambda dt: (
+        int(dt.timestamp()) if dt.minute % 10 == 0 else dt.isoformat()
+    ),
+}
+
+
+def values(fmt: str, count: int, distinct: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    pool = [
+        FORMATS[fmt](start + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60)))
+        for _ in range(distinct)
+    ]
+    # Batches, so 10M values never sit in memory at once
+    for done in range(0, count, BATCH):
+        yield [pool[rng.randrange(distinct)] for _ in range(min(BATCH, count - done))]
+
+
+def measure(make_parser, fmt: str, count: int, distinct: int, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        parse = make_parser()
+        elapsed = 0.0
+        for batch in values(fmt, count, distinct):
+            started = time.perf_counter()
+            for value in batch:
+                parse(value)
+            elapsed += time.perf_counter() - started
+        runs.append(elapsed)
+    return min(runs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10_000_000)
+    parser.add_argument("--distinct", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS))
+    args = parser.parse_args()
+
+    for fmt in args.formats:
+        baseline = measure(
+            lambda: parse_dt, fmt, args.count, args.distinct, args.repeat
+        )
+        for name, make_parser in (
+            ("sniffed", lambda: DatetimeParser(cache_size=0)),
+            ("sniffed+memo", DatetimeParser),
+        ):
+            elapsed = measure(make_parser, fmt, args.count, args.distinct, args.repeat)
+            print(
+                f"{fmt:<10} {name:<13} {args.count / elapsed:>12,.0f} values/s "
+                f"({baseline / elapsed:.1f}x parse_dt: "
+                f"{args.count / baseline:,.0f} values/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,13 @@ from app.models.parking_session import ParkingSession
 from app.models.payment import Payment
 from app.models.discount_code import DiscountCode
 from app.models.discount_redemption import DiscountRedemption
+from app.models.revenue_rollup import RevenueRollup
+from app.models.refresh_token import RefreshToken
+from app.models.api_key import ApiKey
+from app.models.discount_code_shard import DiscountCodeShard
+from app.models.discount_rollup import DiscountRollup
+from app.models.import_id_map import ImportIdMap
+from app.models.import_checkpoint import ImportCheckpoint
 
 # this is the Alembic Config object
 config = context.config
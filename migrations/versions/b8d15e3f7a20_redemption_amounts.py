@@ -0,0 +1,44 @@
+"""Redemption amounts, kept past their reservation
+
+Revision ID: b8d15e3f7a20
+Revises: 6e2c4a8d1f57
+Create Date: 2026-10-19 22:51:09.113742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d15e3f7a20'
+down_revision: Union[str, None] = '6e2c4a8d1f57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('discount_redemptions', sa.Column('original_amount', sa.Float(), nullable=True))
+    op.add_column('discount_redemptions', sa.Column('discount_amount', sa.Float(), nullable=True))
+    # Backfill from the reservations, as rebuild_discount_rollups read them
+    op.execute(
+        "UPDATE discount_redemptions d "
+        "SET original_amount = r.original_cost, discount_amount = r.discount_amount "
+        "FROM reservations r WHERE r.id = d.reservation_id"
+    )
+    op.alter_column('discount_redemptions', 'original_amount', nullable=False)
+    op.alter_column('discount_redemptions', 'discount_amount', nullable=False)
+    op.alter_column('discount_redemptions', 'reservation_id', existing_type=sa.Integer(), nullable=True)
+    op.drop_constraint('discount_redemptions_reservation_id_fkey', 'discount_redemptions', type_='foreignkey')
+    op.create_foreign_key('discount_redemptions_reservation_id_fkey', 'discount_redemptions', 'reservations', ['reservation_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    op.drop_constraint('discount_redemptions_reservation_id_fkey', 'discount_redemptions', type_='foreignkey')
+    op.create_foreign_key('discount_redemptions_reservation_id_fkey', 'discount_redemptions', 'reservations', ['reservation_id'], ['id'], ondelete='CASCADE')
+    # Redemptions of deleted reservations cannot go back under NOT NULL
+    op.execute("DELETE FROM discount_redemptions WHERE reservation_id IS NULL")
+    op.alter_column('discount_redemptions', 'reservation_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_column('discount_redemptions', 'discount_amount')
+    op.drop_column('discount_redemptions', 'original_amount')
@@ -0,0 +1,32 @@
+"""Normalized discount code column
+
+Revision ID: f5c2d8a4b613
+Revises: e1a7b3c95d20
+Create Date: 2026-10-19 16:37:12.448310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c2d8a4b613'
+down_revision: Union[str, None] = 'e1a7b3c95d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('discount_codes', sa.Column('code_normalized', sa.String(length=50), nullable=True))
+    # Backfill; fails on the unique index below if two existing codes differ
+    # only by case, which the API already refused to create
+    op.execute("UPDATE discount_codes SET code_normalized = lower(trim(code))")
+    op.alter_column('discount_codes', 'code_normalized', nullable=False)
+    op.create_index(op.f('ix_discount_codes_code_normalized'), 'discount_codes', ['code_normalized'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_discount_codes_code_normalized'), table_name='discount_codes')
+    op.drop_column('discount_codes', 'code_normalized')
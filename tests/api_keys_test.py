@@ -0,0 +1,133 @@
+from datetime import datetime
+import secrets
+
+from httpx import AsyncClient
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.gate import Gate
+from app.models.user import User, UserRole
+from app.schemas.api_key import ApiKeyCreatedOut, ApiKeyIn
+from app.schemas.gate import GateDecision, GateDirection, GateEventIn, GateEventOut
+from app.schemas.payment import PaymentIn
+
+
+async def create_key(
+    async_client: AsyncClient, headers: dict[str, str], payload: ApiKeyIn
+) -> ApiKeyCreatedOut:
+    resp = await async_client.post(
+        "/api_keys", json=payload.model_dump(mode="json"), headers=headers
+    )
+    assert resp.status_code == 201
+    return ApiKeyCreatedOut.model_validate(resp.json())
+
+
+@pytest.mark.anyio
+async def test_gate_key_is_scoped_to_its_gate(
+    async_client: AsyncClient,
+    gate_in_db: Gate,
+    parking_meter_in_db: User,
+    auth_headers_admin: dict[str, str],
+):
+    gate = gate_in_db
+    created = await create_key(
+        async_client,
+        auth_headers_admin,
+        ApiKeyIn(user_id=parking_meter_in_db.id, name="gate one", gate_id=gate.id),
+    )
+    assert created.parking_lot_id == gate.parking_lot_id
+    headers = {"X-API-Key": created.key}
+
+    event = GateEventIn(
+        gate_id=gate.id,
+        parking_lot_id=gate.parking_lot_id,
+        license_plate="APIKEY1",
+        direction=GateDirection.entry,
+        timestamp=datetime.now(),
+    )
+    resp = await async_client.post(
+        f"/gate/{gate.id}", json=event.model_dump(mode="json"), headers=headers
+    )
+    assert resp.status_code == 200
+    assert GateEventOut.model_validate(resp.json()).decision == GateDecision.open
+
+    resp = await async_client.post(
+        f"/gate/{gate.id + 1}", json=event.model_dump(mode="json"), headers=headers
+    )
+    assert resp.status_code == 403
+
+    # The same key works on the meter endpoints, but only for its own lot
+    payment = PaymentIn(parking_lot_id=gate.parking_lot_id + 1, license_plate="APIKEY1")
+    resp = await async_client.post(
+        "/payments/pay", json=payment.model_dump(mode="json"), headers=headers
+    )
+    assert resp.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_revoked_key_is_rejected(
+    async_client: AsyncClient,
+    parking_meter_in_db: User,
+    auth_headers_admin: dict[str, str],
+):
+    created = await create_key(
+        async_client,
+        auth_headers_admin,
+        ApiKeyIn(user_id=parking_meter_in_db.id, name="meter one"),
+    )
+    headers = {"X-API-Key": created.key}
+
+    resp = await async_client.get("/vehicles", headers=headers)
+    assert resp.status_code == 200
+
+    resp = await async_client.delete(
+        f"/api_keys/{created.id}", headers=auth_headers_admin
+    )
+    assert resp.status_code == 200
+
+    resp = await async_client.get("/vehicles", headers=headers)
+    assert resp.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_key_of_deactivated_owner_is_rejected(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    auth_headers_admin: dict[str, str],
+):
+    # A meter of its own: the shared one must stay active for other tests
+    email = f"meter-{secrets.token_hex(4)}@meter.com"
+    meter = User(
+        username=email,
+        password_hash="test",
+        name=email,
+        email=email,
+        phone="683713498",
+        role=UserRole.parking_meter,
+        active=True,
+        birth_year=2001,
+    )
+    async_session.add(meter)
+    await async_session.commit()
+
+    created = await create_key(
+        async_client,
+        auth_headers_admin,
+        ApiKeyIn(user_id=meter.id, name="meter two"),
+    )
+    meter.active = False
+    await async_session.commit()
+
+    resp = await async_client.get("/vehicles", headers={"X-API-Key": created.key})
+    assert resp.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_key_for_human_account_rejected(
+    async_client: AsyncClient, admin_in_db: User, auth_headers_admin: dict[str, str]
+):
+    payload = ApiKeyIn(user_id=admin_in_db.id, name="not a machine")
+    resp = await async_client.post(
+        "/api_keys", json=payload.model_dump(mode="json"), headers=auth_headers_admin
+    )
+    assert resp.status_code == 422
@@ -1,8 +1,17 @@
+from unittest.mock import AsyncMock
+import uuid
+
 from httpx import AsyncClient
+from passlib.hash import argon2
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.auth import LoginOut, RegisterIn, RegisterOut, UserOut, UserUpdateIn
+from app.services import security
+from app.services.auth import create_access_token
+from app.services.principals import get_principal, invalidate_principal
 
 EMAIL = "test@test.com"
 USERNAME = "test"
@@ -91,6 +100,131 @@ async def test_login_invalid(async_client: AsyncClient):
     assert resp.status_code == 401
 
 
+@pytest.mark.anyio
+async def test_login_rate_limited_before_hashing(
+    async_client: AsyncClient, monkeypatch
+):
+    monkeypatch.setattr(settings, "login_rate_email_burst", 2)
+    verify = AsyncMock(return_value=False)
+    monkeypatch.setattr("app.services.auth.verify_password_async", verify)
+    # Unique so buckets left in Redis by earlier runs do not matter
+    email = f"limited-{uuid.uuid4().hex[:8]}@test.com"
+
+    for _ in range(2):
+        resp = await async_client.post(
+            "/auth/login", json={"email": email, "password": "invalid"}
+        )
+        assert resp.status_code == 401
+
+    resp = await async_client.post(
+        "/auth/login", json={"email": email, "password": "invalid"}
+    )
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert verify.await_count == 2
+
+
+@pytest.mark.anyio
+async def test_refresh_rotates_and_detects_reuse(async_client: AsyncClient):
+    resp = await async_client.post(
+        "/auth/login",
+        json={"email": EMAIL, "password": PASSWORD},
+    )
+    assert resp.status_code == 200
+    first = LoginOut.model_validate(resp.json()).refresh_token
+    assert first is not None
+
+    resp = await async_client.post("/auth/refresh", json={"refresh_token": first})
+    assert resp.status_code == 200
+    data = LoginOut.model_validate(resp.json())
+    assert data.access_token is not None
+    assert data.refresh_token not in (None, first)
+
+    # Replaying the exchanged token revokes the whole family
+    resp = await async_client.post("/auth/refresh", json={"refresh_token": first})
+    assert resp.status_code == 401
+    resp = await async_client.post(
+        "/auth/refresh", json={"refresh_token": data.refresh_token}
+    )
+    assert resp.status_code == 401
+
+
+async def register_and_login(async_client: AsyncClient) -> tuple[int, LoginOut]:
+    email = f"session-{uuid.uuid4().hex[:8]}@test.com"
+    payload = RegisterIn(
+        email=email,
+        password=PASSWORD,
+        name=NAME,
+        username=NAME,
+        phone="0612345678",
+        active=True,
+        birth_year=1990,
+    )
+    resp = await async_client.post(
+        "/auth/register", json=payload.model_dump(mode="json")
+    )
+    assert resp.status_code == 201
+    user_id = RegisterOut.model_validate(resp.json()).id
+    resp = await async_client.post(
+        "/auth/login", json={"email": email, "password": PASSWORD}
+    )
+    assert resp.status_code == 200
+    return user_id, LoginOut.model_validate(resp.json())
+
+
+@pytest.mark.anyio
+async def test_logout_revokes_refresh_token(async_client: AsyncClient):
+    _, login = await register_and_login(async_client)
+    headers = {"Authorization": f"Bearer {login.access_token}"}
+
+    resp = await async_client.post("/auth/logout", headers=headers)
+    assert resp.status_code == 204
+
+    resp = await async_client.post(
+        "/auth/refresh", json={"refresh_token": login.refresh_token}
+    )
+    assert resp.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_refresh_of_deactivated_user_keeps_the_token(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    user_id, login = await register_and_login(async_client)
+    user = await async_session.get(User, user_id)
+    user.active = False
+    await async_session.commit()
+
+    resp = await async_client.post(
+        "/auth/refresh", json={"refresh_token": login.refresh_token}
+    )
+    assert resp.status_code == 401
+
+    # Refused without being used up: it works again once reactivated
+    user.active = True
+    await async_session.commit()
+    resp = await async_client.post(
+        "/auth/refresh", json={"refresh_token": login.refresh_token}
+    )
+    assert resp.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_login_hashing_pool_saturated(async_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(
+        security,
+        "_in_flight",
+        settings.password_hash_workers + settings.password_hash_max_queue,
+    )
+    resp = await async_client.post(
+        "/auth/login",
+        json={"email": EMAIL, "password": PASSWORD},
+    )
+    # Expect 429 (Too Many Requests) instead of queueing more Argon2 work
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "1"
+
+
 @pytest.mark.anyio
 async def test_get_user_authorized(
     async_client: AsyncClient, user_in_db: User, auth_headers_admin: dict[str, str]
@@ -159,3 +293,71 @@ async def test_register_admin_unauthorized(
         headers=auth_headers_user,
     )
     assert resp.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_principal_cache_hit_skips_database(
+    async_session: AsyncSession, user_in_db: User
+):
+    await invalidate_principal(user_in_db.id)
+    principal = await get_principal(async_session, user_in_db.id)
+    assert principal is not None
+    assert principal.id == user_in_db.id
+    assert principal.role == user_in_db.role
+
+    # Cached: no query at all
+    db = AsyncMock(spec=AsyncSession)
+    assert await get_principal(db, user_in_db.id) == principal
+    db.execute.assert_not_called()
+
+    # Invalidated: back to the database
+    await invalidate_principal(user_in_db.id)
+    assert await get_principal(async_session, user_in_db.id) == principal
+
+
+@pytest.mark.anyio
+async def test_logout_revokes_token(async_client: AsyncClient, user_in_db: User):
+    headers = {"Authorization": f"Bearer {create_access_token(str(user_in_db.id))}"}
+    assert (await async_client.get("/vehicles", headers=headers)).status_code == 200
+
+    resp = await async_client.post("/auth/logout", headers=headers)
+    assert resp.status_code == 204
+
+    assert (await async_client.get("/vehicles", headers=headers)).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_login_rehashes_outdated_hash_in_background(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    outdated = argon2.using(rounds=1, memory_cost=1024).hash(PASSWORD)
+    assert security.needs_update(outdated)
+    user = User(
+        username="rehash",
+        password_hash=outdated,
+        name="rehash",
+        email="rehash@test.com",
+        phone="0612345678",
+        active=True,
+        birth_year=1990,
+    )
+    async_session.add(user)
+    await async_session.commit()
+
+    resp = await async_client.post(
+        "/auth/login", json={"email": "rehash@test.com", "password": PASSWORD}
+    )
+    assert resp.status_code == 200
+
+    # Background tasks have run by the time the ASGI call returns
+    await async_session.refresh(user)
+    assert user.password_hash != outdated
+    assert not security.needs_update(user.password_hash)
+    assert security.verify_password(PASSWORD, user.password_hash)
+
+
+@pytest.mark.anyio
+async def test_dummy_hash_uses_live_parameters():
+    hashed = await security.dummy_hash()
+    assert not security.needs_update(hashed)
+    assert f"m={settings.argon2_memory_cost},t={settings.argon2_time_cost}" in hashed
@@ -10,6 +10,7 @@ import random
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.main import app
+from app.core.config import settings
 from app.db.base import Base
 from app.db import session as db_session
 from app.models.gate import Gate
@@ -27,6 +28,10 @@ TEST_DB_URL = os.getenv(
 engine = create_async_engine(TEST_DB_URL, future=True)
 TestingSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+# Tests log in far more often than a person would; the limiter has its own test
+settings.login_rate_email_burst = 1000
+settings.login_rate_ip_burst = 1000
+
 
 @pytest.fixture
 def anyio_backend():
@@ -46,6 +51,7 @@ async def async_client() -> AsyncGenerator[httpx.AsyncClient, None]:
             yield s
 
     app.dependency_overrides[db_session.get_session] = override_get_db
+    app.dependency_overrides[db_session.get_sessionmaker] = lambda: TestingSessionLocal
 
     # 3. create client with ASGI transport
     transport = httpx.ASGITransport(app=app)
@@ -57,6 +63,11 @@ async def async_client() -> AsyncGenerator[httpx.AsyncClient, None]:
     await engine.dispose()
 
 
+@pytest.fixture
+def db_engine():
+    return engine
+
+
 @pytest.fixture
 async def async_session() -> AsyncGenerator[AsyncSession, None]:
     async with TestingSessionLocal() as session:
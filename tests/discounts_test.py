@@ -8,13 +8,23 @@ Pure unit tests for the discount service.
 from __future__ import annotations
 
 from httpx import AsyncClient
+from fastapi import HTTPException
 import pytest
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from unittest.mock import AsyncMock
+import json
+import secrets
 
-from app.models.discount_code import DiscountCode
-from app.schemas.discounts import DiscountGenerateIn, DiscountOut
-from app.services import discounts
+from app.models.discount_code import DiscountCode, normalize_code
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.schemas.discounts import (
+    DiscountBatchOut,
+    DiscountBulkGenerateIn,
+    DiscountGenerateIn,
+    DiscountOut,
+)
+from app.services import discount_counters, discounts
 
 
 # --------------------------
@@ -262,3 +272,176 @@ async def test_generate_discounts_persists_and_no_collisions_across_calls(
     assert len(d1) == 5
     assert len(d2) == 5
     assert codes1.isdisjoint(codes2)  # no overlap between batches
+
+
+
+def test_random_codes_distinct():
+    codes = discounts.random_codes("BULK", 10000)
+    assert len(codes) == 10000
+    for code in codes:
+        assert code.startswith("BULK")
+        assert len(code) == 4 + discounts.CODE_LENGTH
+        assert set(code[4:]) <= set(discounts.CODE_ALPHABET)
+
+
+@pytest.mark.anyio
+async def test_generate_discounts_bulk_streams_ndjson(
+    async_client: AsyncClient,
+    auth_headers_admin: dict[str, str],
+):
+    payload = DiscountBulkGenerateIn(count=1200, prefix="NDJ", percent=5)
+
+    resp = await async_client.post(
+        "/discounts/generate/bulk",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_admin,
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    data = [DiscountOut.model_validate(json.loads(x)) for x in resp.text.splitlines()]
+    assert len(data) == 1200
+    assert len({d.code for d in data}) == 1200
+
+    batch = await async_client.get(
+        f"/discounts/batches/{resp.headers['X-Batch-Id']}", headers=auth_headers_admin
+    )
+    assert DiscountBatchOut.model_validate(batch.json()).created == 1200
+
+
+@pytest.mark.anyio
+async def test_generate_discounts_bulk_large_runs_in_background(
+    async_client: AsyncClient,
+    auth_headers_admin: dict[str, str],
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "discount_generate_stream_max", 10)
+    payload = DiscountBulkGenerateIn(count=25, prefix="JOB", percent=5)
+
+    resp = await async_client.post(
+        "/discounts/generate/bulk",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_admin,
+    )
+
+    assert resp.status_code == 202
+    job = DiscountBatchOut.model_validate(resp.json())
+    assert job.requested == 25
+
+    # The background job has finished by the time the ASGI call returns
+    batch = await async_client.get(
+        f"/discounts/batches/{job.batch_id}", headers=auth_headers_admin
+    )
+    assert DiscountBatchOut.model_validate(batch.json()).created == 25
+
+    codes = await async_client.get(
+        f"/discounts/batches/{job.batch_id}/codes", headers=auth_headers_admin
+    )
+    assert codes.status_code == 200
+    assert len(codes.text.splitlines()) == 25
+
+
+@pytest.mark.anyio
+async def test_redeem_discount_code_stops_at_max_uses(async_session: AsyncSession):
+    dc = DiscountCode(code="LIMIT2", percent=10, max_uses=2)
+    async_session.add(dc)
+    await async_session.commit()
+
+    results = [
+        await discounts.redeem_discount_code(async_session, dc.id) for _ in range(3)
+    ]
+    await async_session.commit()
+
+    assert results == [True, True, False]
+    await async_session.refresh(dc)
+    assert dc.uses_count == 2
+
+
+@pytest.mark.anyio
+async def test_unknown_code_rejected_by_filter_without_query(monkeypatch):
+    known = BloomFilter(capacity=100)
+    known.add("welcome20")
+    monkeypatch.setattr(discounts, "_known_codes", known)
+    monkeypatch.setattr(discounts, "get_redis", lambda: object())
+    db = AsyncMock(spec=AsyncSession)
+
+    with pytest.raises(HTTPException) as exc:
+        await discounts.get_discount_by_code(db, "WELC0ME20")
+
+    assert exc.value.status_code == 404
+    db.execute.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_discount_filter_catch_up_adds_new_codes(
+    async_session: AsyncSession, monkeypatch
+):
+    for name in ("_known_codes", "_known_through", "_catch_up_from"):
+        monkeypatch.setattr(discounts, name, getattr(discounts, name))
+    sessionmaker = async_sessionmaker(async_session.bind, expire_on_commit=False)
+    monkeypatch.setattr(discounts, "get_sessionmaker", lambda: sessionmaker)
+    await discounts.rebuild_discount_filter()
+    built_through = discounts._known_through
+
+    code = f"LATE{secrets.token_hex(4)}"
+    async_session.add(DiscountCode(code=code, percent=5))
+    await async_session.commit()
+    await discounts.catch_up_discount_filter()
+
+    assert normalize_code(code) in discounts._known_codes
+    assert discounts._known_through > built_through
+
+
+@pytest.mark.anyio
+async def test_get_discount_by_code_ignores_case(async_session: AsyncSession):
+    async_session.add(DiscountCode(code="MixedCase10", percent=10))
+    await async_session.commit()
+
+    dc = await discounts.get_discount_by_code(async_session, "  mixedcase10 ")
+    assert dc.code == "MixedCase10"
+    assert dc.code_normalized == "mixedcase10"
+
+
+def test_split_quota_sums_to_remaining_uses():
+    assert discount_counters.split_quota(10, 3, 3) == [3, 2, 2]
+    assert discount_counters.split_quota(5, 5, 2) == [0, 0]
+    assert discount_counters.split_quota(None, 3, 2) == [None, None]
+
+
+@pytest.mark.anyio
+async def test_sharded_counter_stops_at_max_uses(async_session: AsyncSession):
+    dc = DiscountCode(code="HOT5", percent=10, max_uses=5)
+    async_session.add(dc)
+    await async_session.commit()
+    await discount_counters.set_counter_shards(async_session, dc, 3)
+
+    results = [
+        await discounts.redeem_discount_code(async_session, dc.id, dc.counter_shards)
+        for _ in range(7)
+    ]
+    await async_session.commit()
+    assert results.count(True) == 5
+
+    await discount_counters.fold_discount_shards(async_session, dc.id)
+    await async_session.refresh(dc)
+    assert dc.uses_count == 5
+    assert not await discounts.redeem_discount_code(
+        async_session, dc.id, dc.counter_shards
+    )
+
+
+@pytest.mark.anyio
+async def test_redeem_with_stale_shard_count_after_unsharding(
+    async_session: AsyncSession,
+):
+    dc = DiscountCode(code="UNSHARD3", percent=10, max_uses=3)
+    async_session.add(dc)
+    await async_session.commit()
+    await discount_counters.set_counter_shards(async_session, dc, 3)
+    stale_shards = dc.counter_shards
+    await discount_counters.set_counter_shards(async_session, dc, 0)
+
+    assert await discounts.redeem_discount_code(async_session, dc.id, stale_shards)
+    await async_session.commit()
+    await async_session.refresh(dc)
+    assert dc.uses_count == 1
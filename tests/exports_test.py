@@ -0,0 +1,60 @@
+import csv
+import gzip
+import io
+import json
+
+from httpx import AsyncClient
+import pytest
+
+from app.models.reservation import Reservation
+
+
+@pytest.mark.anyio
+async def test_export_reservations_ndjson(
+    async_client: AsyncClient,
+    reservation_in_db: Reservation,
+    auth_headers_admin: dict[str, str],
+):
+    resp = await async_client.get(
+        "/exports/reservations",
+        params={"parking_lot_id": reservation_in_db.parking_lot_id},
+        headers=auth_headers_admin,
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in rows] == [reservation_in_db.id]
+    assert rows[0]["license_plate"] == reservation_in_db.license_plate
+    assert rows[0]["status"] == "confirmed"
+
+
+@pytest.mark.anyio
+async def test_export_reservations_csv_gzip(
+    async_client: AsyncClient,
+    reservation_in_db: Reservation,
+    auth_headers_admin: dict[str, str],
+):
+    resp = await async_client.get(
+        "/exports/reservations",
+        params={
+            "parking_lot_id": reservation_in_db.parking_lot_id,
+            "format": "csv",
+            "gzip": True,
+        },
+        headers=auth_headers_admin,
+    )
+
+    assert resp.status_code == 200
+    text = gzip.decompress(resp.content).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(rows) == 1
+    assert rows[0]["id"] == str(reservation_in_db.id)
+
+
+@pytest.mark.anyio
+async def test_export_payments_unauthorized(
+    async_client: AsyncClient, auth_headers_user: dict[str, str]
+):
+    resp = await async_client.get("/exports/payments", headers=auth_headers_user)
+    assert resp.status_code == 403
@@ -0,0 +1,398 @@
+import json
+import secrets
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models.import_checkpoint import ImportCheckpoint
+from app.models.parking_session import ParkingSession
+from app.models.payment import Payment, PaymentStatus
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.revenue_rollup import RevenueRollup
+from app.models.user import User
+from app.scripts import import_common
+from app.scripts.export_all import export_all
+from app.scripts.import_common import DatetimeParser, ImportContext, parse_dt
+from app.scripts.import_parking_lots import import_parking_lots
+from app.scripts.import_payments import import_payments
+from app.scripts.import_pipeline import STEPS, ImportPipeline
+from app.scripts.import_reservations import _parse_status, import_reservations
+from app.scripts.import_users import import_users
+from app.scripts.import_vehicles import import_vehicles
+from app.scripts.import_validate import validate_all
+from app.scripts.json_stream import iter_json_array
+
+
+def write_legacy_files(data_dir: Path, tag: str) -> None:
+    files = {
+        "users.json": [
+            {"id": 1, "email": f"a-{tag}@example.com", "name": "A"},
+            {"id": 2, "email": f"b-{tag}@example.com", "role": "admin"},
+            # same account again under another legacy id
+            {"id": 3, "email": f"a-{tag}@example.com", "phone": "0612345678"},
+        ],
+        "parking_lots.json": [
+            {"id": 7, "name": f"Lot {tag}", "address": "Wijnhaven 107", "capacity": 5}
+        ],
+        "vehicles.json": [
+            {"id": 11, "user_id": 1, "license_plate": f"A{tag[:6]}"},
+            {"id": 12, "user_id": 2, "license_plate": f"B{tag[:6]}"},
+        ],
+        "reservations.json": [
+            {
+                "id": 21,
+                "user_id": 1,
+                "vehicle_id": 11,
+                "parking_lot_id": 7,
+                "start_time": "2024-01-01T10:00:00Z",
+                "end_time": "2024-01-01T12:00:00Z",
+                "cost": 10,
+            }
+        ],
+        "payments.json": [
+            {
+                "id": 31,
+                "user_id": 1,
+                "reservation_id": 21,
+                "amount": 10,
+                "completed_at": "2024-01-01T12:05:00Z",
+            }
+        ],
+    }
+    for name, items in files.items():
+        (data_dir / name).write_text(json.dumps(items), encoding="utf-8")
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_json_array_across_buffer_boundaries(tmp_path: Path, indent):
+    items = [
+        {"id": i, "amount": 10.5 * 10**i, "name": "é" * i, "tags": [1, {"a": None}]}
+        for i in range(50)
+    ]
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps(items, indent=indent), encoding="utf-8")
+
+    for buffer_chars in (1, 7, 4096):
+        read = iter_json_array(path, backend="python", buffer_chars=buffer_chars)
+        assert list(read) == items
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '{"id": 1}',
+        "[1, 2]",
+        '[{"id": 1} {"id": 2}]',
+        '[{"id": 1}] [{"id": 2}]',
+        '[{"id": 1}]\ngarbage',
+    ],
+)
+def test_iter_json_array_rejects_other_shapes(tmp_path: Path, content: str):
+    path = tmp_path / "items.json"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, backend="python", buffer_chars=4))
+
+
+def test_iter_json_array_skips_a_byte_order_mark(tmp_path: Path):
+    path = tmp_path / "items.json"
+    path.write_text('[{"id": 1}]\n', encoding="utf-8-sig")
+
+    assert list(iter_json_array(path, backend="python")) == [{"id": 1}]
+
+
+def test_datetime_parser_matches_parse_dt_across_format_changes():
+    formats = [
+        "2025-01-01T10:00:00Z",
+        "2025-01-01T10:00:00+01:00",
+        "2025-01-01 10:00:00",
+        "2025-01-01",
+        1735725600,
+        1735725600.5,
+        None,
+    ]
+    parse = DatetimeParser(sample_size=10, cache_size=5)
+    # Runs of one format each, so every one becomes the fast path in turn
+    values = [value for value in formats for _ in range(40)]
+    values += [formats[i % len(formats)] for i in range(100)]
+
+    assert [parse(value) for value in values] == [parse_dt(v) for v in values]
+    with pytest.raises(ValueError):
+        parse("not a date")
+
+
+def test_dry_run_reports_every_problem_without_a_database(tmp_path: Path):
+    write_legacy_files(tmp_path, "DRYRUN")
+    users = json.loads((tmp_path / "users.json").read_text())
+    users += [
+        {"id": 2, "email": "again@example.com"},
+        {"id": 4, "email": "long@example.com", "phone": "0" * 20},
+    ]
+    (tmp_path / "users.json").write_text(json.dumps(users))
+    reservation = json.loads((tmp_path / "reservations.json").read_text())[0]
+    reservations = [
+        reservation,
+        {**reservation, "id": 22, "user_id": 99},
+        {**reservation, "id": 23, "user_id": 98},
+        {**reservation, "id": 24, "start_time": "yesterday"},
+    ]
+    (tmp_path / "reservations.json").write_text(json.dumps(reservations))
+
+    reports = {r.filename: r for r in validate_all(tmp_path, workers=2)}
+
+    assert reports["users.json"].errors == {"uniqueness": 1, "schema": 1}
+    assert reports["vehicles.json"].invalid == 0
+    assert reports["reservations.json"].errors == {"foreign_key": 2, "datetime": 1}
+    assert reports["reservations.json"].missing == {
+        "user_id": {"references": 2, "ids": [99, 98]}
+    }
+    assert reports["payments.json"].invalid == 0
+
+
+@pytest.mark.anyio
+async def test_import_maps_legacy_ids(
+    monkeypatch, tmp_path: Path, db_engine: AsyncEngine, async_session: AsyncSession
+):
+    tag = secrets.token_hex(4).upper()
+    write_legacy_files(tmp_path, tag)
+    monkeypatch.setattr(import_common, "DATA_DIR", tmp_path)
+
+    ctx = ImportContext.empty()
+    users = await import_users(db_engine, ctx, chunk_rows=2)
+    await import_parking_lots(db_engine, ctx)
+    await import_vehicles(db_engine, ctx)
+    await import_reservations(db_engine, ctx)
+    await import_payments(db_engine, ctx)
+
+    assert users.rows == 3
+    assert users.inserted == 2
+    assert ctx.user_id_map[1] == ctx.user_id_map[3] != ctx.user_id_map[2]
+
+    user = await async_session.get(User, ctx.user_id_map[1])
+    assert user.phone == "0612345678"
+    reservation = await async_session.get(Reservation, ctx.reservation_id_map[21])
+    assert reservation.license_plate == f"A{tag[:6]}"
+    payment = await async_session.get(Payment, ctx.payment_id_map[31])
+    assert payment.status == PaymentStatus.paid
+    session = await async_session.get(ParkingSession, payment.session_id)
+    assert session.reservation_id == reservation.id
+    revenue = (
+        await async_session.execute(
+            select(RevenueRollup).where(
+                RevenueRollup.parking_lot_id == ctx.lot_id_map[7]
+            )
+        )
+    ).scalar_one()
+    assert (revenue.amount, revenue.payments_count) == (10, 1)
+
+    # A rerun maps the rows that exist instead of inserting them again
+    again = ImportContext.empty()
+    rerun = await import_users(db_engine, again)
+    assert rerun.inserted == 0
+    assert again.user_id_map == ctx.user_id_map
+    count = await async_session.scalar(
+        select(func.count(User.id)).where(User.email.like(f"%-{tag}@example.com"))
+    )
+    assert count == 2
+
+
+@pytest.mark.anyio
+async def test_import_fills_an_existing_row_from_the_last_item(
+    monkeypatch, tmp_path: Path, db_engine: AsyncEngine, async_session: AsyncSession
+):
+    email = f"twice-{secrets.token_hex(4)}@example.com"
+    monkeypatch.setattr(import_common, "DATA_DIR", tmp_path)
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps([{"id": 1, "email": email}]), encoding="utf-8")
+    ctx = ImportContext.empty()
+    await import_users(db_engine, ctx)
+
+    # Both items fill the same existing row in one chunk
+    items = [
+        {"id": 2, "email": email, "name": "First"},
+        {"id": 3, "email": email, "name": "Last"},
+    ]
+    path.write_text(json.dumps(items), encoding="utf-8")
+    stats = await import_users(db_engine, ImportContext.empty())
+
+    assert (stats.inserted, stats.updated) == (0, 1)
+    user = await async_session.get(User, ctx.user_id_map[1])
+    assert user.name == "Last"
+
+
+@pytest.mark.anyio
+async def test_import_pipeline_partitions_and_resumes(
+    tmp_path: Path, db_engine: AsyncEngine, async_session: AsyncSession
+):
+    tag = secrets.token_hex(4).upper()
+    write_legacy_files(tmp_path, tag)
+
+    def pipeline(**options) -> ImportPipeline:
+        # Every file counts as large, one item per batch
+        return ImportPipeline(
+            workers=2,
+            data_dir=tmp_path,
+            partition_bytes=0,
+            partition_items=1,
+            database_url=db_engine.url.render_as_string(hide_password=False),
+            **options,
+        )
+
+    stats = await pipeline(restart=True).run()
+
+    assert {table: s.rows for table, s in stats.items()} == {
+        "users": 3,
+        "parking_lots": 1,
+        "vehicles": 2,
+        "reservations": 1,
+        "payments": 1,
+    }
+    count = await async_session.scalar(
+        select(func.count(Reservation.id)).where(
+            Reservation.license_plate == f"A{tag[:6]}"
+        )
+    )
+    assert count == 1
+
+    # Nothing changed: the rerun skips every file
+    rerun = await pipeline().run()
+    assert all(s.skipped for s in rerun.values())
+
+    # Interrupted while the first batch was unfinished: later batches had
+    # committed, the checkpoint is still at 0
+    await async_session.execute(
+        update(ImportCheckpoint)
+        .where(ImportCheckpoint.filename == "reservations.json")
+        .values(items_done=0, completed=False)
+    )
+    await async_session.commit()
+    resumed = await pipeline().run()
+    assert resumed["reservations"].inserted == 0
+    count = await async_session.scalar(
+        select(func.count(Reservation.id)).where(
+            Reservation.license_plate == f"A{tag[:6]}"
+        )
+    )
+    assert count == 1
+
+
+@pytest.mark.anyio
+async def test_import_pipeline_rerun_does_not_duplicate_rows(
+    tmp_path: Path, db_engine: AsyncEngine, async_session: AsyncSession
+):
+    tag = secrets.token_hex(4).upper()
+    write_legacy_files(tmp_path, tag)
+    reservation = json.loads((tmp_path / "reservations.json").read_text())[0]
+    bad = {**reservation, "id": 23, "end_time": reservation["start_time"]}
+    reservations = [reservation, {**reservation, "id": 22}, bad]
+    (tmp_path / "reservations.json").write_text(json.dumps(reservations))
+
+    def pipeline(**options) -> ImportPipeline:
+        return ImportPipeline(
+            workers=2,
+            data_dir=tmp_path,
+            chunk_rows=1,
+            database_url=db_engine.url.render_as_string(hide_password=False),
+            **options,
+        )
+
+    with pytest.raises(ValueError):
+        await pipeline(restart=True).run()
+
+    # Fixing the bad item changes the file; the rows already committed are
+    # recognized by their legacy ids
+    reservations[2] = {**reservation, "id": 23}
+    (tmp_path / "reservations.json").write_text(json.dumps(reservations))
+    stats = await pipeline().run()
+
+    assert stats["users"].skipped
+    assert stats["reservations"].inserted == 1
+    count = await async_session.scalar(
+        select(func.count(Reservation.id)).where(
+            Reservation.license_plate == f"A{tag[:6]}"
+        )
+    )
+    assert count == 3
+
+
+@pytest.mark.anyio
+async def test_export_round_trips_through_the_importers(
+    monkeypatch, tmp_path: Path, db_engine: AsyncEngine, async_session: AsyncSession
+):
+    tag = secrets.token_hex(4).upper()
+    write_legacy_files(tmp_path, tag)
+    monkeypatch.setattr(import_common, "DATA_DIR", tmp_path)
+    ctx = ImportContext.empty()
+    await import_users(db_engine, ctx)
+    await import_parking_lots(db_engine, ctx)
+    await import_vehicles(db_engine, ctx)
+    await import_reservations(db_engine, ctx)
+    await import_payments(db_engine, ctx)
+
+    out = tmp_path / "export"
+    stats = await export_all(
+        out,
+        formats=("json", "ndjson"),
+        workers=2,
+        database_url=db_engine.url.render_as_string(hide_password=False),
+    )
+    assert stats["payments"].rows >= 1
+
+    # The exported rows of this test, as a legacy data set of their own
+    ours = {
+        "users": ctx.user_id_map,
+        "parking_lots": ctx.lot_id_map,
+        "vehicles": ctx.vehicle_id_map,
+        "reservations": ctx.reservation_id_map,
+        "payments": ctx.payment_id_map,
+    }
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    for table, id_map in ours.items():
+        items = list(iter_json_array(out / f"{table}.json"))
+        lines = (out / f"{table}.ndjson").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == items
+        ids = set(id_map.values())
+        mine = [item for item in items if item["id"] in ids]
+        assert len(mine) == len(ids)
+        (legacy / f"{table}.json").write_text(json.dumps(mine), encoding="utf-8")
+
+    # Password hashes are only exported when asked for
+    users = json.loads((legacy / "users.json").read_text())
+    assert all("password_hash" not in user for user in users)
+    reservation = json.loads((legacy / "reservations.json").read_text())[0]
+    assert reservation["user_id"] == ctx.user_id_map[1]
+    assert reservation["start_time"] == "2024-01-01T10:00:00Z"
+    assert reservation["cost"] == 10
+    assert all(r.invalid == 0 for r in validate_all(legacy, workers=2))
+
+    # Importing the export again maps every row onto itself
+    monkeypatch.setattr(import_common, "DATA_DIR", legacy)
+    again = ImportContext.empty()
+    reimported = [
+        await import_users(db_engine, again, own_ids=True),
+        await import_parking_lots(db_engine, again, own_ids=True),
+        await import_vehicles(db_engine, again, own_ids=True),
+        await import_reservations(db_engine, again, own_ids=True),
+        await import_payments(db_engine, again, own_ids=True),
+    ]
+    assert [s.inserted for s in reimported] == [0] * len(ours)
+    for table, id_map in ours.items():
+        assert getattr(again, STEPS[table].spec.id_map) == {
+            i: i for i in id_map.values()
+        }
+    reservation_ids = list(ctx.reservation_id_map.values())
+    sessions = await async_session.scalar(
+        select(func.count(ParkingSession.id)).where(
+            ParkingSession.reservation_id.in_(reservation_ids)
+        )
+    )
+    assert sessions == len(ctx.payment_id_map)
+
+
+@pytest.mark.parametrize("status", list(ReservationStatus))
+def test_reservation_statuses_round_trip(status: ReservationStatus):
+    assert _parse_status(status.value) is status
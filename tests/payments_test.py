@@ -0,0 +1,302 @@
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.gate import Gate
+from app.models.parking_lot import ParkingLot
+from app.models.parking_session import ParkingSession
+from app.models.payment import Payment, PaymentStatus
+from app.schemas.gate import GateDirection, GateEventIn
+from app.schemas.payment import (
+    PaymentBatchIn,
+    PaymentBatchItemIn,
+    PaymentBatchItemOut,
+    PaymentBatchOutcome,
+    PaymentIn,
+    PaymentOut,
+)
+from app.services import payments
+
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+# --------------------------
+# calculate_amount_due
+# --------------------------
+
+
+def test_calculate_amount_due_anonymous():
+    amount = payments.calculate_amount_due(
+        entry_time=NOW - timedelta(hours=2),
+        amount_due=0.0,
+        tariff=5.0,
+        planned_end=None,
+        paid_at=NOW,
+    )
+    assert amount == 10.0
+
+
+def test_calculate_amount_due_reservation_within_leeway():
+    amount = payments.calculate_amount_due(
+        entry_time=NOW - timedelta(hours=2),
+        amount_due=0.0,
+        tariff=5.0,
+        planned_end=NOW - timedelta(minutes=3),
+        paid_at=NOW,
+    )
+    assert amount == 0.0
+
+
+def test_calculate_amount_due_reservation_overstay():
+    amount = payments.calculate_amount_due(
+        entry_time=NOW - timedelta(hours=2),
+        amount_due=0.0,
+        tariff=5.0,
+        planned_end=NOW - timedelta(minutes=10),
+        paid_at=NOW,
+    )
+    assert amount == (10 + 1) * 5.0
+
+
+# --------------------------
+# POST /payments/pay
+# --------------------------
+
+
+@pytest.mark.anyio
+async def test_pay(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    gate_in_db: Gate,
+    auth_headers_parking_meter: dict[str, str],
+):
+    gate = gate_in_db
+    entry = GateEventIn(
+        gate_id=gate.id,
+        parking_lot_id=gate.parking_lot_id,
+        license_plate="PAY1",
+        direction=GateDirection.entry,
+        timestamp=datetime.now() - timedelta(hours=2),
+    )
+    resp_entry = await async_client.post(
+        f"/gate/{gate.id}", json=entry.model_dump(mode="json")
+    )
+    assert resp_entry.status_code == 200
+
+    payload = PaymentIn(parking_lot_id=gate.parking_lot_id, license_plate="PAY1")
+    resp = await async_client.post(
+        "/payments/pay",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+    assert resp.status_code == 200
+    paid = PaymentOut.model_validate(resp.json())
+    assert paid.status == PaymentStatus.paid
+
+    session = await async_session.scalar(
+        select(ParkingSession)
+        .where(ParkingSession.license_plate == "PAY1")
+        .execution_options(populate_existing=True)
+    )
+    # Anonymous session: the tariff for the time parked, in full
+    parked = paid.completed_at.replace(tzinfo=timezone.utc) - session.entry_time
+    assert paid.amount == pytest.approx(parked.total_seconds() / 3600 * 5.0)
+    assert session.amount_paid == paid.amount
+    assert session.amount_due == 0.0
+
+    # Paying again returns the settled payment without charging twice
+    resp_again = await async_client.post(
+        "/payments/pay",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+    assert resp_again.status_code == 200
+    assert PaymentOut.model_validate(resp_again.json()) == paid
+
+
+# --------------------------
+# POST /payments/pay/batch
+# --------------------------
+
+
+@pytest.mark.anyio
+async def test_pay_batch(
+    async_client: AsyncClient,
+    gate_in_db: Gate,
+    auth_headers_parking_meter: dict[str, str],
+):
+    gate = gate_in_db
+    for plate in ("BATCH1", "BATCH2"):
+        entry = GateEventIn(
+            gate_id=gate.id,
+            parking_lot_id=gate.parking_lot_id,
+            license_plate=plate,
+            direction=GateDirection.entry,
+            timestamp=datetime.now() - timedelta(hours=1),
+        )
+        resp_entry = await async_client.post(
+            f"/gate/{gate.id}", json=entry.model_dump(mode="json")
+        )
+        assert resp_entry.status_code == 200
+
+    def item(key: str, plate: str) -> PaymentBatchItemIn:
+        return PaymentBatchItemIn(
+            idempotency_key=key,
+            parking_lot_id=gate.parking_lot_id,
+            license_plate=plate,
+            paid_at=datetime.now(),
+        )
+
+    payload = PaymentBatchIn(
+        payments=[
+            item("k1", "BATCH1"),
+            item("k1", "BATCH1"),
+            item("k2", "BATCH2"),
+            item("k3", "UNKNOWN"),
+        ]
+    )
+    resp = await async_client.post(
+        "/payments/pay/batch",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+
+    assert resp.status_code == 200
+    data = [PaymentBatchItemOut.model_validate(x) for x in resp.json()]
+    assert [d.outcome for d in data] == [
+        PaymentBatchOutcome.settled,
+        PaymentBatchOutcome.duplicate,
+        PaymentBatchOutcome.settled,
+        PaymentBatchOutcome.not_found,
+    ]
+    assert data[0].payment is not None
+    assert data[0].payment.amount > 0
+
+    # Re-uploading the same queue replays the first outcomes without charging
+    resp_retry = await async_client.post(
+        "/payments/pay/batch",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+    assert resp_retry.status_code == 200
+    retry = [PaymentBatchItemOut.model_validate(x) for x in resp_retry.json()]
+    assert retry == data
+
+    # A key already used for another payment is not settled again
+    reused = PaymentBatchIn(payments=[item("k2", "BATCH1")])
+    resp_reused = await async_client.post(
+        "/payments/pay/batch",
+        json=reused.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+    assert resp_reused.status_code == 200
+    assert resp_reused.json()[0]["outcome"] == PaymentBatchOutcome.duplicate
+
+
+@pytest.mark.anyio
+async def test_pay_batch_rejects_paid_at_outside_the_session(
+    async_client: AsyncClient,
+    gate_in_db: Gate,
+    auth_headers_parking_meter: dict[str, str],
+):
+    gate = gate_in_db
+    entry = GateEventIn(
+        gate_id=gate.id,
+        parking_lot_id=gate.parking_lot_id,
+        license_plate="SKEW1",
+        direction=GateDirection.entry,
+        timestamp=datetime.now() - timedelta(hours=1),
+    )
+    resp_entry = await async_client.post(
+        f"/gate/{gate.id}", json=entry.model_dump(mode="json")
+    )
+    assert resp_entry.status_code == 200
+
+    payload = PaymentBatchIn(
+        payments=[
+            PaymentBatchItemIn(
+                idempotency_key=key,
+                parking_lot_id=gate.parking_lot_id,
+                license_plate="SKEW1",
+                paid_at=paid_at,
+            )
+            for key, paid_at in (
+                ("early", datetime.now() - timedelta(hours=2)),
+                ("late", datetime.now() + timedelta(days=1)),
+            )
+        ]
+    )
+    resp = await async_client.post(
+        "/payments/pay/batch",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+
+    assert resp.status_code == 200
+    data = [PaymentBatchItemOut.model_validate(x) for x in resp.json()]
+    assert [d.outcome for d in data] == [PaymentBatchOutcome.invalid_paid_at] * 2
+
+
+@pytest.mark.anyio
+async def test_pay_batch_reports_plates_with_several_sessions_as_conflicts(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    lot_in_db: ParkingLot,
+    auth_headers_parking_meter: dict[str, str],
+):
+    for _ in range(2):
+        session = ParkingSession(
+            parking_lot_id=lot_in_db.id,
+            license_plate="TWICE1",
+            entry_time=datetime.now(timezone.utc) - timedelta(hours=1),
+        )
+        async_session.add(session)
+        await async_session.flush()
+        async_session.add(Payment(session_id=session.id))
+    await async_session.commit()
+
+    payload = PaymentBatchIn(
+        payments=[
+            PaymentBatchItemIn(
+                idempotency_key="twice",
+                parking_lot_id=lot_in_db.id,
+                license_plate="TWICE1",
+                paid_at=datetime.now(timezone.utc),
+            )
+        ]
+    )
+    resp = await async_client.post(
+        "/payments/pay/batch",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+
+    assert resp.status_code == 200
+    data = [PaymentBatchItemOut.model_validate(x) for x in resp.json()]
+    assert [d.outcome for d in data] == [PaymentBatchOutcome.conflict]
+
+
+@pytest.mark.anyio
+async def test_pay_batch_requires_parking_meter(
+    async_client: AsyncClient, auth_headers_user: dict[str, str]
+):
+    payload = PaymentBatchIn(
+        payments=[
+            PaymentBatchItemIn(
+                idempotency_key="k1",
+                parking_lot_id=1,
+                license_plate="NOPE",
+                paid_at=datetime.now(),
+            )
+        ]
+    )
+    resp = await async_client.post(
+        "/payments/pay/batch",
+        json=payload.model_dump(mode="json"),
+        headers=auth_headers_user,
+    )
+    assert resp.status_code == 403
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+from httpx import AsyncClient
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.discount_code import DiscountCode
+from app.models.gate import Gate
+from app.models.reservation import Reservation
+from app.schemas.gate import GateDirection, GateEventIn
+from app.schemas.payment import PaymentIn, PaymentOut
+from app.schemas.reports import DiscountDayOut, RevenueBucketOut
+from app.services.discounts import record_discount_redemption
+from app.services.reports import rebuild_discount_rollups, record_revenue
+
+
+@pytest.mark.anyio
+async def test_revenue_report_counts_settled_payment(
+    async_client: AsyncClient,
+    gate_in_db: Gate,
+    auth_headers_parking_meter: dict[str, str],
+    auth_headers_admin: dict[str, str],
+):
+    gate = gate_in_db
+    entry = GateEventIn(
+        gate_id=gate.id,
+        parking_lot_id=gate.parking_lot_id,
+        license_plate="REVENUE",
+        direction=GateDirection.entry,
+        timestamp=datetime.now() - timedelta(hours=1),
+    )
+    resp_entry = await async_client.post(
+        f"/gate/{gate.id}", json=entry.model_dump(mode="json")
+    )
+    assert resp_entry.status_code == 200
+
+    payment = PaymentIn(parking_lot_id=gate.parking_lot_id, license_plate="REVENUE")
+    resp_payment = await async_client.post(
+        "/payments/pay",
+        json=payment.model_dump(mode="json"),
+        headers=auth_headers_parking_meter,
+    )
+    assert resp_payment.status_code == 200
+    paid = PaymentOut.model_validate(resp_payment.json())
+
+    for granularity in ("hour", "day"):
+        resp = await async_client.get(
+            "/reports/revenue",
+            params={"parking_lot_id": gate.parking_lot_id, "granularity": granularity},
+            headers=auth_headers_admin,
+        )
+        assert resp.status_code == 200
+        data = [RevenueBucketOut.model_validate(x) for x in resp.json()]
+        assert sum(d.payments_count for d in data) == 1
+        assert sum(d.amount for d in data) == pytest.approx(paid.amount)
+
+
+@pytest.mark.anyio
+async def test_record_revenue_writes_buckets_in_key_order():
+    db = AsyncMock(spec=AsyncSession)
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    await record_revenue(
+        db,
+        [
+            (2, at + timedelta(hours=5), 1.0),
+            (1, at + timedelta(hours=7), 1.0),
+            (1, at + timedelta(hours=3), 2.0),
+        ],
+    )
+
+    # Concurrent settlements lock shared buckets in the same order
+    params = db.execute.call_args.args[0].compile(dialect=postgresql.dialect()).params
+    keys = [
+        (params[f"parking_lot_id_m{i}"], params[f"bucket_start_m{i}"].hour)
+        for i in range(3)
+    ]
+    assert keys == [(1, 3), (1, 7), (2, 5)]
+
+
+@pytest.mark.anyio
+async def test_revenue_report_unauthorized(
+    async_client: AsyncClient, auth_headers_user: dict[str, str]
+):
+    resp = await async_client.get("/reports/revenue", headers=auth_headers_user)
+    assert resp.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_discount_report_counts_redemptions(
+    async_client: AsyncClient,
+    async_session: AsyncSession,
+    reservation_in_db: Reservation,
+    auth_headers_admin: dict[str, str],
+):
+    dc = DiscountCode(code="ROLLUP10", percent=10, counter_shards=0)
+    async_session.add(dc)
+    reservation_in_db.original_cost = 20.0
+    reservation_in_db.discount_amount = 2.0
+    await async_session.commit()
+
+    for _ in range(2):
+        await record_discount_redemption(
+            async_session, dc, reservation_in_db.user_id, reservation_in_db
+        )
+    await async_session.commit()
+
+    async def report() -> list[DiscountDayOut]:
+        resp = await async_client.get(
+            "/reports/discounts",
+            params={"discount_code_id": dc.id},
+            headers=auth_headers_admin,
+        )
+        assert resp.status_code == 200
+        return [DiscountDayOut.model_validate(x) for x in resp.json()]
+
+    [day] = await report()
+    assert day.code == "ROLLUP10"
+    assert day.redemptions == 2
+    assert day.original_amount == pytest.approx(40.0)
+    assert day.discount_amount == pytest.approx(4.0)
+
+    # Rebuilding from the redemption log gives the same numbers
+    await rebuild_discount_rollups(async_session)
+    assert await report() == [day]
+
+    # Also once the reservation is gone; the redemptions stay in the log
+    await async_session.delete(reservation_in_db)
+    await async_session.commit()
+    await rebuild_discount_rollups(async_session)
+    assert await report() == [day]
+
+
+@pytest.mark.anyio
+async def test_discount_report_unauthorized(
+    async_client: AsyncClient, auth_headers_user: dict[str, str]
+):
+    resp = await async_client.get("/reports/discounts", headers=auth_headers_user)
+    assert resp.status_code == 403
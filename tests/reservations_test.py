@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import uuid
 from httpx import AsyncClient
 import pytest
 
@@ -86,6 +87,64 @@ async def test_create_reservation_unauthorized(
     assert resp.status_code == 401
 
 
+@pytest.mark.anyio
+async def test_create_reservation_idempotent_replay(
+    async_client: AsyncClient,
+    lot_in_db: ParkingLot,
+    vehicle_in_db: Vehicle,
+    auth_headers_user: dict[str, str],
+):
+    payload = ReservationIn(
+        planned_start=datetime.now(),
+        planned_end=datetime.now() + timedelta(hours=1),
+        parking_lot_id=lot_in_db.id,
+        vehicle_id=vehicle_in_db.id,
+        license_plate=vehicle_in_db.license_plate,
+    )
+    headers = {**auth_headers_user, "Idempotency-Key": str(uuid.uuid4())}
+
+    first = await async_client.post(
+        "/reservations", json=payload.model_dump(mode="json"), headers=headers
+    )
+    replay = await async_client.post(
+        "/reservations", json=payload.model_dump(mode="json"), headers=headers
+    )
+
+    # Expect the replay to get the first response back, not a new reservation
+    assert first.status_code == 201
+    assert replay.status_code == 201
+    assert replay.json()["id"] == first.json()["id"]
+
+
+@pytest.mark.anyio
+async def test_create_reservation_idempotency_key_reused(
+    async_client: AsyncClient,
+    lot_in_db: ParkingLot,
+    vehicle_in_db: Vehicle,
+    auth_headers_user: dict[str, str],
+):
+    payload = ReservationIn(
+        planned_start=datetime.now(),
+        planned_end=datetime.now() + timedelta(hours=1),
+        parking_lot_id=lot_in_db.id,
+        vehicle_id=vehicle_in_db.id,
+        license_plate=vehicle_in_db.license_plate,
+    )
+    headers = {**auth_headers_user, "Idempotency-Key": str(uuid.uuid4())}
+
+    first = await async_client.post(
+        "/reservations", json=payload.model_dump(mode="json"), headers=headers
+    )
+    assert first.status_code == 201
+
+    payload.planned_end = payload.planned_end + timedelta(hours=1)
+    resp = await async_client.post(
+        "/reservations", json=payload.model_dump(mode="json"), headers=headers
+    )
+    # Expect 422 because the key belongs to a different request body
+    assert resp.status_code == 422
+
+
 @pytest.mark.anyio
 async def test_get_reservation_owner(
     async_client: AsyncClient,